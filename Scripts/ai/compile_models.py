@@ -0,0 +1,87 @@
+"""
+Compiles the trained models into the NumPy inference format the predictor serves.
+
+Every model pickled by the training notebooks is compiled together with the
+scaler the predictor applies before it (see utils/compiled_models.py), checked
+against the original estimator on sampled inputs and written as
+compiled/<model>.npz. Nothing is written when a compiled model differs from
+its estimator by more than --tolerance.
+
+    python compile_models.py
+    python compile_models.py --source-dir /path/to/artifacts --upload statistiq-models
+
+--source-dir holds models/ and scalers/ as in the bucket (by default this
+directory, where the notebooks save them) and --upload copies the compiled
+models to the bucket next to them.
+"""
+
+import argparse
+import os
+import sys
+
+import joblib
+
+from utils.compiled_models import PARITY_TOLERANCE, compile_model, compiled_artifact_name, parity_error
+
+ai_dir = os.path.dirname(os.path.abspath(__file__))
+
+# Model -> scaler applied before it, as in predict_batch of nba_predictor/main.py
+MODELS = {
+    'models/win_probability_model.pkl': None,
+    'models/home_points_model.pkl': 'scalers/points_scaler.pkl',
+    'models/away_points_model.pkl': 'scalers/points_scaler.pkl',
+    'models/expected_margin_model.pkl': 'scalers/expected_margin_scaler.pkl',
+    'models/overtime_model_gb.pkl': 'scalers/overtime_scaler.pkl',
+}
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--source-dir', default=ai_dir, help='directory with models/ and scalers/')
+    parser.add_argument('--output-dir', help='directory to write compiled/ into (default: --source-dir)')
+    parser.add_argument('--samples', type=int, default=2000, help='sampled inputs per parity check')
+    parser.add_argument('--tolerance', type=float, default=PARITY_TOLERANCE,
+                        help='largest absolute difference allowed against the original estimator')
+    parser.add_argument('--upload', metavar='BUCKET', help='upload the compiled models to this GCS bucket')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    output_dir = args.output_dir or args.source_dir
+
+    compiled, failed = {}, []
+    for model_name, scaler_name in MODELS.items():
+        model = joblib.load(os.path.join(args.source_dir, model_name))
+        scalers = [joblib.load(os.path.join(args.source_dir, scaler_name))] if scaler_name else []
+
+        compiled_model = compile_model(model, scalers)
+        error = parity_error(compiled_model, model, scalers, n=args.samples)
+        status = 'ok' if error <= args.tolerance else 'MISMATCH'
+        print(f'{model_name}: {compiled_model.source} -> {compiled_model.kind}, max abs error {error:.3g} ({status})')
+        if status != 'ok':
+            failed.append(model_name)
+        compiled[compiled_artifact_name(model_name)] = compiled_model
+
+    if failed:
+        print(f'Parity check failed for {failed}, nothing written.')
+        return 1
+
+    paths = {}
+    for name, compiled_model in compiled.items():
+        paths[name] = os.path.join(output_dir, name)
+        compiled_model.save(paths[name])
+        print(f'Wrote {paths[name]} ({os.path.getsize(paths[name]) / 2 ** 10:.0f} KB).')
+
+    if args.upload:
+        from google.cloud import storage
+
+        bucket = storage.Client().bucket(args.upload)
+        for name, path in paths.items():
+            bucket.blob(name).upload_from_filename(path)
+            print(f'Uploaded gs://{args.upload}/{name}.')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
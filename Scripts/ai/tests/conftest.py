@@ -0,0 +1,15 @@
+import os
+import sys
+import tempfile
+
+# The tests import the shared modules as utils.*, like the notebooks and the Cloud Functions
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# utils.data_handler loads the team statistics when imported, point it to empty datasets
+if 'STATISTIQ_DATA_DIR' not in os.environ:
+    data_dir = tempfile.mkdtemp(prefix='statistiq-tests-')
+    with open(os.path.join(data_dir, 'team_statistics.csv'), 'w') as f:
+        f.write('gameId,gameDate,teamId\n')
+    with open(os.path.join(data_dir, 'team_ids.csv'), 'w') as f:
+        f.write('Team,ID\n')
+    os.environ['STATISTIQ_DATA_DIR'] = data_dir
@@ -0,0 +1,69 @@
+import numpy as np
+import pandas as pd
+import pytest
+from catboost import CatBoostClassifier, CatBoostRegressor
+from sklearn.ensemble import (
+    GradientBoostingClassifier,
+    GradientBoostingRegressor,
+    RandomForestClassifier,
+    RandomForestRegressor,
+)
+from sklearn.linear_model import LinearRegression, LogisticRegression
+from sklearn.preprocessing import StandardScaler
+
+from utils.compiled_models import PARITY_TOLERANCE, compile_model, load_compiled, parity_error
+
+FEATURES = ['elo_diff', 'home_off_eff_L10', 'away_off_eff_L10', 'home_def_efficiency', 'rest_diff']
+
+
+def training_frame(n=400, seed=0):
+    rng = np.random.default_rng(seed)
+    X = pd.DataFrame(rng.normal([0, 1.1, 1.1, 110, 0], [80, 0.05, 0.05, 6, 2], size=(n, len(FEATURES))),
+                     columns=FEATURES)
+    score = X['elo_diff'] / 80 + 20 * (X['home_off_eff_L10'] - X['away_off_eff_L10']) + rng.normal(0, 0.5, n)
+    return X, score, (score > 0).astype(int)
+
+
+# CatBoost writes its training logs to train_dir
+def catboost_model(classifier, tmp_path):
+    cls = CatBoostClassifier if classifier else CatBoostRegressor
+    return cls(iterations=30, depth=4, verbose=0, random_seed=0, train_dir=str(tmp_path))
+
+
+# Name -> (estimator factory, classifier)
+MODELS = {
+    'linear_regression': (lambda tmp_path: LinearRegression(), False),
+    'logistic_regression': (lambda tmp_path: LogisticRegression(max_iter=1000), True),
+    'gradient_boosting_regressor': (lambda tmp_path: GradientBoostingRegressor(n_estimators=20, random_state=0), False),
+    'gradient_boosting_classifier': (lambda tmp_path: GradientBoostingClassifier(n_estimators=20, random_state=0), True),
+    'random_forest_regressor': (lambda tmp_path: RandomForestRegressor(n_estimators=10, max_depth=6, random_state=0), False),
+    'random_forest_classifier': (lambda tmp_path: RandomForestClassifier(n_estimators=10, max_depth=6, random_state=0), True),
+    'catboost_regressor': (lambda tmp_path: catboost_model(False, tmp_path), False),
+    'catboost_classifier': (lambda tmp_path: catboost_model(True, tmp_path), True),
+}
+
+
+@pytest.mark.parametrize('scaled', [False, True], ids=['unscaled', 'scaled'])
+@pytest.mark.parametrize('name', list(MODELS))
+def test_compiled_model_matches_estimator(name, scaled, tmp_path):
+    factory, classifier = MODELS[name]
+    X, score, label = training_frame()
+    y = label if classifier else score
+
+    # Like the notebooks: the scaler sees the frame, the model its scaled array
+    scalers = [StandardScaler().fit(X)] if scaled else []
+    model = factory(tmp_path).fit(scalers[0].transform(X) if scaled else X, y)
+
+    compiled = compile_model(model, scalers)
+    assert compiled.task == ('classification' if classifier else 'regression')
+    assert parity_error(compiled, model, scalers) <= PARITY_TOLERANCE
+
+    # The stored arrays predict the same as the compiled model
+    path = tmp_path / 'model.npz'
+    compiled.save(str(path))
+    loaded = load_compiled(str(path))
+    X_test = X.iloc[:50]
+    if classifier:
+        np.testing.assert_array_equal(loaded.predict_proba(X_test), compiled.predict_proba(X_test))
+    else:
+        np.testing.assert_array_equal(loaded.predict(X_test), compiled.predict(X_test))
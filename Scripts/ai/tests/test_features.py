@@ -0,0 +1,145 @@
+import numpy as np
+import pandas as pd
+
+from utils.feature_store import H2H_FEATURES, SIDE_FEATURES, FeatureStore
+from utils.features import compute_features, compute_live_features, games_from_team_rows, previous_values, shifted_rolling
+
+STATS = ['teamScore', 'fieldGoalsAttempted', 'fieldGoalsMade', 'threePointersMade', 'freeThrowsAttempted', 'turnovers']
+
+
+def games_fixture(n=300, seed=0):
+    rng = np.random.default_rng(seed)
+    home = rng.integers(0, 6, n)
+    games = {
+        'gameId': np.arange(n),
+        'gameDate': pd.Timestamp('2023-10-20') + pd.to_timedelta(rng.integers(0, 200, n), 'D'),
+        'home_teamId': home,
+        'away_teamId': (home + rng.integers(1, 6, n)) % 6,
+    }
+    for side in ('home', 'away'):
+        for stat in STATS:
+            games[f'{side}_{stat}'] = rng.integers(5, 120, n).astype(float)
+    games = pd.DataFrame(games)
+    games['home_win'] = (games['home_teamScore'] > games['away_teamScore']).astype(int)
+    games['away_win'] = 1 - games['home_win']
+    return games
+
+
+# LeagueGameFinder team rows of a season, every team plays at most once a day
+def team_rows_fixture(days=30, teams=8, seed=0):
+    rng = np.random.default_rng(seed)
+    rows = []
+    for day, date in enumerate(pd.date_range('2025-10-21', periods=days)):
+        order = rng.permutation(teams) + 1610612737
+        for i, (home, away) in enumerate(zip(order[0::2], order[1::2])):
+            pts = rng.integers(90, 130, 2)
+            pts[1] += pts[0] == pts[1]
+            for team, opponent, own, other, matchup in ((home, away, pts[0], pts[1], ' vs. '), (away, home, pts[1], pts[0], ' @ ')):
+                rows.append({
+                    'SEASON_ID': '22025', 'TEAM_ID': team, 'GAME_ID': f'00225{day:03d}{i:02d}', 'GAME_DATE': date,
+                    'MATCHUP': f'T{team}{matchup}T{opponent}', 'WL': 'W' if own > other else 'L', 'PTS': own,
+                    'FGM': rng.integers(35, 50), 'FGA': rng.integers(80, 95), 'FG3M': rng.integers(8, 20),
+                    'FTA': rng.integers(15, 30), 'TOV': rng.integers(8, 18),
+                })
+    return pd.DataFrame(rows)
+
+
+# The per team lambdas the training notebooks used before compute_features
+def notebook_rolling(df, side, column, window, stat='mean', min_periods=1):
+    return df.groupby(f'{side}_teamId')[column].transform(
+        lambda x: getattr(x.shift(1).rolling(window=window, min_periods=min_periods), stat)()
+    )
+
+
+def notebook_weighted(df, side, column):
+    return df.groupby(f'{side}_teamId')[column].transform(
+        lambda x: x.shift(1).rolling(window=5, min_periods=1).apply(
+            lambda vals: np.average(vals, weights=range(1, len(vals) + 1)) if len(vals) > 0 else np.nan
+        )
+    )
+
+
+def notebook_momentum(df, side, column):
+    return df.groupby(f'{side}_teamId')[column].transform(
+        lambda x: x.shift(1).rolling(window=3, min_periods=2).apply(
+            lambda vals: vals.iloc[-1] - vals.iloc[0] if len(vals) >= 2 else 0
+        )
+    )
+
+
+def test_shared_features_match_notebook_formulas():
+    df = compute_features(games_fixture())
+
+    for side, other in (('home', 'away'), ('away', 'home')):
+        possessions = (
+            df[f'{side}_fieldGoalsAttempted'] + 0.44 * df[f'{side}_freeThrowsAttempted'] + df[f'{side}_turnovers']
+        )
+        off_efficiency = df[f'{side}_teamScore'] / possessions.replace(0, np.nan)
+        ts = df[f'{side}_teamScore'] / (
+            2 * (df[f'{side}_fieldGoalsAttempted'] + 0.44 * df[f'{side}_freeThrowsAttempted'])
+        ).replace(0, np.nan)
+        efg = (
+            df[f'{side}_fieldGoalsMade'] + 0.5 * df[f'{side}_threePointersMade']
+        ) / df[f'{side}_fieldGoalsAttempted'].replace(0, np.nan)
+        tov_rate = df[f'{side}_turnovers'] / possessions.replace(0, np.nan)
+        notebook = df.assign(off_efficiency=off_efficiency, TS=ts, eFG=efg, tov_rate=tov_rate)
+
+        expected = {
+            f'{side}_off_eff_L5': notebook_rolling(notebook, side, 'off_efficiency', 5),
+            f'{side}_off_eff_L10': notebook_rolling(notebook, side, 'off_efficiency', 10),
+            f'{side}_def_efficiency': notebook_rolling(notebook, side, f'{other}_teamScore', 5),
+            f'{side}_TS_L5': notebook_rolling(notebook, side, 'TS', 5),
+            f'{side}_eFG_L10': notebook_rolling(notebook, side, 'eFG', 10),
+            f'{side}_tov_rate_L5': notebook_rolling(notebook, side, 'tov_rate', 5),
+        }
+        for column, values in expected.items():
+            pd.testing.assert_series_equal(df[column], values, check_names=False, rtol=1e-12)
+
+
+def test_notebook_helpers_match_lambdas():
+    df = compute_features(games_fixture())
+
+    for side in ('home', 'away'):
+        keys = [df[f'{side}_teamId']]
+        score = df[f'{side}_teamScore']
+
+        std = shifted_rolling(score, keys, 10, min_periods=3, stat='std')
+        pd.testing.assert_series_equal(std, notebook_rolling(df, side, f'{side}_teamScore', 10, 'std', 3),
+                                       check_names=False, rtol=1e-12)
+
+        pts = previous_values(score, keys, 5)
+        pd.testing.assert_series_equal(pts[0] - pts[2], notebook_momentum(df, side, f'{side}_teamScore'),
+                                       check_names=False)
+        weighted = sum((5 - k) * p for k, p in enumerate(pts)) / 15
+        pd.testing.assert_series_equal(weighted, notebook_weighted(df, side, f'{side}_teamScore'),
+                                       check_names=False, rtol=1e-12)
+
+
+def test_serving_features_match_training_rows(tmp_path):
+    team_rows = team_rows_fixture()
+    as_of = pd.Timestamp('2025-11-10')
+
+    # Training: the rows of the as_of games in the features of the whole log
+    training = compute_features(games_from_team_rows(team_rows))
+    training = training[training['gameDate'] == as_of.tz_localize('UTC')]
+    training = training.sort_values('home_teamId').reset_index(drop=True)
+    matchups = list(zip(training['home_teamId'], training['away_teamId']))
+    assert len(matchups) == 4
+
+    # Serving: live features from the games before as_of, and the feature store snapshot of as_of
+    history = games_from_team_rows(team_rows[team_rows['GAME_DATE'] < as_of])
+    live = compute_live_features(history, matchups, as_of)
+
+    store = FeatureStore('2025-26', root_dir=str(tmp_path))
+    store.append(team_rows, as_of=as_of)
+    stored = store.game_features(pd.DataFrame({
+        'gameDate': as_of,
+        'home_teamId': [home for home, _ in matchups],
+        'away_teamId': [away for _, away in matchups],
+    }))
+
+    columns = (SIDE_FEATURES['home'] + SIDE_FEATURES['away'] + H2H_FEATURES
+               + ['points_avg_diff', 'winrate_diff', 'home_elo', 'away_elo', 'elo_diff'])
+    expected = training[columns].astype(float)
+    pd.testing.assert_frame_equal(live[columns].astype(float), expected, rtol=1e-9)
+    pd.testing.assert_frame_equal(stored[columns].astype(float), expected, rtol=1e-9)
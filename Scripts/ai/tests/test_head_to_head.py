@@ -0,0 +1,50 @@
+import numpy as np
+import pandas as pd
+
+from utils.data_handler import compute_head_to_head_avg
+from utils.features import compute_head_to_head_avgs
+
+
+def games_fixture():
+    rows = [
+        # home, away, date, home score, away score
+        (1, 2, '2024-10-22', 110, 100),
+        (2, 1, '2024-10-25', 95, 99),
+        (1, 2, '2024-11-02', 120, 118),
+        (1, 2, '2024-11-02', 101, 104),  # same pair on the same day, must not see each other
+        (3, 1, '2024-11-05', 88, 90),
+        (1, 3, '2024-11-08', 112, 109),
+        (1, 2, '2024-11-20', np.nan, np.nan),  # unplayed
+        (1, 2, '2024-12-01', 107, 103),
+        (3, 1, '2024-12-03', np.nan, np.nan),  # unplayed
+        (2, 3, '2024-12-05', 99, 97),
+    ]
+    df = pd.DataFrame(rows, columns=['home_teamId', 'away_teamId', 'gameDate', 'home_teamScore', 'away_teamScore'])
+    df['gameDate'] = pd.to_datetime(df['gameDate'])
+    # Not sorted by date, like the merged frames the functions receive
+    return df.sample(frac=1, random_state=0)
+
+
+def test_vectorized_head_to_head_matches_rowwise():
+    df = games_fixture()
+    expected = df.apply(lambda row: compute_head_to_head_avg(row, df), axis=1).astype(float)
+    expected.columns = ['home_head_to_head_avg_points', 'away_head_to_head_avg_points']
+
+    result = compute_head_to_head_avgs(df)
+
+    assert result.index.equals(df.index)
+    pd.testing.assert_frame_equal(result, expected, check_dtype=False)
+
+
+def test_same_day_repeat_and_unplayed_games():
+    df = games_fixture().sort_values('gameDate', kind='mergesort')
+    result = compute_head_to_head_avgs(df)
+
+    same_day = df.index[(df['gameDate'] == '2024-11-02')]
+    # Both only see the 2024-10-22 game of the same orientation
+    assert (result.loc[same_day, 'home_head_to_head_avg_points'] == 110).all()
+    assert (result.loc[same_day, 'away_head_to_head_avg_points'] == 100).all()
+
+    # The unplayed game does not count for the later one
+    later = df.index[df['gameDate'] == '2024-12-01'][0]
+    assert result.loc[later, 'home_head_to_head_avg_points'] == np.mean([110, 120, 101])
@@ -0,0 +1,127 @@
+import base64
+import hashlib
+import io
+
+import pandas as pd
+
+from utils.season_log import LOG_COLUMNS, SeasonLog
+
+
+class Blob:
+    def __init__(self, bucket, name):
+        self.bucket = bucket
+        self.name = name
+
+    @property
+    def md5_hash(self):
+        return base64.b64encode(hashlib.md5(self.bucket.blobs[self.name]).digest()).decode('ascii')
+
+    def download_to_filename(self, path):
+        self.bucket.downloads.append(self.name)
+        with open(path, 'wb') as f:
+            f.write(self.bucket.blobs[self.name])
+
+    def upload_from_filename(self, path):
+        with open(path, 'rb') as f:
+            self.bucket.blobs[self.name] = f.read()
+
+
+class Bucket:
+    def __init__(self):
+        self.blobs = {}
+        self.downloads = []
+
+    def blob(self, name):
+        return Blob(self, name)
+
+    def list_blobs(self, prefix=''):
+        return [Blob(self, name) for name in sorted(self.blobs) if name.startswith(prefix)]
+
+
+def team_rows(date, game_id):
+    return pd.DataFrame({
+        'GAME_ID': [game_id, game_id],
+        'TEAM_ID': [1, 2],
+        'GAME_DATE': pd.to_datetime([date, date]),
+        'PTS': [100, 98],
+    })
+
+
+def parquet_bytes(rows):
+    buffer = io.BytesIO()
+    rows.to_parquet(buffer, index=False)
+    return buffer.getvalue()
+
+
+def test_sync_downloads_missing_and_changed_dates(tmp_path):
+    bucket = Bucket()
+    dates = [f'2025-10-{day:02d}' for day in range(21, 31)]
+    for i, date in enumerate(dates):
+        bucket.blobs[f'data/season_log/2025-26/{date}.parquet'] = parquet_bytes(team_rows(date, str(i)))
+
+    log = SeasonLog('2025-26', root_dir=str(tmp_path), bucket=bucket)
+    assert log.sync_from_bucket() == len(dates)
+    assert log.stored_dates() == dates
+    assert len(log.load()) == 2 * len(dates)
+
+    # Unchanged files are not downloaded again, a changed one is
+    changed = f'data/season_log/2025-26/{dates[3]}.parquet'
+    bucket.blobs[changed] = parquet_bytes(team_rows(dates[3], 'replaced'))
+    bucket.downloads.clear()
+    assert log.sync_from_bucket() == 1
+    assert bucket.downloads == [changed]
+    assert 'replaced' in set(log.load()['GAME_ID'])
+
+
+def test_empty_log_keeps_the_columns(tmp_path):
+    # Before the first game of a season nothing is stored and nothing is fetched
+    log = SeasonLog('2026-27', root_dir=str(tmp_path), fetch_fn=lambda season, date_from: pd.DataFrame())
+    assert log.refresh() == 0
+
+    df = log.load()
+    assert df.empty
+    assert list(df.columns) == LOG_COLUMNS
+    assert df['GAME_DATE'].dt.normalize().between('2026-10-01', '2026-10-02').empty
+    assert list(log.load(columns=['GAME_ID', 'GAME_DATE']).columns) == ['GAME_ID', 'GAME_DATE']
+
+
+class StubFetch:
+    def __init__(self, *responses):
+        self.responses = list(responses)
+        self.calls = []
+
+    def __call__(self, season, date_from):
+        self.calls.append((season, date_from))
+        return self.responses.pop(0)
+
+
+def test_refresh_fetches_from_the_last_stored_date(tmp_path):
+    fetch = StubFetch(
+        pd.concat([team_rows('2025-10-21', '1'), team_rows('2025-10-23', '2')]),
+        pd.DataFrame(),
+    )
+    log = SeasonLog('2025-26', root_dir=str(tmp_path), fetch_fn=fetch)
+
+    assert log.refresh() == 4
+    assert log.stored_dates() == ['2025-10-21', '2025-10-23']
+    assert log.refresh() == 0
+    assert fetch.calls == [('2025-26', None), ('2025-26', pd.Timestamp('2025-10-23'))]
+
+
+def test_refresh_drops_duplicates_of_an_overlapping_fetch(tmp_path):
+    # The second fetch starts at the last stored date, so it returns that date's game again,
+    # once with a corrected score and once more as an exact repeat
+    corrected = team_rows('2025-10-23', '2').assign(PTS=[111, 109])
+    fetch = StubFetch(
+        pd.concat([team_rows('2025-10-21', '1'), team_rows('2025-10-23', '2')]),
+        pd.concat([team_rows('2025-10-23', '2'), corrected, team_rows('2025-10-25', '3')]),
+    )
+    log = SeasonLog('2025-26', root_dir=str(tmp_path), fetch_fn=fetch)
+    log.refresh()
+
+    assert log.refresh() == 4
+    df = log.load()
+    assert len(df) == 6
+    assert not df.duplicated(['GAME_ID', 'TEAM_ID']).any()
+    assert df.loc[df['GAME_ID'] == '2', 'PTS'].tolist() == [111, 109]
+    assert log.stored_dates() == ['2025-10-21', '2025-10-23', '2025-10-25']
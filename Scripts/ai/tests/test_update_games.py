@@ -0,0 +1,35 @@
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+pytest.importorskip('functions_framework')
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), 'nba_updater'))
+
+from update_games import GAME_SIDE_FIELDS, format_games  # noqa: E402
+
+
+# Home and away LeagueGameFinder rows of one game
+def game_rows(game_id, home=1610612737, away=1610612738):
+    rows = []
+    for team, opponent, matchup, wl in ((home, away, ' vs. ', 'W'), (away, home, ' @ ', 'L')):
+        row = {
+            'SEASON_ID': '22025', 'TEAM_ID': team, 'TEAM_NAME': f'T{team}', 'GAME_ID': game_id,
+            'GAME_DATE': pd.Timestamp('2025-11-10'), 'MATCHUP': f'T{team}{matchup}T{opponent}', 'WL': wl, 'MIN': 240,
+        }
+        row.update({column: 10 for _, column, _ in GAME_SIDE_FIELDS})
+        rows.append(row)
+    return rows
+
+
+def test_format_games_skips_games_with_missing_stats():
+    team_rows = pd.DataFrame(game_rows('0022500001') + game_rows('0022500002') + game_rows('0022500003'))
+    team_rows.loc[2, 'FGA'] = np.nan  # home row of the second game
+
+    formatted = format_games(team_rows, {})
+
+    assert formatted['game_id'].tolist() == [22500001, 22500003]
+    assert formatted['fga_home'].dtype == 'int64'
+    assert formatted['team_id_home'].tolist() == [1610612737, 1610612737]
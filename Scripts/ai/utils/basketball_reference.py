@@ -0,0 +1,66 @@
+"""
+This module parses basketball-reference schedule pages (one HTML file per month).
+
+Each parsed month is cached as a pickle keyed by the file path and its mtime,
+so re-runs only parse months that are new or changed. It is kept apart from
+data_handler so process pool workers can import it without loading the
+team statistics dataset.
+"""
+
+import hashlib
+import os
+import pandas as pd
+
+SCHEDULE_COLUMNS = ['gameDate', 'visitor_team', 'home_team', 'overtime_marker']
+
+
+# Parse one month file into (gameDate, visitor_team, home_team, overtime_marker)
+def parse_schedule_file(month_path):
+    dfs = pd.read_html(month_path)
+    df = dfs[0]
+
+    df['gameDate'] = df['Date'].astype(str) + ' ' + df['Start (ET)'].astype(str)
+
+    df['gameDate'] = (
+        df['gameDate']
+        .str.replace(r'(?<=\d)([ap])$', r'\1m', regex=True)
+    )
+    df['gameDate'] = pd.to_datetime(
+        df['gameDate'],
+        format='%a, %b %d, %Y %I:%M%p',
+        errors='coerce'
+    ).dt.date
+
+    df['Visitor/Neutral'] = df['Visitor/Neutral'].astype(str).str.strip()
+    df['Home/Neutral'] = df['Home/Neutral'].astype(str).str.strip()
+
+    # The unnamed 8th column holds 'OT', '2OT', ... for overtime games
+    schedule = df[['gameDate', 'Visitor/Neutral', 'Home/Neutral', 'Unnamed: 7']]
+    schedule.columns = SCHEDULE_COLUMNS
+    return schedule
+
+
+def _cache_path(cache_dir, month_path, mtime_ns):
+    key = hashlib.sha1(os.path.abspath(month_path).encode('utf-8')).hexdigest()
+    return os.path.join(cache_dir, f'{key}_{mtime_ns}.pkl')
+
+
+# Parse a month file through the cache, returns (month_path, schedule or None, error or None)
+def load_schedule_file(month_path, cache_dir):
+    try:
+        mtime_ns = os.stat(month_path).st_mtime_ns
+        cache_path = _cache_path(cache_dir, month_path, mtime_ns)
+        if os.path.exists(cache_path):
+            return month_path, pd.read_pickle(cache_path), None
+
+        schedule = parse_schedule_file(month_path)
+
+        # Replace the cached parse of an older version of the same file
+        prefix = os.path.basename(cache_path).split('_')[0]
+        for name in os.listdir(cache_dir):
+            if name.startswith(prefix + '_'):
+                os.remove(os.path.join(cache_dir, name))
+        schedule.to_pickle(cache_path)
+        return month_path, schedule, None
+    except Exception as e:
+        return month_path, None, f'{type(e).__name__}: {e}'
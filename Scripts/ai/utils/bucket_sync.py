@@ -0,0 +1,39 @@
+"""
+This module mirrors bucket files to a local directory for the season log and the feature store.
+
+A file is downloaded when it is missing locally or its MD5 differs from the
+md5_hash of the blob, so unchanged files are never fetched twice.
+"""
+
+import base64
+import hashlib
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+DOWNLOAD_WORKERS = 16  # parallel blob downloads, a season has one file per game date
+
+
+# Base64 MD5 of a local file, in the format of blob.md5_hash
+def md5(path):
+    digest = hashlib.md5()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return base64.b64encode(digest.digest()).decode('ascii')
+
+
+def sync_prefix(bucket, prefix, local_dir):
+    """
+    Downloads the blobs under prefix that are missing in local_dir or differ
+    from the local copy, in parallel. Returns the number of downloaded files.
+    """
+    missing = []
+    for blob in bucket.list_blobs(prefix=prefix):
+        path = os.path.join(local_dir, os.path.basename(blob.name))
+        if not (os.path.exists(path) and md5(path) == blob.md5_hash):
+            missing.append((blob, path))
+    if not missing:
+        return 0
+    with ThreadPoolExecutor(max_workers=min(DOWNLOAD_WORKERS, len(missing))) as pool:
+        list(pool.map(lambda item: item[0].download_to_filename(item[1]), missing))
+    return len(missing)
@@ -0,0 +1,492 @@
+"""
+This module compiles trained models into plain NumPy arrays for serving.
+
+compile_model folds the StandardScaler a model was trained behind into it and
+flattens the estimator: linear models into coefficients (the scaler folded
+into them), sklearn tree ensembles (random forests, gradient boosting) into
+flat node arrays and CatBoost models into their oblivious trees. Tree models
+keep the scaler as an affine input transform, so their splits see exactly
+the values the estimator saw.
+
+CompiledModel evaluates the arrays with vectorized NumPy behind the
+predict / predict_proba interface of the estimators and is stored as an .npz
+file, so serving loads it without importing sklearn or catboost. Nothing here
+imports them either, the estimators are read through their attributes.
+"""
+
+import json
+import os
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+FORMAT_VERSION = 1
+PARITY_TOLERANCE = 1e-6
+METADATA = ('task', 'link', 'source')
+
+
+def expit(x):
+    return 1 / (1 + np.exp(-x))
+
+
+# compiled/<model>.npz for models/<model>.pkl
+def compiled_artifact_name(name):
+    stem = os.path.splitext(os.path.basename(name))[0]
+    return f'compiled/{stem}.npz'
+
+
+class CompiledModel:
+    """
+    Base of the compiled models: input selection and scaling, and the
+    regression / binary classification outputs of a raw score.
+    """
+
+    kind = None
+
+    def __init__(self, task, n_features, link='identity', feature_names=None, classes=None,
+                 shift=None, scale=None, source=None):
+        if task not in ('regression', 'classification'):
+            raise ValueError(f'Unknown task: {task}')
+        self.task = task
+        self.n_features = int(n_features)
+        self.link = link  # 'identity' or 'logistic', maps the raw score to the positive class probability
+        self.feature_names = None if feature_names is None else [str(name) for name in feature_names]
+        self.classes = None if classes is None else np.asarray(classes)
+        self.shift = None if shift is None else np.asarray(shift, dtype=np.float64)
+        self.scale = None if scale is None else np.asarray(scale, dtype=np.float64)
+        self.source = source
+
+    # Feature matrix in the model's input space, columns selected by name for frames
+    def _inputs(self, X):
+        if self.feature_names is not None and hasattr(X, 'columns'):
+            X = X[self.feature_names]
+        X = np.asarray(X, dtype=np.float64)
+        if X.ndim == 1:
+            X = X.reshape(1, -1)
+        if X.shape[1] != self.n_features:
+            raise ValueError(f'X has {X.shape[1]} features, the model expects {self.n_features}')
+        if self.shift is not None:
+            X = (X - self.shift) / self.scale
+        return X
+
+    def decision_function(self, X):
+        raise NotImplementedError
+
+    def predict(self, X):
+        raw = self.decision_function(X)
+        if self.task == 'regression':
+            return raw
+        return self.classes[(self._positive(raw) > 0.5).astype(int)]
+
+    def predict_proba(self, X):
+        if self.task != 'classification':
+            raise AttributeError('predict_proba is only available for classifiers')
+        p = self._positive(self.decision_function(X))
+        return np.column_stack([1 - p, p])
+
+    def _positive(self, raw):
+        return expit(raw) if self.link == 'logistic' else raw
+
+    def arrays(self):
+        arrays = {
+            'format_version': np.array(FORMAT_VERSION),
+            'kind': np.array(self.kind),
+            'task': np.array(self.task),
+            'n_features': np.array(self.n_features),
+            'link': np.array(self.link),
+            'source': np.array(self.source or ''),
+        }
+        if self.feature_names is not None:
+            arrays['feature_names'] = np.array(self.feature_names)
+        if self.classes is not None:
+            arrays['classes'] = self.classes.astype(str) if self.classes.dtype == object else self.classes
+        if self.shift is not None:
+            arrays['shift'] = self.shift
+            arrays['scale'] = self.scale
+        return arrays
+
+    def save(self, path):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, 'wb') as f:
+            np.savez(f, **self.arrays())
+
+
+class LinearModel(CompiledModel):
+    kind = 'linear'
+
+    def __init__(self, coef, intercept, **kwargs):
+        super().__init__(**kwargs)
+        self.coef = np.asarray(coef, dtype=np.float64)
+        self.intercept = float(intercept)
+
+    def decision_function(self, X):
+        return self._inputs(X) @ self.coef + self.intercept
+
+    def arrays(self):
+        return {**super().arrays(), 'coef': self.coef, 'intercept': np.array(self.intercept)}
+
+
+class TreeEnsemble(CompiledModel):
+    """
+    Binary trees flattened into node arrays, every tree starting at its root
+    in roots. Leaves point to themselves, so all samples walk depth steps.
+    raw = base + weight * sum of the leaf values.
+    """
+
+    kind = 'trees'
+
+    def __init__(self, feature, threshold, left, right, value, missing_left, roots, depth,
+                 weight=1.0, base=0.0, **kwargs):
+        super().__init__(**kwargs)
+        self.feature = np.asarray(feature, dtype=np.int32)
+        self.threshold = np.asarray(threshold, dtype=np.float64)
+        self.left = np.asarray(left, dtype=np.int32)
+        self.right = np.asarray(right, dtype=np.int32)
+        self.value = np.asarray(value, dtype=np.float64)
+        self.missing_left = np.asarray(missing_left, dtype=bool)
+        self.roots = np.asarray(roots, dtype=np.int32)
+        self.depth = int(depth)
+        self.weight = float(weight)
+        self.base = float(base)
+
+    def decision_function(self, X):
+        X = self._inputs(X).astype(np.float32)  # sklearn trees split float32 features
+        node = np.tile(self.roots, (len(X), 1))
+        rows = np.arange(len(X))[:, None]
+        for _ in range(self.depth):
+            x = X[rows, self.feature[node]]
+            go_left = np.where(np.isnan(x), self.missing_left[node], x <= self.threshold[node])
+            node = np.where(go_left, self.left[node], self.right[node])
+        return self.base + self.weight * self.value[node].sum(axis=1)
+
+    def arrays(self):
+        return {
+            **super().arrays(),
+            'feature': self.feature, 'threshold': self.threshold, 'left': self.left, 'right': self.right,
+            'value': self.value, 'missing_left': self.missing_left, 'roots': self.roots,
+            'depth': np.array(self.depth), 'weight': np.array(self.weight), 'base': np.array(self.base),
+        }
+
+
+class ObliviousEnsemble(CompiledModel):
+    """
+    CatBoost's oblivious trees: every level of a tree tests one split, the
+    bits of the levels (x > border) index the tree's leaf values. Trees are
+    padded to the deepest one with splits that never fire.
+    raw = base + weight * sum of the leaf values.
+    """
+
+    kind = 'oblivious'
+
+    def __init__(self, split_feature, border, leaf_values, weight=1.0, base=0.0, **kwargs):
+        super().__init__(**kwargs)
+        self.split_feature = np.asarray(split_feature, dtype=np.int32)  # (trees, depth)
+        self.border = np.asarray(border, dtype=np.float32)  # (trees, depth)
+        self.leaf_values = np.asarray(leaf_values, dtype=np.float64)  # (trees, 2 ** depth)
+        self.weight = float(weight)
+        self.base = float(base)
+
+    def decision_function(self, X):
+        X = self._inputs(X).astype(np.float32)  # CatBoost splits float32 features
+        bits = X[:, self.split_feature] > self.border
+        leaf = bits.astype(np.int64) @ (1 << np.arange(self.border.shape[1]))
+        values = self.leaf_values[np.arange(len(self.leaf_values)), leaf]
+        return self.base + self.weight * values.sum(axis=1)
+
+    def arrays(self):
+        return {
+            **super().arrays(),
+            'split_feature': self.split_feature, 'border': self.border, 'leaf_values': self.leaf_values,
+            'weight': np.array(self.weight), 'base': np.array(self.base),
+        }
+
+
+MODEL_KINDS = {cls.kind: cls for cls in (LinearModel, TreeEnsemble, ObliviousEnsemble)}
+
+
+def load_compiled(path):
+    with np.load(path, allow_pickle=False) as data:
+        arrays = {name: data[name] for name in data.files}
+
+    version = int(arrays.pop('format_version'))
+    if version != FORMAT_VERSION:
+        raise ValueError(f'{path}: compiled model format {version}, expected {FORMAT_VERSION}')
+    kind = str(arrays.pop('kind'))
+    if kind not in MODEL_KINDS:
+        raise ValueError(f'{path}: unknown compiled model kind {kind}')
+
+    for name in METADATA:
+        arrays[name] = str(arrays[name]) or None
+    return MODEL_KINDS[kind](**arrays)
+
+
+# =========================
+# COMPILING
+# =========================
+
+def _fold_scalers(scalers, n_features):
+    """
+    (shift, scale) of the StandardScalers applied one after the other,
+    None for no scaler.
+    """
+    if not scalers:
+        return None, None
+
+    shift, scale = np.zeros(n_features), np.ones(n_features)
+    for scaler in scalers:
+        if type(scaler).__name__ != 'StandardScaler':
+            raise TypeError(f'Only StandardScaler can be folded into a model, got {type(scaler).__name__}')
+        mean = scaler.mean_ if getattr(scaler, 'mean_', None) is not None else np.zeros(n_features)
+        std = scaler.scale_ if getattr(scaler, 'scale_', None) is not None else np.ones(n_features)
+        # ((x - shift) / scale - mean) / std == (x - (shift + mean * scale)) / (scale * std)
+        shift, scale = shift + mean * scale, scale * std
+    return shift, scale
+
+
+def _feature_names(*estimators):
+    for estimator in estimators:
+        names = getattr(estimator, 'feature_names_in_', None)
+        if names is not None:
+            return list(names)
+    return None
+
+
+def _classes(model):
+    classes = np.asarray(model.classes_)
+    if len(classes) != 2:
+        raise TypeError(f'Only binary classifiers can be compiled, {type(model).__name__} has {len(classes)} classes')
+    return classes
+
+
+def _compile_linear(model, shift, scale, **kwargs):
+    coef = np.ravel(model.coef_)
+    intercept = float(np.ravel(model.intercept_)[0]) if np.ndim(model.intercept_) else float(model.intercept_)
+    if np.ndim(model.coef_) > 1 and np.shape(model.coef_)[0] != 1:
+        raise TypeError(f'Only single output linear models can be compiled, got coef_ of shape {np.shape(model.coef_)}')
+
+    # ((x - shift) / scale) @ coef + intercept == x @ (coef / scale) + intercept - (shift / scale) @ coef
+    if shift is not None:
+        intercept -= float((shift / scale) @ coef)
+        coef = coef / scale
+    return LinearModel(coef, intercept, **kwargs)
+
+
+def _flatten_trees(trees, leaf_value):
+    """
+    Node arrays of sklearn Tree objects concatenated, children as absolute
+    node indices. leaf_value(tree) gives the value of every node of a tree.
+    """
+    parts = {name: [] for name in ('feature', 'threshold', 'left', 'right', 'value', 'missing_left')}
+    roots, depth, offset = [], 0, 0
+    for tree in trees:
+        nodes = np.arange(tree.node_count)
+        is_leaf = tree.children_left < 0
+        parts['feature'].append(np.where(is_leaf, 0, tree.feature))
+        parts['threshold'].append(np.where(is_leaf, 0.0, tree.threshold))
+        parts['left'].append(np.where(is_leaf, nodes, tree.children_left) + offset)
+        parts['right'].append(np.where(is_leaf, nodes, tree.children_right) + offset)
+        parts['value'].append(leaf_value(tree))
+        missing_left = getattr(tree, 'missing_go_to_left', None)  # sklearn >= 1.3
+        parts['missing_left'].append(np.zeros(tree.node_count, dtype=bool) if missing_left is None else missing_left.astype(bool))
+        roots.append(offset)
+        depth = max(depth, tree.max_depth)
+        offset += tree.node_count
+    return {name: np.concatenate(arrays) for name, arrays in parts.items()} | {'roots': roots, 'depth': depth}
+
+
+def _regression_value(tree):
+    return tree.value[:, 0, 0]
+
+
+def _positive_class_fraction(tree):
+    counts = tree.value[:, 0, :]
+    return counts[:, 1] / counts.sum(axis=1)
+
+
+def _gradient_boosting_base(model, classifier):
+    init = model.init_
+    if isinstance(init, str) and init == 'zero':
+        return 0.0
+    if classifier and hasattr(init, 'class_prior_'):
+        eps = np.finfo(np.float32).eps
+        p = float(np.clip(init.class_prior_[1], eps, 1 - eps))
+        return float(np.log(p / (1 - p)))
+    if not classifier and hasattr(init, 'constant_'):
+        return float(np.ravel(init.constant_)[0])
+    raise TypeError(f'Unsupported gradient boosting init estimator: {type(init).__name__}')
+
+
+def _compile_sklearn_trees(model, name, **kwargs):
+    if name in ('RandomForestRegressor', 'ExtraTreesRegressor'):
+        trees = [estimator.tree_ for estimator in model.estimators_]
+        arrays = _flatten_trees(trees, _regression_value)
+        return TreeEnsemble(**arrays, weight=1 / len(trees), **kwargs)
+
+    if name in ('RandomForestClassifier', 'ExtraTreesClassifier'):
+        _classes(model)
+        trees = [estimator.tree_ for estimator in model.estimators_]
+        arrays = _flatten_trees(trees, _positive_class_fraction)
+        return TreeEnsemble(**arrays, weight=1 / len(trees), **kwargs)
+
+    if name == 'DecisionTreeRegressor':
+        return TreeEnsemble(**_flatten_trees([model.tree_], _regression_value), **kwargs)
+
+    if name == 'DecisionTreeClassifier':
+        _classes(model)
+        return TreeEnsemble(**_flatten_trees([model.tree_], _positive_class_fraction), **kwargs)
+
+    if name == 'GradientBoostingRegressor':
+        trees = [estimator.tree_ for estimator in model.estimators_[:, 0]]
+        arrays = _flatten_trees(trees, _regression_value)
+        return TreeEnsemble(**arrays, weight=model.learning_rate,
+                            base=_gradient_boosting_base(model, classifier=False), **kwargs)
+
+    if name == 'GradientBoostingClassifier':
+        _classes(model)
+        if model.loss not in ('log_loss', 'deviance'):
+            raise TypeError(f'Only log_loss gradient boosting classifiers can be compiled, got {model.loss}')
+        trees = [estimator.tree_ for estimator in model.estimators_[:, 0]]
+        arrays = _flatten_trees(trees, _regression_value)
+        return TreeEnsemble(**arrays, weight=model.learning_rate,
+                            base=_gradient_boosting_base(model, classifier=True), **kwargs)
+
+    raise TypeError(f'Cannot compile {name}')
+
+
+def _compile_catboost(model, **kwargs):
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, 'model.json')
+        model.save_model(path, format='json')
+        with open(path) as f:
+            data = json.load(f)
+
+    if data['features_info'].get('categorical_features'):
+        raise TypeError('CatBoost models with categorical features cannot be compiled')
+
+    trees = data['oblivious_trees']
+    depth = max(len(tree['splits']) for tree in trees)
+    split_feature = np.zeros((len(trees), depth), dtype=np.int32)
+    border = np.full((len(trees), depth), np.inf, dtype=np.float32)  # padded levels never fire
+    leaf_values = np.zeros((len(trees), 2 ** depth))
+    for i, tree in enumerate(trees):
+        for level, split in enumerate(tree['splits']):
+            if split.get('split_type', 'FloatFeature') != 'FloatFeature':
+                raise TypeError(f"CatBoost split type {split['split_type']} cannot be compiled")
+            split_feature[i, level] = split['float_feature_index']
+            border[i, level] = split['border']
+        values = np.asarray(tree['leaf_values'], dtype=np.float64)
+        if len(values) != 2 ** len(tree['splits']):
+            raise TypeError('Only single output CatBoost models can be compiled')
+        leaf_values[i, :len(values)] = values
+
+    weight, bias = data.get('scale_and_bias', [1.0, [0.0]])
+    return ObliviousEnsemble(split_feature, border, leaf_values, weight=weight, base=np.ravel(bias)[0], **kwargs)
+
+
+def compile_model(model, scalers=()):
+    """
+    CompiledModel of a fitted estimator (or a Pipeline of StandardScalers and
+    an estimator) applied behind the given StandardScalers.
+    """
+    scalers = [scaler for scaler in scalers if scaler is not None]
+    if hasattr(model, 'steps'):  # Pipeline
+        *steps, (_, model) = model.steps
+        scalers += [step for _, step in steps if step not in (None, 'passthrough')]
+
+    name = type(model).__name__
+    classifier = hasattr(model, 'predict_proba')
+    if name in ('CatBoostClassifier', 'CatBoostRegressor'):
+        n_features = len(model.feature_names_)
+        names = list(model.feature_names_)
+        # CatBoost names unnamed features by their index
+        feature_names = _feature_names(*scalers) or (None if names == [str(i) for i in range(n_features)] else names)
+    else:
+        n_features = model.n_features_in_
+        feature_names = _feature_names(*scalers, model)
+
+    kwargs = {
+        'task': 'classification' if classifier else 'regression',
+        'n_features': n_features,
+        'feature_names': feature_names,
+        'classes': _classes(model) if classifier else None,
+        'source': name,
+    }
+    shift, scale = _fold_scalers(scalers, n_features)
+
+    if hasattr(model, 'coef_'):
+        if classifier and name != 'LogisticRegression':
+            raise TypeError(f'Only LogisticRegression classifiers can be compiled, got {name}')
+        return _compile_linear(model, shift, scale, link='logistic' if classifier else 'identity', **kwargs)
+
+    kwargs.update(shift=shift, scale=scale)
+    if name in ('CatBoostClassifier', 'CatBoostRegressor'):
+        return _compile_catboost(model, link='logistic' if classifier else 'identity', **kwargs)
+    link = 'logistic' if name == 'GradientBoostingClassifier' else 'identity'
+    return _compile_sklearn_trees(model, name, link=link, **kwargs)
+
+
+# =========================
+# PARITY
+# =========================
+
+def _split_points(compiled):
+    """
+    Split values per input feature of a compiled tree model, in the model's
+    (scaled) input space.
+    """
+    if isinstance(compiled, TreeEnsemble):
+        internal = compiled.left != np.arange(len(compiled.left))
+        features, values = compiled.feature[internal], compiled.threshold[internal]
+    elif isinstance(compiled, ObliviousEnsemble):
+        fires = np.isfinite(compiled.border)
+        features, values = compiled.split_feature[fires], compiled.border[fires].astype(np.float64)
+    else:
+        return {}
+    return {feature: values[features == feature] for feature in np.unique(features)}
+
+
+def sample_inputs(compiled, n=2000, seed=0):
+    """
+    Inputs for a parity check: uniform over the range of each feature's
+    splits (+-3 in the input space without splits), a tenth of them exactly
+    on a split value, mapped back through the model's scaler.
+    """
+    rng = np.random.default_rng(seed)
+    splits = _split_points(compiled)
+    Z = rng.uniform(-3, 3, size=(n, compiled.n_features))
+    for feature, values in splits.items():
+        low, high = values.min(), values.max()
+        margin = max(high - low, 1.0) * 0.1
+        Z[:, feature] = rng.uniform(low - margin, high + margin, size=n)
+        on_split = rng.random(n) < 0.1
+        Z[on_split, feature] = rng.choice(values, size=on_split.sum())
+
+    X = Z if compiled.shift is None else Z * compiled.scale + compiled.shift
+    if compiled.feature_names is not None:
+        return pd.DataFrame(X, columns=compiled.feature_names)
+    return X
+
+
+def reference_predictions(model, scalers, X):
+    for scaler in scalers:
+        if scaler is not None:
+            X = scaler.transform(X)
+    if hasattr(model, 'predict_proba'):
+        return model.predict_proba(X)[:, 1]
+    return model.predict(X)
+
+
+def parity_error(compiled, model, scalers=(), n=2000, seed=0):
+    """
+    Largest absolute difference between the compiled model and the estimator
+    behind its scalers (positive class probability for classifiers) over
+    sample_inputs.
+    """
+    X = sample_inputs(compiled, n=n, seed=seed)
+    expected = reference_predictions(model, scalers, X)
+    if compiled.task == 'classification':
+        actual = compiled.predict_proba(X)[:, 1]
+    else:
+        actual = compiled.predict(X)
+    return float(np.max(np.abs(actual - expected)))
@@ -3,51 +3,144 @@ This module handles data preparation and transformation for team and game statis
 
 It loads CSV files containing team and game data, cleans and merges them,
 and produces structured datasets for model training or analysis.
+
+Both datasets can also be stored as Parquet with an explicit schema
+(see convert_csv_to_parquet); the loaders then read only the requested
+columns and push the gameDate range down to the Parquet reader.
 """
 
 import pandas as pd
 import datetime as dt
 import os
+from concurrent.futures import ProcessPoolExecutor
+
+from utils.basketball_reference import SCHEDULE_COLUMNS, load_schedule_file
 
 utils_dir = os.path.dirname(__file__)
 
 ai_dir = os.path.dirname(utils_dir)
 scripts_dir = os.path.dirname(ai_dir)
-data_dir = os.path.join(ai_dir, 'data')
+data_dir = os.environ.get('STATISTIQ_DATA_DIR', os.path.join(ai_dir, 'data'))
 basketball_reference_dir = os.path.join(data_dir, 'basketball_reference')
+schedule_cache_dir = os.path.join(data_dir, 'cache', 'basketball_reference')
 
 csv_path = os.path.join(data_dir, 'team_statistics.csv')
 ids_path = os.path.join(data_dir, 'team_ids.csv')
 games_path = os.path.join(data_dir, 'games.csv')
 
+parquet_dir = os.path.join(data_dir, 'parquet')
+team_stats_parquet_path = os.path.join(parquet_dir, 'team_statistics.parquet')
+games_parquet_path = os.path.join(parquet_dir, 'games.parquet')
+
 print(basketball_reference_dir)
 
-# Load the main file for the original statistics
-df = pd.read_csv(csv_path)
+# Explicit schema for the stored datasets, everything else numeric is stored as float32
+DATE_COLUMNS = ['gameDate']
+ID_COLUMNS = [
+    'gameId', 'teamId', 'opponentTeamId', 'coachId',
+    'home_teamId', 'away_teamId', 'home_coachId', 'away_coachId',
+]
+CATEGORY_COLUMNS = [
+    'teamCity', 'teamName', 'opponentTeamCity', 'opponentTeamName',
+    'home_teamCity', 'home_teamName', 'away_teamCity', 'away_teamName',
+]
+BOOL_COLUMNS = ['overtime']
+INT_COLUMNS = [
+    'home', 'win', 'teamScore', 'opponentScore',
+    'home_win', 'away_win', 'home_teamScore', 'away_teamScore',
+]
+
+# Cast a raw CSV frame to the storage schema, as a new frame (the given one is left unchanged)
+def apply_schema(df):
+    df = df.drop(columns=[c for c in df.columns if c.startswith('Unnamed:')])
+
+    converted = {}
+    for col in df.columns:
+        if col in DATE_COLUMNS:
+            converted[col] = pd.to_datetime(df[col], format='mixed', errors='coerce', utc=True)
+        elif col in ID_COLUMNS:
+            converted[col] = pd.to_numeric(df[col], errors='coerce').astype('Int64')
+        elif col in CATEGORY_COLUMNS:
+            converted[col] = df[col].astype('category')
+        elif col in BOOL_COLUMNS:
+            converted[col] = df[col].fillna(False).astype(bool)
+        elif col in INT_COLUMNS and df[col].notna().all():
+            converted[col] = df[col].astype('int32')
+        elif pd.api.types.is_float_dtype(df[col]) or pd.api.types.is_integer_dtype(df[col]):
+            converted[col] = df[col].astype('float32')
+    return df.assign(**converted)
+
+# One-time conversion of the CSV datasets into Parquet files
+def convert_csv_to_parquet():
+    os.makedirs(parquet_dir, exist_ok=True)
+    for source, target in [(csv_path, team_stats_parquet_path), (games_path, games_parquet_path)]:
+        if not os.path.exists(source):
+            print(f'Skipping {source}: file not found')
+            continue
+        converted = apply_schema(pd.read_csv(source))
+        converted.to_parquet(target, index=False, row_group_size=20000)
+        print(f'Converted {source} -> {target} ({len(converted)} rows)')
+
+# Read a dataset from Parquet if converted, else from the CSV
+def read_dataset(parquet_path, csv_source, columns=None, start_date=None, end_date=None):
+    start = pd.Timestamp(start_date, tz='UTC') if start_date is not None else None
+    end = pd.Timestamp(end_date, tz='UTC') if end_date is not None else None
 
-# Get only games from 2016 and earlier
-df = df.loc[df['gameDate'].astype(str).str[:4].astype('int') > 2015].copy()
+    if os.path.exists(parquet_path):
+        filters = []
+        if start is not None:
+            filters.append(('gameDate', '>=', start))
+        if end is not None:
+            filters.append(('gameDate', '<', end))
+        return pd.read_parquet(parquet_path, columns=columns, filters=filters or None)
+
+    usecols = None
+    if columns is not None:
+        usecols = list(columns) + (['gameDate'] if (start or end) and 'gameDate' not in columns else [])
+    data = apply_schema(pd.read_csv(csv_source, usecols=usecols))
+    if start is not None:
+        data = data[data['gameDate'] >= start]
+    if end is not None:
+        data = data[data['gameDate'] < end]
+    if columns is not None:
+        data = data[list(columns)]
+    return data.reset_index(drop=True)
+
+# Load the team statistics, optionally only some columns and a [start_date, end_date) range
+def load_team_statistics(columns=None, start_date=None, end_date=None):
+    return read_dataset(team_stats_parquet_path, csv_path, columns, start_date, end_date)
+
+# Load the main file for the original statistics, only games from 2016 and later
+df = load_team_statistics(start_date='2016-01-01')
 
 team_ids = pd.read_csv(ids_path).set_index('Team')['ID']
 
 # Match the team ids from the document to those in my db
-def repair_team_id(df):
-    for index, row in df.iterrows():
-        home_team = f'{row['teamCity']} {row['teamName']}'
-        away_team = f'{row['opponentTeamCity']} {row['opponentTeamName']}'
-           
-        home_team_id = team_ids.get(home_team)
-        away_team_id = team_ids.get(away_team)
-        
-        df.loc[index, 'teamId'] = home_team_id
-        df.loc[index, 'opponentTeamId'] = away_team_id
-        
-        df.drop(['gameId', 'teamName', 'teamCity', 'opponentTeamCity', 'opponentTeamName', ])
-    
-    df.to_csv('team_statistics.csv')
+def repair_team_id(df, output_path=None):
+    home_team = df['teamCity'].astype(str).str.strip() + ' ' + df['teamName'].astype(str).str.strip()
+    away_team = df['opponentTeamCity'].astype(str).str.strip() + ' ' + df['opponentTeamName'].astype(str).str.strip()
+
+    df = df.assign(
+        teamId=home_team.map(team_ids),
+        opponentTeamId=away_team.map(team_ids),
+    )
+
+    # Report every team name without an id once
+    unmatched = pd.concat([
+        home_team[df['teamId'].isna()],
+        away_team[df['opponentTeamId'].isna()],
+    ]).value_counts()
+    if not unmatched.empty:
+        print(f'{len(unmatched)} team names without an id:')
+        for team, count in unmatched.items():
+            print(f'  {team}: {count} rows')
+
+    if output_path is not None:
+        df.to_csv(output_path)
+    return df
 
 # Append overtime data do the dataset
-def append_overtime_data():    
+def append_overtime_data(max_workers=None):
     team_stats_df = pd.read_csv(csv_path)
     
     team_stats_df['onlyDate'] = pd.to_datetime(
@@ -59,145 +152,148 @@ def append_overtime_data():
 
     team_stats_df['visitor_team'] = team_stats_df['opponentTeamCity'].str.strip() + ' ' + team_stats_df['opponentTeamName'].str.strip()
     team_stats_df['home_team'] = team_stats_df['teamCity'].str.strip() + ' ' + team_stats_df['teamName'].str.strip()
-    
-    team_stats_df['overtime'] = None
-    
+
+    month_paths = []
     for dir_name in os.listdir(basketball_reference_dir):
         if dir_name == '.DS_Store':
             continue
         dir_path = os.path.join(basketball_reference_dir, dir_name)
         for season in os.listdir(dir_path):
-            month_path = os.path.join(dir_path, season)
-            try:
-                dfs = pd.read_html(month_path)
-                df = dfs[0]
-                
-                # df.rename(columns={df.columns[7]: 'overtime'}, inplace=True)
-                            
-                df['gameDate'] = df['Date'].astype(str) + ' ' + df['Start (ET)'].astype(str)
-                
-                df['gameDate'] = (
-                    df['gameDate']
-                    .str.replace(r'(?<=\d)([ap])$', r'\1m', regex=True)
-                )
-                df['gameDate'] = pd.to_datetime(
-                    df['gameDate'],
-                    format='%a, %b %d, %Y %I:%M%p',
-                    errors='coerce'
-                ).dt.date
-                
-                df['Visitor/Neutral'] = df['Visitor/Neutral'].astype(str).str.strip()
-                df['Home/Neutral'] = df['Home/Neutral'].astype(str).str.strip()
-                                        
-                merged = pd.merge(
-                    team_stats_df,
-                    df[['gameDate', 'Visitor/Neutral', 'Home/Neutral', 'Unnamed: 7']],
-                    left_on=['onlyDate', 'visitor_team', 'home_team'],
-                    right_on=['gameDate', 'Visitor/Neutral', 'Home/Neutral'],
-                    how='left'
-                )
-                
-                team_stats_df['overtime'].update(merged['Unnamed: 7'])
-                
-            except Exception as e:
+            month_paths.append(os.path.join(dir_path, season))
+
+    # Parse the month files in parallel, unchanged files come from the cache
+    os.makedirs(schedule_cache_dir, exist_ok=True)
+    schedules = []
+    with ProcessPoolExecutor(max_workers=max_workers) as pool:
+        results = pool.map(
+            load_schedule_file,
+            month_paths,
+            [schedule_cache_dir] * len(month_paths),
+            chunksize=8
+        )
+        for month_path, schedule, error in results:
+            if error is not None:
                 print(f'\nError while processing file: {month_path}')
-                print(f'{type(e).__name__}: {e}')
-                try:
-                    print(f'Columns found: {list(df.columns)}')
-                except Exception:
-                    print('No columns')
-                    
-    team_stats_df['overtime'] = team_stats_df['overtime'].notna()
+                print(error)
+                continue
+            schedules.append(schedule)
+
+    # One row per game, overtime if any parsed row for the game has a marker
+    if schedules:
+        schedule_df = pd.concat(schedules, ignore_index=True)
+    else:
+        schedule_df = pd.DataFrame(columns=SCHEDULE_COLUMNS)
+    schedule_df['overtime'] = schedule_df['overtime_marker'].notna()
+    schedule_df = (
+        schedule_df
+        .groupby(['gameDate', 'visitor_team', 'home_team'], as_index=False)['overtime']
+        .any()
+        .rename(columns={'gameDate': 'onlyDate'})
+    )
+
+    team_stats_df = team_stats_df.merge(
+        schedule_df,
+        on=['onlyDate', 'visitor_team', 'home_team'],
+        how='left'
+    )
+    team_stats_df['overtime'] = team_stats_df['overtime'].fillna(False).astype(bool)
     team_stats_df.to_csv('test.csv', index=False)
     return team_stats_df
 
 
+# Columns of the games frame before the per-side statistics
+GAME_COLUMNS = [
+    'gameId', 'gameDate', 'home_teamId', 'away_teamId',
+    'home_teamScore', 'away_teamScore', 'overtime',
+]
+# Team statistics columns that are not per-side statistics of the games frame
+# (the opponent columns repeat the other side, the rest is bookkeeping)
+NON_SIDE_COLUMNS = [
+    'gameId', 'gameDate', 'home', 'overtime',
+    'teamCity', 'teamName', 'opponentTeamCity', 'opponentTeamName', 'opponentTeamId',
+    'opponentScore', 'seasonWins', 'seasonLosses', 'coachId',
+    'onlyDate', 'home_team', 'visitor_team',
+]
+
+# Per-side statistics kept from the team statistics columns, all of them by default
+def get_side_columns(columns, side_columns=None):
+    if side_columns is None:
+        side_columns = [c for c in columns if c not in NON_SIDE_COLUMNS and not c.startswith('Unnamed:')]
+    return ['teamId', 'teamScore'] + [c for c in side_columns if c not in ('teamId', 'teamScore')]
+
 # Prepare final dataset
-def prepare_dataset(df):
-    # Prepare gameId for merge
-    df['gameId'] = df['gameId'].astype(int)
-    
-    # df['gameDate'] = pd.to_datetime(df['gameDate'], errors='coerce')
-    
-    # Split into home and away teams
-    home_df = df[df['home'] == 1].copy()
-    away_df = df[df['home'] == 0].copy()
-    
-    # Add prefixes to each group
-    home_df = home_df.add_prefix('home_')
-    away_df = away_df.add_prefix('away_')
-    
-    # Merge both into one row per game
-    merged = pd.merge(
-        home_df,
-        away_df,
-        left_on='home_gameId',
-        right_on='away_gameId'
-    )
-    
-    if 'home_overtime' in merged.columns or 'away_overtime' in merged.columns:
-        merged['overtime'] = (
-            merged.get('home_overtime', False).fillna(False).astype(bool) |
-            merged.get('away_overtime', False).fillna(False).astype(bool)
-        )
+def prepare_dataset(df, side_columns=None, output_path='games.csv'):
+    """
+    Pairs the home and away team statistics rows into one row per game:
+    GAME_COLUMNS, then the home_ and the away_ prefixed side columns, cast
+    to the storage schema. Written to output_path unless it is None.
+    """
+    side_columns = get_side_columns(df.columns, side_columns)
+
+    # Select the needed columns before the merge
+    home_df = df.loc[df['home'] == 1, ['gameId', 'gameDate'] + side_columns].astype({'gameId': 'int64'})
+    away_df = df.loc[df['home'] == 0, ['gameId'] + side_columns].astype({'gameId': 'int64'})
+    home_df.columns = ['gameId', 'gameDate'] + [f'home_{c}' for c in side_columns]
+    away_df.columns = ['gameId'] + [f'away_{c}' for c in side_columns]
+
+    merged = home_df.merge(away_df, on='gameId')
+
+    # Overtime if any row of the game is marked
+    if 'overtime' in df.columns:
+        overtime = df['overtime'].fillna(False).astype(bool).groupby(df['gameId'].astype('int64')).any()
+        merged['overtime'] = merged['gameId'].map(overtime).to_numpy()
     else:
         merged['overtime'] = False
-    
-    if 'home_overtime' in merged.columns:
-        merged['overtime'] = merged['home_overtime'].combine_first(
-            merged.get('away_overtime')
-        )
-    elif 'away_overtime' in merged.columns:
-        merged['overtime'] = merged['away_overtime']
-    else:
-        merged['overtime'] = None
-            
-    # Rename columns
-    merged.rename(columns={
-        'home_gameId': 'gameId',
-        'home_gameDate': 'gameDate'
-    }, inplace=True)
-    
-    # Remove duplicate ID/date columns from away team
-    merged.drop(columns=['away_gameId', 'away_gameDate'], inplace=True)
-    
-    # Reorder columns for readability
-    ordered_columns = [
-        'gameId', 'gameDate',
-        'home_teamCity', 'home_teamName', 'home_teamId',
-        'away_teamCity', 'away_teamName', 'away_teamId',
-        'home_teamScore', 'away_teamScore', 'overtime'
-    ]
-    
-    # Add the rest of the columns that are not yet in the list
-    for col in merged.columns:
-        if col not in ordered_columns:
-            ordered_columns.append(col)
-    
-    # Reorder columns
-    merged = merged[ordered_columns]
-    
-    # Final clean
-    drop_cols = [
-        'home_Unnamed: 0', 'away_Unnamed: 0',
-        'home_opponentTeamCity', 'home_opponentTeamName', 'home_opponentTeamId',
-        'away_opponentTeamCity', 'away_opponentTeamName', 'away_opponentTeamId',
-        'home_home', 'away_home',
-        'home_opponentScore', 'away_opponentScore',
-        'home_seasonWins', 'home_seasonLosses', 'home_coachId',
-        'away_seasonWins', 'away_seasonLosses', 'away_coachId',
-        'home_teamCity', 'home_teamName', 'away_teamName', 'away_teamCity', 'away_overtime',
-        'away_home_team', 'away_visitor_team', 'away_onlyDate', 'home_overtime', 'home_home_team',
-        'home_onlyDate', 'home_visitor_team'
-    ]
-    merged.drop(columns=[c for c in drop_cols if c in merged.columns], inplace=True)
 
-    merged.to_csv('games.csv', index=False)
+    rest = [c for c in merged.columns if c not in GAME_COLUMNS]
+    merged = apply_schema(merged[GAME_COLUMNS + rest])
+
+    if output_path is not None:
+        merged.to_csv(output_path, index=False)
     return merged
 
-# Function to retrieve the games dataset 
-def get_games():
-    df = pd.read_csv(games_path)
+# prepare_dataset one season (September to September) at a time from the Parquet team statistics,
+# so the team rows of the whole history are never in memory next to the games
+def prepare_dataset_by_season(side_columns=None, start_date=None, end_date=None, output_path='games.csv'):
+    if not os.path.exists(team_stats_parquet_path):
+        team_stats = load_team_statistics(start_date=start_date, end_date=end_date)
+        return prepare_dataset(team_stats, side_columns, output_path)
+
+    columns = None
+    if side_columns is not None:
+        import pyarrow.parquet as pq
+        stored = pq.read_schema(team_stats_parquet_path).names
+        columns = [c for c in ['gameId', 'gameDate', 'home', 'overtime'] if c in stored]
+        columns += get_side_columns(stored, side_columns)
+
+    dates = load_team_statistics(columns=['gameDate'], start_date=start_date, end_date=end_date)['gameDate']
+    if dates.empty:
+        return pd.DataFrame(columns=GAME_COLUMNS)
+    first = get_season_start(dates.min())
+    last = get_season_start(dates.max())
+
+    start = pd.Timestamp(start_date) if start_date is not None else None
+    end = pd.Timestamp(end_date) if end_date is not None else None
+    seasons = []
+    for year in range(first, last + 1):
+        season_from = max(pd.Timestamp(year, 9, 1), start) if start is not None else pd.Timestamp(year, 9, 1)
+        season_to = min(pd.Timestamp(year + 1, 9, 1), end) if end is not None else pd.Timestamp(year + 1, 9, 1)
+        team_stats = load_team_statistics(columns=columns, start_date=season_from, end_date=season_to)
+        if team_stats.empty:
+            continue
+        games = prepare_dataset(team_stats, side_columns, output_path=None)
+        del team_stats
+
+        if output_path is not None:
+            games.to_csv(output_path, index=False, mode='w' if not seasons else 'a', header=not seasons)
+        seasons.append(games)
+        print(f'Prepared season {year}-{str(year + 1)[-2:]}: {len(games)} games')
+
+    return pd.concat(seasons, ignore_index=True) if seasons else pd.DataFrame(columns=GAME_COLUMNS)
+
+# Function to retrieve the games dataset, optionally only some columns and a [start_date, end_date) range
+def get_games(columns=None, start_date=None, end_date=None):
+    df = read_dataset(games_parquet_path, games_path, columns, start_date, end_date)
     return df
 
 # Compute the head to head for data preprocessing
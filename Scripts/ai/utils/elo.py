@@ -0,0 +1,134 @@
+"""
+This module keeps incremental Elo ratings for NBA teams.
+
+The ratings are stored per team together with the last processed game, so new
+results can be applied as they arrive instead of replaying the whole season.
+The state can be snapshotted to a local JSON file or to a storage blob.
+"""
+
+import json
+import pandas as pd
+
+from utils.seasons import previous_season
+
+BASE_ELO = 1500
+K_FACTOR = 20
+
+
+class EloRatings:
+    def __init__(self, ratings=None, last_game_id=None, last_game_date=None,
+                 base_elo=BASE_ELO, k=K_FACTOR):
+        self.ratings = dict(ratings or {})
+        self.last_game_id = last_game_id
+        self.last_game_date = last_game_date
+        self.base_elo = base_elo
+        self.k = k
+
+    def rating(self, team_id):
+        return self.ratings.get(int(team_id), self.base_elo)
+
+    def elo_diff(self, home_id, away_id):
+        return self.rating(home_id) - self.rating(away_id)
+
+    # Apply a single finished game, ratings before the game are used for the expectation
+    def record_game(self, home_id, away_id, home_win, game_id=None, game_date=None):
+        home_id, away_id = int(home_id), int(away_id)
+        home_elo = self.rating(home_id)
+        away_elo = self.rating(away_id)
+
+        expected_home = 1 / (1 + 10 ** ((away_elo - home_elo) / 400))
+        change = self.k * (int(home_win) - expected_home)
+
+        self.ratings[home_id] = home_elo + change
+        self.ratings[away_id] = away_elo - change
+
+        if game_id is not None:
+            self.last_game_id = str(game_id)
+        if game_date is not None:
+            self.last_game_date = str(game_date)
+
+    # Apply all games from LeagueGameFinder team rows that are newer than the last processed one
+    def update_from_team_games(self, df):
+        home_rows = df[df['MATCHUP'].str.contains('vs.', regex=False, na=False)]
+        away_rows = df[df['MATCHUP'].str.contains('@', regex=False, na=False)]
+
+        games = home_rows[['GAME_ID', 'GAME_DATE', 'TEAM_ID', 'WL']].merge(
+            away_rows[['GAME_ID', 'TEAM_ID']],
+            on='GAME_ID',
+            suffixes=('_home', '_away')
+        )
+        games = games[games['WL'].isin(['W', 'L'])]
+
+        games['GAME_ID'] = games['GAME_ID'].astype(str)
+        games['GAME_DATE'] = pd.to_datetime(games['GAME_DATE']).dt.strftime('%Y-%m-%d')
+
+        if self.last_game_date is not None:
+            is_new = (games['GAME_DATE'] > self.last_game_date) | (
+                (games['GAME_DATE'] == self.last_game_date) &
+                (games['GAME_ID'] > (self.last_game_id or ''))
+            )
+            games = games[is_new]
+
+        games = games.sort_values(['GAME_DATE', 'GAME_ID'])
+
+        for game in games.itertuples(index=False):
+            self.record_game(
+                game.TEAM_ID_home,
+                game.TEAM_ID_away,
+                game.WL == 'W',
+                game_id=game.GAME_ID,
+                game_date=game.GAME_DATE,
+            )
+
+        return len(games)
+
+    def to_dict(self):
+        return {
+            'ratings': {str(team_id): rating for team_id, rating in self.ratings.items()},
+            'last_game_id': self.last_game_id,
+            'last_game_date': self.last_game_date,
+            'base_elo': self.base_elo,
+            'k': self.k,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(
+            ratings={int(team_id): float(rating) for team_id, rating in data.get('ratings', {}).items()},
+            last_game_id=data.get('last_game_id'),
+            last_game_date=data.get('last_game_date'),
+            base_elo=data.get('base_elo', BASE_ELO),
+            k=data.get('k', K_FACTOR),
+        )
+
+    def save(self, path):
+        with open(path, 'w') as f:
+            json.dump(self.to_dict(), f)
+
+    @classmethod
+    def load(cls, path):
+        with open(path) as f:
+            return cls.from_dict(json.load(f))
+
+    # Snapshot to a google.cloud.storage blob (or anything with the same methods)
+    def save_to_blob(self, blob):
+        blob.upload_from_string(json.dumps(self.to_dict()), content_type='application/json')
+
+    @classmethod
+    def load_from_blob(cls, blob):
+        if not blob.exists():
+            return cls()
+        return cls.from_dict(json.loads(blob.download_as_text()))
+
+
+# Name of the snapshot blob for a season, shared by the updater and the predictor
+def snapshot_name(season):
+    return f'data/elo_ratings_{season}.json'
+
+
+# Snapshot of a season from a storage bucket, a new season starts from the previous season's ratings
+def load_season_snapshot(bucket, season):
+    blob = bucket.blob(snapshot_name(season))
+    if blob.exists():
+        return EloRatings.load_from_blob(blob)
+    return EloRatings.load_from_blob(bucket.blob(snapshot_name(previous_season(season))))
@@ -0,0 +1,225 @@
+"""
+This module stores point-in-time feature snapshots per team and date.
+
+A snapshot dated D holds, for every team, the features it would carry into
+a game on D as the home side and as the away side, computed by the shared
+pipeline in utils.features from games before D only. Head to head averages
+depend on the opponent, so they are stored per (home team, away team) pair.
+
+Lookups return the latest snapshot dated on or before the requested time,
+so a lookup never sees a game played on or after its snapshot date. Each
+snapshot is one Parquet file per date and can be mirrored to a storage
+bucket like the season log.
+"""
+
+import os
+import tempfile
+import numpy as np
+import pandas as pd
+
+from utils.bucket_sync import sync_prefix
+from utils.elo import BASE_ELO, EloRatings
+from utils.features import SIDES, ROLLING_FEATURES, compute_features, games_from_team_rows
+
+STORE_DIR = os.environ.get(
+    'FEATURE_STORE_DIR',
+    os.path.join(tempfile.gettempdir(), 'statistiq-feature-store'),
+)
+BUCKET_PREFIX = 'data/feature_store'
+TABLES = ('teams', 'pairs')
+
+# Side features stored per team, named as in the model inputs ({side} is the side the team plays on)
+SIDE_FEATURES = {
+    side: [feature.format(side=side, other=other) for feature, _, _, _ in ROLLING_FEATURES]
+    + [f'{side}_season_win_percentage']
+    for side, other in SIDES.items()
+}
+H2H_FEATURES = ['home_head_to_head_avg_points', 'away_head_to_head_avg_points']
+
+
+# Snapshots are dated by UTC day
+def _snapshot_date(as_of):
+    date = pd.Timestamp(as_of)
+    if date.tzinfo is not None:
+        date = date.tz_convert('UTC').tz_localize(None)
+    return date.normalize()
+
+
+# Features of every team as of the start of a date, from LeagueGameFinder team rows
+def compute_snapshot(team_rows, as_of, elo=None):
+    """
+    Returns (teams, pairs) frames for the snapshot date of as_of, using only
+    games played before that date. elo gives the ratings to store, by default
+    they are replayed from the same games.
+    """
+    date = _snapshot_date(as_of)
+    team_rows = team_rows[pd.to_datetime(team_rows['GAME_DATE']) < date]
+
+    history = games_from_team_rows(team_rows)
+    team_ids = sorted(set(history['home_teamId']) | set(history['away_teamId']))
+
+    # Every team once as the home side and once as the away side of a game without opponent
+    no_team = [np.nan] * len(team_ids)
+    upcoming = pd.DataFrame({
+        'gameDate': pd.Timestamp(date, tz='UTC'),
+        'home_teamId': team_ids + no_team,
+        'away_teamId': no_team + team_ids,
+    })
+    combined = pd.concat([history, upcoming], ignore_index=True)
+    combined['is_upcoming'] = combined.index >= len(history)
+    features = compute_features(combined)
+    features = features[features['is_upcoming']]
+
+    teams = pd.DataFrame({'team_id': team_ids})
+    for side in SIDES:
+        side_rows = features[features[f'{side}_teamId'].notna()]
+        side_rows = side_rows.assign(team_id=side_rows[f'{side}_teamId'].astype('int64'))
+        teams = teams.merge(side_rows[['team_id'] + SIDE_FEATURES[side]], on='team_id', how='left')
+
+    if elo is None:
+        elo = EloRatings()
+        elo.update_from_team_games(team_rows)
+    teams['elo'] = [elo.rating(team_id) for team_id in teams['team_id']]
+
+    # Same orientation only, as in compute_head_to_head_avgs
+    pairs = (
+        history.groupby(['home_teamId', 'away_teamId'])[['home_teamScore', 'away_teamScore']]
+        .mean()
+        .dropna(how='all')
+        .reset_index()
+    )
+    pairs.columns = ['home_team_id', 'away_team_id'] + H2H_FEATURES
+
+    teams.insert(0, 'date', date)
+    pairs.insert(0, 'date', date)
+    return teams, pairs
+
+
+class FeatureStore:
+    def __init__(self, season, root_dir=STORE_DIR, bucket=None):
+        self.season = season
+        self.dir = os.path.join(root_dir, season)
+        self.bucket = bucket
+        self._tables = None  # cache, table name -> all snapshots
+        for table in TABLES:
+            os.makedirs(os.path.join(self.dir, table), exist_ok=True)
+
+    def _path(self, table, date):
+        return os.path.join(self.dir, table, f'{date}.parquet')
+
+    def _blob_name(self, table, date):
+        return f'{BUCKET_PREFIX}/{self.season}/{table}/{date}.parquet'
+
+    def stored_dates(self):
+        names = os.listdir(os.path.join(self.dir, 'teams'))
+        return sorted(name[:-len('.parquet')] for name in names if name.endswith('.parquet'))
+
+    # Download the bucket files that are missing locally or differ from the local copy
+    def sync_from_bucket(self):
+        if self.bucket is None:
+            return 0
+        downloaded = sum(
+            sync_prefix(self.bucket, f'{BUCKET_PREFIX}/{self.season}/{table}/', os.path.join(self.dir, table))
+            for table in TABLES
+        )
+        self._tables = None
+        return downloaded
+
+    def append(self, team_rows, as_of=None, elo=None):
+        """
+        Computes the snapshot for the date of as_of (today by default) from
+        the season team rows and stores it, replacing a snapshot of the same date.
+        """
+        as_of = pd.Timestamp.utcnow() if as_of is None else as_of
+        teams, pairs = compute_snapshot(team_rows, as_of, elo=elo)
+        date = _snapshot_date(as_of).strftime('%Y-%m-%d')
+
+        for table, rows in zip(TABLES, (teams, pairs)):
+            rows.to_parquet(self._path(table, date), index=False)
+            if self.bucket is not None:
+                self.bucket.blob(self._blob_name(table, date)).upload_from_filename(self._path(table, date))
+
+        self._tables = None
+        print(f'Feature store {self.season}: stored snapshot {date} ({len(teams)} teams, {len(pairs)} pairs).')
+        return date
+
+    def _table(self, table):
+        if self._tables is None:
+            self._tables = {}
+        if table not in self._tables:
+            frames = [pd.read_parquet(self._path(table, date)) for date in self.stored_dates()
+                      if os.path.exists(self._path(table, date))]
+            self._tables[table] = (
+                pd.concat(frames, ignore_index=True).sort_values('date', kind='mergesort')
+                if frames else pd.DataFrame(columns=['date'])
+            )
+        return self._tables[table]
+
+    def latest_date(self, as_of=None):
+        dates = self.stored_dates()
+        if as_of is not None:
+            dates = [d for d in dates if pd.Timestamp(d) <= _snapshot_date(as_of)]
+        return dates[-1] if dates else None
+
+    def features(self, team_id, as_of):
+        """
+        Returns the stored features of a team from the latest snapshot
+        dated on or before as_of, or None if there is none.
+        """
+        teams = self._table('teams')
+        if teams.empty:
+            return None
+        rows = teams[(teams['team_id'] == int(team_id)) & (teams['date'] <= _snapshot_date(as_of))]
+        return rows.iloc[-1] if not rows.empty else None
+
+    def game_features(self, games):
+        """
+        Point-in-time features for a frame of games with gameDate, home_teamId
+        and away_teamId, using for every game the latest snapshot before it.
+        Returns the union of the serving features, one row per game in order.
+        """
+        lookup = pd.DataFrame({
+            'position': np.arange(len(games)),
+            'date': games['gameDate'].map(_snapshot_date).to_numpy(),
+            'home_team_id': games['home_teamId'].astype('int64').to_numpy(),
+            'away_team_id': games['away_teamId'].astype('int64').to_numpy(),
+        }).sort_values('date', kind='mergesort')
+
+        teams = self._table('teams')
+        pairs = self._table('pairs')
+        if teams.empty:
+            teams = pd.DataFrame(columns=['date', 'team_id', 'elo'] + SIDE_FEATURES['home'] + SIDE_FEATURES['away'])
+        if pairs.empty:
+            pairs = pd.DataFrame(columns=['date', 'home_team_id', 'away_team_id'] + H2H_FEATURES)
+        teams = teams.assign(date=pd.to_datetime(teams['date']), team_id=teams['team_id'].astype('int64'))
+        pairs = pairs.assign(
+            date=pd.to_datetime(pairs['date']),
+            home_team_id=pairs['home_team_id'].astype('int64'),
+            away_team_id=pairs['away_team_id'].astype('int64'),
+        )
+        lookup['date'] = pd.to_datetime(lookup['date'])
+
+        for side in SIDES:
+            side_teams = teams[['date', 'team_id', 'elo'] + SIDE_FEATURES[side]].rename(
+                columns={'team_id': f'{side}_team_id', 'elo': f'{side}_elo'}
+            )
+            lookup = pd.merge_asof(lookup, side_teams, on='date', by=f'{side}_team_id')
+        lookup = pd.merge_asof(lookup, pairs, on='date', by=['home_team_id', 'away_team_id'])
+
+        result = lookup.sort_values('position').reset_index(drop=True)
+        # Teams without a snapshot yet have not played, so they start from the base rating
+        result[['home_elo', 'away_elo']] = result[['home_elo', 'away_elo']].astype(float).fillna(BASE_ELO)
+        result['home_advantage'] = 1
+        result['points_avg_diff'] = result['home_avg_points'] - result['away_avg_points']
+        result['winrate_diff'] = result['home_season_win_percentage'] - result['away_season_win_percentage']
+        result['elo_diff'] = result['home_elo'] - result['away_elo']
+        return result.drop(columns=['position', 'date']).rename(
+            columns={'home_team_id': 'home_teamId', 'away_team_id': 'away_teamId'}
+        )
+
+
+# Sync the season store from the bucket and return it
+def load_feature_store(season, bucket=None):
+    store = FeatureStore(season, bucket=bucket)
+    store.sync_from_bucket()
+    return store
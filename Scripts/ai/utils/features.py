@@ -0,0 +1,239 @@
+"""
+This module is the shared feature pipeline for the training notebooks and the predictor.
+
+compute_features takes a games frame (one row per game, home_/away_ prefixed
+columns as produced by data_handler.prepare_dataset) and adds every model
+feature for the full history with grouped rolling operations. Every feature
+only looks at games before the row, so compute_live_features can append the
+upcoming games as empty rows and read their "as of now" features from the
+same code path.
+"""
+
+import numpy as np
+import pandas as pd
+
+from utils.elo import EloRatings
+
+SIDES = {'home': 'away', 'away': 'home'}
+
+# (feature, source column, window, min_periods), a window of None means expanding.
+# {side} is the team the feature is for and {other} its opponent in the same game.
+ROLLING_FEATURES = [
+    ('{side}_avg_points', '{side}_teamScore', None, 1),
+    ('{side}_last_5_win_percentage', '{side}_win', 5, 1),
+    ('{side}_off_eff_L5', '{side}_off_efficiency', 5, 1),
+    ('{side}_off_eff_L10', '{side}_off_efficiency', 10, 1),
+    ('{side}_def_efficiency', '{other}_teamScore', 5, 1),
+    ('{side}_TS_L5', '{side}_TS', 5, 1),
+    ('{side}_eFG_L10', '{side}_eFG', 10, 1),
+    ('{side}_tov_rate_L5', '{side}_tov_rate', 5, 1),
+]
+
+# Box score columns of LeagueGameFinder team rows and their names in the games frame
+TEAM_ROW_COLUMNS = {
+    'GAME_ID': 'gameId',
+    'GAME_DATE': 'gameDate',
+    'TEAM_ID': 'teamId',
+    'PTS': 'teamScore',
+    'FGM': 'fieldGoalsMade',
+    'FGA': 'fieldGoalsAttempted',
+    'FG3M': 'threePointersMade',
+    'FTA': 'freeThrowsAttempted',
+    'TOV': 'turnovers',
+}
+
+
+# Season start year, the season starts in September
+def season_start(dates):
+    return dates.dt.year - (dates.dt.month < 9).astype(int)
+
+
+# Per game rates the rolling features are built from
+def add_game_rates(df):
+    for side in SIDES:
+        possessions = (
+            df[f'{side}_fieldGoalsAttempted']
+            + 0.44 * df[f'{side}_freeThrowsAttempted']
+            + df[f'{side}_turnovers']
+        )
+        df[f'{side}_possessions'] = possessions
+        df[f'{side}_off_efficiency'] = df[f'{side}_teamScore'] / possessions.replace(0, np.nan)
+        df[f'{side}_TS'] = df[f'{side}_teamScore'] / (
+            2 * (df[f'{side}_fieldGoalsAttempted'] + 0.44 * df[f'{side}_freeThrowsAttempted'])
+        ).replace(0, np.nan)
+        df[f'{side}_eFG'] = (
+            df[f'{side}_fieldGoalsMade'] + 0.5 * df[f'{side}_threePointersMade']
+        ) / df[f'{side}_fieldGoalsAttempted'].replace(0, np.nan)
+        df[f'{side}_tov_rate'] = df[f'{side}_turnovers'] / possessions.replace(0, np.nan)
+    return df
+
+
+# Compute the head to head averages for the whole games frame in one pass
+def compute_head_to_head_avgs(df):
+    # Both averages only look at previous games in the same orientation
+    # (same home team, same away team), so the pair is keyed as ordered
+    pair_keys = ['home_teamId', 'away_teamId']
+    games = df[pair_keys + ['gameDate', 'home_teamScore', 'away_teamScore']]
+    games = games.sort_values(pair_keys + ['gameDate'], kind='mergesort')
+
+    # Games without a score (upcoming ones) count as neither points nor games
+    prev = {}
+    for side in ('home', 'away'):
+        score = games[f'{side}_teamScore'].astype(float)
+        played = score.notna().astype(int)
+        pair_groups = [games[k] for k in pair_keys]
+        prev[f'{side}_sum'] = score.fillna(0).groupby(pair_groups).cumsum() - score.fillna(0)
+        prev[f'{side}_count'] = played.groupby(pair_groups).cumsum() - played
+
+    # Games of the same pair on the same date must not see each other
+    prev = pd.DataFrame(prev)
+    prev = prev.groupby([games[k] for k in pair_keys + ['gameDate']], sort=False).transform('first')
+
+    result = pd.DataFrame({
+        'home_head_to_head_avg_points': prev['home_sum'] / prev['home_count'].where(prev['home_count'] > 0),
+        'away_head_to_head_avg_points': prev['away_sum'] / prev['away_count'].where(prev['away_count'] > 0),
+    })
+    return result.reindex(df.index)
+
+
+# Statistic (mean, std, ...) of the previous games within each group, without the current row
+def shifted_rolling(values, keys, window=None, min_periods=1, stat='mean'):
+    previous = values.groupby(keys).shift(1)
+    grouped = previous.groupby(keys)
+    if window is None:
+        rolled = grouped.expanding(min_periods=min_periods)
+    else:
+        rolled = grouped.rolling(window, min_periods=min_periods)
+    rolled = getattr(rolled, stat)()
+    return rolled.reset_index(level=list(range(len(keys))), drop=True).reindex(values.index)
+
+
+# Mean of the previous games within each group, without the current row
+def shifted_mean(values, keys, window=None, min_periods=1):
+    return shifted_rolling(values, keys, window, min_periods)
+
+
+# Values of the previous n games within each group, the latest first
+def previous_values(values, keys, n):
+    grouped = values.groupby(keys)
+    return [grouped.shift(k) for k in range(1, n + 1)]
+
+
+# Pre-game Elo for every row, rows without a result do not change the ratings
+def add_elo_features(df, elo=None):
+    elo = EloRatings.from_dict(elo.to_dict()) if elo is not None else EloRatings()
+    home_elo = np.empty(len(df))
+    away_elo = np.empty(len(df))
+
+    rows = zip(df['home_teamId'].to_numpy(), df['away_teamId'].to_numpy(), df['home_win'].to_numpy())
+    for i, (home_id, away_id, home_win) in enumerate(rows):
+        if pd.isna(home_id) or pd.isna(away_id):
+            home_elo[i] = away_elo[i] = np.nan
+            continue
+        home_elo[i] = elo.rating(home_id)
+        away_elo[i] = elo.rating(away_id)
+        if not pd.isna(home_win):
+            elo.record_game(home_id, away_id, home_win == 1)
+
+    df['home_elo'] = home_elo
+    df['away_elo'] = away_elo
+    df['elo_diff'] = df['home_elo'] - df['away_elo']
+    return df
+
+
+def compute_features(games, elo=None):
+    """
+    Adds every shared feature to a games frame and returns it sorted by gameDate.
+    elo seeds the ratings before the first row (fresh ratings if None).
+    """
+    # Sort the dates alone and take the rows in that order, the only copy of the input
+    dates = pd.to_datetime(games['gameDate'], errors='coerce', utc=True).reset_index(drop=True)
+    dates = dates.sort_values(kind='mergesort')
+    df = games.take(dates.index).reset_index(drop=True)
+    df['gameDate'] = dates.reset_index(drop=True)
+    df['season'] = season_start(df['gameDate'])
+
+    df = add_game_rates(df)
+
+    for side, other in SIDES.items():
+        keys = [df[f'{side}_teamId']]
+        for feature, source, window, min_periods in ROLLING_FEATURES:
+            name = feature.format(side=side, other=other)
+            df[name] = shifted_mean(df[source.format(side=side, other=other)], keys, window, min_periods)
+
+        df[f'{side}_season_win_percentage'] = shifted_mean(
+            df[f'{side}_win'], [df[f'{side}_teamId'], df['season']]
+        )
+
+    df[['home_head_to_head_avg_points', 'away_head_to_head_avg_points']] = compute_head_to_head_avgs(df)
+
+    df['points_avg_diff'] = df['home_avg_points'] - df['away_avg_points']
+    df['winrate_diff'] = df['home_season_win_percentage'] - df['away_season_win_percentage']
+    df['home_advantage'] = 1
+
+    return add_elo_features(df, elo)
+
+
+# Turn LeagueGameFinder team rows into the games frame, one row per game
+def games_from_team_rows(team_rows):
+    rows = team_rows[list(TEAM_ROW_COLUMNS) + ['MATCHUP', 'WL']].rename(columns=TEAM_ROW_COLUMNS)
+    rows['win'] = (rows['WL'] == 'W').astype(int).where(rows['WL'].isin(['W', 'L']))
+
+    is_home = rows['MATCHUP'].str.contains('vs.', regex=False, na=False)
+    is_away = rows['MATCHUP'].str.contains('@', regex=False, na=False)
+    stat_columns = [c for c in rows.columns if c not in ('gameId', 'gameDate', 'MATCHUP', 'WL')]
+
+    home = rows.loc[is_home, ['gameId', 'gameDate'] + stat_columns]
+    away = rows.loc[is_away, ['gameId'] + stat_columns]
+    games = home.add_prefix('home_').merge(
+        away.add_prefix('away_'),
+        left_on='home_gameId',
+        right_on='away_gameId'
+    )
+    return games.rename(columns={'home_gameId': 'gameId', 'home_gameDate': 'gameDate'}).drop(columns=['away_gameId'])
+
+
+def compute_live_features(history, matchups, as_of, elo=None):
+    """
+    Features for upcoming (home_teamId, away_teamId) matchups as of a date,
+    computed by appending them to the games history without a result.
+    If elo is given, its current ratings are used for elo_diff.
+    Returns one row per matchup, in order.
+    """
+    results = []
+    remaining = list(enumerate(matchups))
+
+    # A team may play more than once in the slate, each round has every team at most once
+    while remaining:
+        round_games, busy, deferred = [], set(), []
+        for position, (home_id, away_id) in remaining:
+            if home_id in busy or away_id in busy:
+                deferred.append((position, (home_id, away_id)))
+                continue
+            busy.update((home_id, away_id))
+            round_games.append((position, home_id, away_id))
+        remaining = deferred
+
+        upcoming = pd.DataFrame({
+            'gameDate': pd.to_datetime(as_of, utc=True),
+            'home_teamId': [home_id for _, home_id, _ in round_games],
+            'away_teamId': [away_id for _, _, away_id in round_games],
+        })
+        combined = pd.concat([history, upcoming], ignore_index=True)
+        combined['is_upcoming'] = combined.index >= len(history)
+
+        features = compute_features(combined)
+        features = features[features['is_upcoming']].reset_index(drop=True)
+        features['position'] = [position for position, _, _ in round_games]
+
+        if elo is not None:
+            features['home_elo'] = [elo.rating(h) for h in features['home_teamId']]
+            features['away_elo'] = [elo.rating(a) for a in features['away_teamId']]
+            features['elo_diff'] = features['home_elo'] - features['away_elo']
+
+        results.append(features)
+
+    if not results:
+        return pd.DataFrame()
+    live = pd.concat(results, ignore_index=True).sort_values('position')
+    return live.drop(columns=['is_upcoming', 'position']).reset_index(drop=True)
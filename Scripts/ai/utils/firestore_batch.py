@@ -0,0 +1,75 @@
+"""
+This module commits Firestore writes in chunked batches.
+
+Operations are collected as (op, document reference, data) tuples and sent
+in batches no larger than Firestore's per-batch limit, so a whole night of
+results or a slate of predictions commits in a handful of round-trips.
+Queries over collections of any size are read page by page with stream_pages.
+"""
+
+FIRESTORE_BATCH_LIMIT = 500
+FIRESTORE_PAGE_SIZE = 500
+
+
+def set_op(doc_ref, data):
+    return ('set', doc_ref, data)
+
+
+def update_op(doc_ref, data):
+    return ('update', doc_ref, data)
+
+
+def delete_op(doc_ref):
+    return ('delete', doc_ref, None)
+
+
+def stream_pages(query, page_size=FIRESTORE_PAGE_SIZE):
+    """
+    Streams the documents of an ordered query in pages of page_size, each
+    page continuing after the last document of the previous one, so no
+    single read holds the whole result.
+    """
+    last = None
+    while True:
+        page = query.limit(page_size)
+        if last is not None:
+            page = page.start_after(last)
+        docs = list(page.stream())
+        yield from docs
+        if len(docs) < page_size:
+            return
+        last = docs[-1]
+
+
+# Commit the operations chunk by chunk, a failed chunk does not stop the others
+def commit_in_batches(db, operations, chunk_size=FIRESTORE_BATCH_LIMIT, label='writes'):
+    operations = list(operations)
+    committed = 0
+    failed = []
+
+    for start in range(0, len(operations), chunk_size):
+        chunk = operations[start:start + chunk_size]
+        batch = db.batch()
+
+        for op, doc_ref, data in chunk:
+            if op == 'set':
+                batch.set(doc_ref, data)
+            elif op == 'update':
+                batch.update(doc_ref, data)
+            elif op == 'delete':
+                batch.delete(doc_ref)
+            else:
+                raise ValueError(f'Unknown batch operation: {op}')
+
+        try:
+            batch.commit()
+            committed += len(chunk)
+        except Exception as e:
+            doc_ids = [doc_ref.id for _, doc_ref, _ in chunk]
+            print(f'Error while committing {label} chunk {start // chunk_size} ({len(chunk)} docs)')
+            print(f'{type(e).__name__}: {e}')
+            print(f'Documents: {doc_ids}')
+            failed.append({'chunk': start // chunk_size, 'doc_ids': doc_ids, 'error': str(e)})
+
+    print(f'Committed {committed}/{len(operations)} {label}.')
+    return {'committed': committed, 'failed': failed}
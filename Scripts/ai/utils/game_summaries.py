@@ -0,0 +1,91 @@
+"""
+This module builds the denormalized summaries the app reads for a match detail.
+
+team_form/{team_id} holds the last FORM_GAMES results of a team and
+head_to_head/{lo}_{hi} the last H2H_GAMES meetings of two teams (team ids in
+ascending order, like matchupKey in the app), both newest first. update_games
+merges the games_played records it writes into the stored documents, so a
+match detail reads two form documents and one head-to-head document instead
+of querying games_played four times.
+"""
+
+import os
+
+FORM_COLLECTION = 'team_form'
+H2H_COLLECTION = 'head_to_head'
+FORM_GAMES = int(os.environ.get('FORM_GAMES', 10))
+H2H_GAMES = int(os.environ.get('H2H_GAMES', 25))
+
+
+def matchup_key(team_a, team_b):
+    lo, hi = sorted((int(team_a), int(team_b)))
+    return f'{lo}_{hi}'
+
+
+def form_entries(games):
+    """
+    New form entries per team id from games_played records, one entry per
+    game from the team's point of view.
+    """
+    entries = {}
+    for game in games:
+        for side, other in (('home', 'away'), ('away', 'home')):
+            entries.setdefault(game[f'team_id_{side}'], []).append({
+                'game_id': game['game_id'],
+                'game_date': game['game_date'],
+                'opponent_id': game[f'team_id_{other}'],
+                'home': side == 'home',
+                'pts': game[f'pts_{side}'],
+                'opp_pts': game[f'pts_{other}'],
+                'wl': game[f'wl_{side}'],
+            })
+    return entries
+
+
+def h2h_entries(games):
+    """
+    New head-to-head entries per matchup key from games_played records,
+    with the fields of games_played the app shows for a meeting.
+    """
+    entries = {}
+    for game in games:
+        key = matchup_key(game['team_id_home'], game['team_id_away'])
+        entries.setdefault(key, []).append({
+            field: game[field]
+            for field in ('game_id', 'game_date', 'team_id_home', 'team_id_away',
+                          'pts_home', 'pts_away', 'wl_home', 'wl_away')
+        })
+    return entries
+
+
+# Stored and new entries by game id (new ones win), newest first and cut to limit
+def merge_games(stored, new, limit):
+    by_id = {game['game_id']: game for game in stored}
+    by_id.update((game['game_id'], game) for game in new)
+    games = sorted(by_id.values(), key=lambda game: (game['game_date'], game['game_id']), reverse=True)
+    return games[:limit]
+
+
+def form_document(team_id, games):
+    return {
+        'team_id': int(team_id),
+        'games': games,
+        'wins': sum(game['wl'] == 'W' for game in games),
+        'losses': sum(game['wl'] == 'L' for game in games),
+        'last_game_date': games[0]['game_date'] if games else None,
+    }
+
+
+def h2h_document(key, games):
+    team_ids = [int(team_id) for team_id in key.split('_')]
+    wins = {str(team_id): 0 for team_id in team_ids}
+    for game in games:
+        for side in ('home', 'away'):
+            if game[f'wl_{side}'] == 'W':
+                wins[str(game[f'team_id_{side}'])] += 1
+    return {
+        'team_ids': team_ids,
+        'games': games,
+        'wins': wins,
+        'last_game_date': games[0]['game_date'] if games else None,
+    }
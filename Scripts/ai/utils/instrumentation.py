@@ -0,0 +1,189 @@
+"""
+This module times the stages of a Cloud Function invocation.
+
+Each stage is logged as one JSON line (Cloud Logging turns them into
+structured entries) with its duration and the process memory, and the
+invocation ends with a summary line aggregating every stage. Stages can be
+opened from any thread that runs in the invocation's context.
+
+Setting STATISTIQ_PROFILE to "cprofile" or "pyinstrument" also profiles the
+whole invocation and logs the report (pyinstrument must be installed).
+"""
+
+import contextvars
+import io
+import json
+import os
+import sys
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from functools import wraps
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+PROFILE_MODE = os.environ.get('STATISTIQ_PROFILE', '').lower()
+PROFILE_TOP = 40  # functions listed in the cProfile report
+
+_current = contextvars.ContextVar('statistiq_invocation', default=None)
+
+
+def _memory_mb():
+    """
+    (current RSS, peak RSS) of the process in MB, None where unavailable.
+    """
+    rss = None
+    try:
+        with open('/proc/self/statm') as f:
+            rss = int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 2 ** 20
+    except (OSError, ValueError, AttributeError):
+        pass
+
+    peak = None
+    if resource is not None:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        peak = peak / 2 ** 20 if sys.platform == 'darwin' else peak / 2 ** 10  # bytes on macOS, KB on Linux
+    return rss, peak
+
+
+def log_json(message, **fields):
+    print(json.dumps({'severity': 'INFO', 'message': message, **fields}, default=str), flush=True)
+
+
+class Invocation:
+    def __init__(self, function_name):
+        self.function_name = function_name
+        self.id = uuid.uuid4().hex[:12]
+        self.started = time.perf_counter()
+        self.stages = {}  # name -> {'count', 'total_ms', 'max_ms'}
+        self._lock = threading.Lock()
+
+    def record(self, name, duration_ms, **fields):
+        rss, peak = _memory_mb()
+        with self._lock:
+            stats = self.stages.setdefault(name, {'count': 0, 'total_ms': 0.0, 'max_ms': 0.0})
+            stats['count'] += 1
+            stats['total_ms'] += duration_ms
+            stats['max_ms'] = max(stats['max_ms'], duration_ms)
+
+        log_json(
+            'stage',
+            function=self.function_name,
+            invocation=self.id,
+            stage=name,
+            duration_ms=round(duration_ms, 2),
+            rss_mb=round(rss, 1) if rss is not None else None,
+            peak_rss_mb=round(peak, 1) if peak is not None else None,
+            **fields,
+        )
+
+    def summary(self, **fields):
+        rss, peak = _memory_mb()
+        total_ms = (time.perf_counter() - self.started) * 1000
+        with self._lock:
+            stages = {
+                name: {**stats, 'total_ms': round(stats['total_ms'], 2), 'max_ms': round(stats['max_ms'], 2)}
+                for name, stats in self.stages.items()
+            }
+        log_json(
+            'invocation summary',
+            function=self.function_name,
+            invocation=self.id,
+            total_ms=round(total_ms, 2),
+            rss_mb=round(rss, 1) if rss is not None else None,
+            peak_rss_mb=round(peak, 1) if peak is not None else None,
+            stages=stages,
+            **fields,
+        )
+
+
+@contextmanager
+def stage(name, **fields):
+    """
+    Times the block as a stage of the current invocation. Outside an
+    instrumented invocation the block just runs.
+    """
+    invocation = _current.get()
+    if invocation is None:
+        yield
+        return
+
+    start = time.perf_counter()
+    error = None
+    try:
+        yield
+    except Exception as e:
+        error = type(e).__name__
+        raise
+    finally:
+        if error is not None:
+            fields['error'] = error
+        invocation.record(name, (time.perf_counter() - start) * 1000, **fields)
+
+
+# Run fn in a copy of the current context, for thread pools inside an invocation
+def in_context(fn):
+    context = contextvars.copy_context()
+
+    @wraps(fn)
+    def run(*args, **kwargs):
+        return context.copy().run(fn, *args, **kwargs)
+    return run
+
+
+@contextmanager
+def _profiled(function_name):
+    if PROFILE_MODE == 'cprofile':
+        import cProfile
+        import pstats
+
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            yield
+        finally:
+            profiler.disable()
+            report = io.StringIO()
+            pstats.Stats(profiler, stream=report).sort_stats('cumulative').print_stats(PROFILE_TOP)
+            log_json('profile', function=function_name, profiler='cprofile', report=report.getvalue())
+    elif PROFILE_MODE == 'pyinstrument':
+        from pyinstrument import Profiler
+
+        profiler = Profiler()
+        profiler.start()
+        try:
+            yield
+        finally:
+            profiler.stop()
+            log_json('profile', function=function_name, profiler='pyinstrument', report=profiler.output_text())
+    else:
+        yield
+
+
+def instrumented(function_name):
+    """
+    Decorator for a Cloud Function handler: opens an invocation for the
+    stages timed inside it, logs the summary when the handler returns and
+    profiles it if STATISTIQ_PROFILE is set.
+    """
+    def decorate(handler):
+        @wraps(handler)
+        def run(*args, **kwargs):
+            invocation = Invocation(function_name)
+            token = _current.set(invocation)
+            status = None
+            try:
+                with _profiled(function_name):
+                    response = handler(*args, **kwargs)
+                if isinstance(response, tuple) and len(response) > 1:
+                    status = response[1]
+                return response
+            finally:
+                invocation.summary(status=status)
+                _current.reset(token)
+        return run
+    return decorate
@@ -0,0 +1,143 @@
+"""
+This module keeps an incremental log of NBA team game rows for a season.
+
+The rows returned by LeagueGameFinder are stored as one Parquet file per
+game date. A refresh only asks the NBA API for games from the last stored
+date onwards, replaces those dates and deduplicates by GAME_ID/TEAM_ID.
+The files can be mirrored to a storage bucket so the updater and the
+predictor share one log. The fetch function is replaceable for tests.
+"""
+
+import os
+import tempfile
+import pandas as pd
+
+from utils.bucket_sync import sync_prefix
+
+LOG_DIR = os.environ.get(
+    'SEASON_LOG_DIR',
+    os.path.join(tempfile.gettempdir(), 'statistiq-season-log'),
+)
+BUCKET_PREFIX = 'data/season_log'
+KEY_COLUMNS = ['GAME_ID', 'TEAM_ID']
+
+# LeagueGameFinder team row columns, the schema of a log without any stored date
+LOG_COLUMNS = [
+    'SEASON_ID', 'TEAM_ID', 'TEAM_ABBREVIATION', 'TEAM_NAME', 'GAME_ID', 'GAME_DATE', 'MATCHUP', 'WL',
+    'MIN', 'PTS', 'FGM', 'FGA', 'FG_PCT', 'FG3M', 'FG3A', 'FG3_PCT', 'FTM', 'FTA', 'FT_PCT',
+    'OREB', 'DREB', 'REB', 'AST', 'STL', 'BLK', 'TOV', 'PF', 'PLUS_MINUS',
+]
+
+# Compact dtypes for team rows, box score counts fall back to float32 when a value is missing
+CATEGORY_COLUMNS = ['SEASON_ID', 'TEAM_ABBREVIATION', 'TEAM_NAME', 'MATCHUP', 'WL']
+INT32_COLUMNS = ['TEAM_ID']
+INT16_COLUMNS = [
+    'MIN', 'PTS', 'FGM', 'FGA', 'FG3M', 'FG3A', 'FTM', 'FTA',
+    'OREB', 'DREB', 'REB', 'AST', 'STL', 'BLK', 'TOV', 'PF',
+]
+
+
+# Default fetch, every season type from date_from (inclusive) onwards
+def fetch_league_games(season, date_from=None):
+    from nba_api.stats.endpoints import leaguegamefinder
+
+    kwargs = {'season_nullable': season}
+    if date_from is not None:
+        kwargs['date_from_nullable'] = date_from.strftime('%m/%d/%Y')
+    return leaguegamefinder.LeagueGameFinder(**kwargs).get_data_frames()[0]
+
+
+# Team rows without any row, GAME_DATE is a datetime column as in a loaded log
+def empty_team_rows(columns=None):
+    text_columns = CATEGORY_COLUMNS + ['GAME_ID']
+    return pd.DataFrame({
+        col: pd.Series(dtype='datetime64[ns]' if col == 'GAME_DATE' else object if col in text_columns else float)
+        for col in (LOG_COLUMNS if columns is None else columns)
+    })
+
+
+# Cast team rows to the compact dtypes, in place of the default object/int64/float64 ones
+def compact_team_rows(df):
+    for col in df.columns:
+        if col in CATEGORY_COLUMNS:
+            df[col] = df[col].astype('category')
+        elif col in INT32_COLUMNS:
+            df[col] = df[col].astype('int32')
+        elif col in INT16_COLUMNS and df[col].notna().all():
+            df[col] = df[col].astype('int16')
+        elif pd.api.types.is_float_dtype(df[col]) or pd.api.types.is_integer_dtype(df[col]):
+            df[col] = df[col].astype('float32')
+    return df
+
+
+class SeasonLog:
+    def __init__(self, season, root_dir=LOG_DIR, fetch_fn=fetch_league_games, bucket=None):
+        self.season = season
+        self.dir = os.path.join(root_dir, season)
+        self.fetch_fn = fetch_fn
+        self.bucket = bucket
+        os.makedirs(self.dir, exist_ok=True)
+
+    def _path(self, date):
+        return os.path.join(self.dir, f'{date}.parquet')
+
+    def _blob_name(self, date):
+        return f'{BUCKET_PREFIX}/{self.season}/{date}.parquet'
+
+    def stored_dates(self):
+        return sorted(name[:-len('.parquet')] for name in os.listdir(self.dir) if name.endswith('.parquet'))
+
+    # Download the bucket files that are missing locally or differ from the local copy
+    def sync_from_bucket(self):
+        if self.bucket is None:
+            return 0
+        return sync_prefix(self.bucket, f'{BUCKET_PREFIX}/{self.season}/', self.dir)
+
+    def _write_date(self, date, rows):
+        rows.to_parquet(self._path(date), index=False)
+        if self.bucket is not None:
+            self.bucket.blob(self._blob_name(date)).upload_from_filename(self._path(date))
+
+    def refresh(self):
+        """
+        Fetches the games from the last stored date onwards and rewrites
+        those dates. Returns the number of fetched rows.
+        """
+        self.sync_from_bucket()
+
+        dates = self.stored_dates()
+        date_from = pd.Timestamp(dates[-1]) if dates else None
+
+        new_rows = self.fetch_fn(self.season, date_from)
+        if new_rows.empty:
+            return 0
+
+        new_rows = new_rows.copy()
+        new_rows['GAME_DATE'] = pd.to_datetime(new_rows['GAME_DATE'])
+        new_rows = new_rows.drop_duplicates(subset=KEY_COLUMNS, keep='last')
+
+        # A fetched date is complete, so it replaces the stored file for that date
+        for date, rows in new_rows.groupby(new_rows['GAME_DATE'].dt.strftime('%Y-%m-%d')):
+            self._write_date(date, rows)
+
+        print(f'Season log {self.season}: fetched {len(new_rows)} rows from {date_from.date() if date_from is not None else "season start"}.')
+        return len(new_rows)
+
+    def load(self, columns=None):
+        frames = [pd.read_parquet(self._path(date), columns=columns) for date in self.stored_dates()]
+        if not frames:
+            return empty_team_rows(columns)
+
+        df = pd.concat(frames, ignore_index=True)
+        if 'GAME_DATE' in df.columns:
+            df['GAME_DATE'] = pd.to_datetime(df['GAME_DATE'])
+        if all(col in df.columns for col in KEY_COLUMNS):
+            df = df.drop_duplicates(subset=KEY_COLUMNS, keep='last')
+        return df.reset_index(drop=True)
+
+
+# Refresh the season log and return all stored rows
+def load_season_log(season, bucket=None, fetch_fn=fetch_league_games, columns=None):
+    log = SeasonLog(season, fetch_fn=fetch_fn, bucket=bucket)
+    log.refresh()
+    return log.load(columns=columns)
@@ -0,0 +1,91 @@
+"""
+This module holds the season configuration shared by the updater and the predictor.
+
+Seasons are named like the NBA API ("2025-26") and start in September, as in
+utils.features. STATISTIQ_SEASON pins the season (by default it follows the
+date) and STATISTIQ_SEASON_PHASES lists the season phases whose games are
+used, so playoff games can be predicted alongside the regular season.
+
+Early in a season the rolling features have too few games, so the games of
+the previous season are blended in until every team has played
+PRIOR_SEASON_GAMES games, like in the training history that spans seasons.
+"""
+
+import os
+from datetime import datetime
+import pandas as pd
+
+# First digit of the NBA SEASON_ID for each season phase
+PHASE_PREFIXES = {
+    'Pre Season': '1',
+    'Regular Season': '2',
+    'All Star': '3',
+    'Playoffs': '4',
+    'PlayIn': '5',
+}
+
+DEFAULT_PHASES = ('Regular Season', 'PlayIn', 'Playoffs')
+PRIOR_SEASON_GAMES = int(os.environ.get('PRIOR_SEASON_GAMES', 10))  # longest rolling window
+
+
+def season_for_date(date):
+    date = pd.Timestamp(date)
+    start = date.year - (date.month < 9)
+    return f'{start}-{(start + 1) % 100:02d}'
+
+
+def previous_season(season):
+    start = int(season[:4]) - 1
+    return f'{start}-{(start + 1) % 100:02d}'
+
+
+def current_season():
+    return os.environ.get('STATISTIQ_SEASON') or season_for_date(datetime.utcnow())
+
+
+def season_phases():
+    phases = os.environ.get('STATISTIQ_SEASON_PHASES')
+    if not phases:
+        return DEFAULT_PHASES
+    phases = tuple(phase.strip() for phase in phases.split(',') if phase.strip())
+    unknown = [phase for phase in phases if phase not in PHASE_PREFIXES]
+    if unknown:
+        raise ValueError(f'Unknown season phases {unknown}, expected some of {list(PHASE_PREFIXES)}')
+    return phases
+
+
+# Season phase of a SEASON_ID, None if unknown
+def phase_of(season_id):
+    prefix = str(season_id)[:1]
+    return next((phase for phase, p in PHASE_PREFIXES.items() if p == prefix), None)
+
+
+# Rows of LeagueGameFinder team rows that belong to the given phases
+def phase_mask(team_rows, phases):
+    prefixes = tuple(PHASE_PREFIXES[phase] for phase in phases)
+    return team_rows['SEASON_ID'].astype(str).str.startswith(prefixes)
+
+
+def needs_prior_season(team_rows, teams=30, min_games=PRIOR_SEASON_GAMES):
+    """
+    True while some team has played fewer than min_games games in team_rows
+    (a team without any game counts as zero, out of the league's teams).
+    """
+    games = team_rows.groupby('TEAM_ID', observed=True).size()
+    return len(games) < teams or bool((games < min_games).any())
+
+
+def blend_prior_season(team_rows, load_prior, min_games=PRIOR_SEASON_GAMES):
+    """
+    Prepends the previous season's team rows returned by load_prior while
+    needs_prior_season holds, so early season features see a full window.
+    """
+    if not needs_prior_season(team_rows, min_games=min_games):
+        return team_rows
+    prior = load_prior()
+    if prior is None or prior.empty:
+        return team_rows
+    if team_rows.empty:
+        return prior
+    print(f'Blending {len(prior)} team rows of the previous season into {len(team_rows)} rows.')
+    return pd.concat([prior, team_rows], ignore_index=True)
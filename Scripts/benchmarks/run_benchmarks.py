@@ -0,0 +1,739 @@
+"""
+Benchmarks for the data preparation, feature and prediction hot paths and
+for the cold start of the Cloud Functions.
+
+Every benchmark runs on synthetic data (see synthetic.py) sized by the
+command line options, and reports its wall time over --repeat runs and its
+peak traced memory (tracemalloc) over one extra run. Firestore, the storage
+bucket and OpenAI are replaced by in-memory stand-ins and the models by small
+stubs (pickled, and compiled for MODEL_FORMAT=compiled), so the predictor
+benchmarks only need the predictor's own requirements installed. The models
+group trains sklearn models of the production sizes and compares loading and
+running them pickled and compiled. A group whose modules cannot be imported
+is reported as skipped.
+
+The startup group runs startup_probe.py in a fresh interpreter per run and
+reports the import time of each entry point (with the slowest imports from
+python -X importtime) and the time to its first request, with the peak RSS
+of the process as memory.
+
+    python run_benchmarks.py --output results.json
+    python run_benchmarks.py --output new.json --baseline results.json
+    python run_benchmarks.py --only startup --import-budget 1.5
+
+With --baseline the run fails (exit code 1) when a benchmark's median wall
+time or peak memory grew by more than --tolerance against the baseline file,
+and with --import-budget when an entry point imports slower than the budget.
+"""
+
+import argparse
+import importlib
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta, timezone
+
+import joblib
+import numpy as np
+import pandas as pd
+
+import startup_probe
+import synthetic
+
+benchmarks_dir = os.path.dirname(os.path.abspath(__file__))
+scripts_dir = os.path.dirname(benchmarks_dir)
+ai_dir = os.path.join(scripts_dir, 'ai')
+predictor_dir = os.path.join(scripts_dir, 'nba_predictor')
+updater_dir = os.path.join(scripts_dir, 'nba_updater')
+probe_path = os.path.join(benchmarks_dir, 'startup_probe.py')
+
+BENCHMARKS = []  # (group, name, setup), setup(ctx) returns the callable to measure
+MODEL_TRAINING_ROWS = 2000
+
+
+def benchmark(group, name):
+    def register(setup):
+        BENCHMARKS.append((group, name, setup))
+        return setup
+    return register
+
+
+# Mark a benchmark callable that times itself, returning {'seconds', 'peak_memory_mb', 'details'}
+def self_timed(fn):
+    fn.self_timed = True
+    return fn
+
+
+def measure(fn, repeat):
+    if getattr(fn, 'self_timed', False):
+        return measure_self_timed(fn, repeat)
+
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    try:
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        'wall_time_s': {
+            'min': min(times),
+            'median': statistics.median(times),
+            'mean': statistics.fmean(times),
+        },
+        'peak_memory_mb': peak / 2 ** 20,
+        'repeat': repeat,
+    }
+
+
+def measure_self_timed(fn, repeat):
+    runs = [fn() for _ in range(repeat)]
+    times = [run['seconds'] for run in runs]
+    result = {
+        'wall_time_s': {
+            'min': min(times),
+            'median': statistics.median(times),
+            'mean': statistics.fmean(times),
+        },
+        'peak_memory_mb': max(run['peak_memory_mb'] for run in runs),
+        'repeat': repeat,
+    }
+    if runs[-1].get('details'):
+        result['details'] = runs[-1]['details']
+    return result
+
+
+# "2" + start year as in SEASON_ID -> "2025-26"
+def season_name(season_id):
+    start = int(str(season_id)[1:])
+    return f'{start}-{(start + 1) % 100:02d}'
+
+
+class Context:
+    """
+    Synthetic data for one configuration, and the modules under test loaded
+    lazily against it.
+    """
+
+    def __init__(self, args, work_dir):
+        self.args = args
+        self.work_dir = work_dir
+        self.teams = synthetic.make_teams(args.teams)
+        self.games = synthetic.simulate_games(args.teams, args.seasons, args.games_per_team, seed=args.seed)
+        self.team_statistics = synthetic.team_statistics(self.games, self.teams)
+        self.team_rows = synthetic.team_rows(self.games, self.teams)
+        self.matchups = synthetic.slate(args.teams, args.slate, seed=args.seed)
+        self._modules = {}
+
+        # The season the predictor sees as the current one
+        current_season = self.team_rows['SEASON_ID'].max()
+        self.season_rows = self.team_rows[self.team_rows['SEASON_ID'] == current_season].reset_index(drop=True)
+        self.season = season_name(current_season)
+
+        self.nba_matchups = [
+            (int(self.teams['team_id'].iloc[home]), int(self.teams['team_id'].iloc[away]))
+            for home, away in self.matchups
+        ]
+
+    def data_handler(self):
+        if 'data_handler' not in self._modules:
+            data_dir = os.path.join(self.work_dir, 'data')
+            os.makedirs(data_dir, exist_ok=True)
+            self.team_statistics.to_csv(os.path.join(data_dir, 'team_statistics.csv'), index=False)
+            synthetic.team_ids_table(self.teams).to_csv(os.path.join(data_dir, 'team_ids.csv'), index=False)
+
+            os.environ['STATISTIQ_DATA_DIR'] = data_dir
+            if ai_dir not in sys.path:
+                sys.path.append(ai_dir)
+            self._modules['data_handler'] = importlib.import_module('utils.data_handler')
+        return self._modules['data_handler']
+
+    def features(self):
+        if 'features' not in self._modules:
+            if ai_dir not in sys.path:
+                sys.path.append(ai_dir)
+            self._modules['features'] = importlib.import_module('utils.features')
+        return self._modules['features']
+
+    def games_frame(self):
+        if 'games_frame' not in self._modules:
+            games = self.features().games_from_team_rows(self.team_rows)
+            games['gameDate'] = pd.to_datetime(games['gameDate'], utc=True)
+            self._modules['games_frame'] = games
+        return self._modules['games_frame']
+
+    def predictor(self):
+        if 'predictor' not in self._modules:
+            self._modules['predictor'] = self._load_predictor()
+        return self._modules['predictor']
+
+    def _load_predictor(self):
+        os.environ.update(startup_probe.entry_environment(self.work_dir))
+        os.environ['STATISTIQ_SEASON'] = self.season
+        # ai/ stands in for the utils the deploy packages into the function
+        for directory in (predictor_dir, ai_dir):
+            if directory not in sys.path:
+                sys.path.append(directory)
+
+        main = importlib.import_module('main')
+        from utils.elo import EloRatings
+        write_stub_artifacts(main, os.environ['ARTIFACT_SOURCE_DIR'], self.teams)
+
+        # The season caches load from the bucket, serve the synthetic season instead
+        main.get_season_df = lambda season, phases=None: self.season_rows
+        main.TEAM_MAPPING = {
+            int(team.firebase_id): {'name': f'{team.city} {team.name}', 'nba_id': int(team.team_id)}
+            for team in self.teams.itertuples()
+        }
+        elo = EloRatings()
+        elo.update_from_team_games(self.season_rows)
+        main.load_elo_snapshot = lambda season: elo
+        self.elo = elo
+        store = main.load_feature_store(self.season)
+        main.get_feature_store = lambda season: store
+        main.OPENAI_CLIENT = synthetic.FakeOpenAI(latency=self.args.openai_latency)
+        main.prefetch_artifacts()
+        return main
+
+    def reset_predictor_state(self, main):
+        main.DB = synthetic.FakeFirestore({
+            'games_schedule': synthetic.schedule_documents(self.teams, self.matchups, datetime.now(timezone.utc)),
+        })
+        main.SUMMARY_CACHE.clear()
+
+    def updater(self):
+        if 'updater' not in self._modules:
+            self._modules['updater'] = self._load_updater()
+        return self._modules['updater']
+
+    def _load_updater(self):
+        os.environ.update(startup_probe.entry_environment(self.work_dir))
+        os.environ['STATISTIQ_SEASON'] = self.season
+        for directory in (updater_dir, ai_dir):
+            if directory not in sys.path:
+                sys.path.append(directory)
+
+        update_games = importlib.import_module('update_games')
+
+        # The season logs come from the NBA API, serve the synthetic seasons instead
+        logs = {
+            season_name(season_id): rows.reset_index(drop=True)
+            for season_id, rows in self.team_rows.groupby('SEASON_ID')
+        }
+        update_games.load_season_log = lambda season, bucket=None, **kwargs: logs.get(season, pd.DataFrame())
+        team_ids = synthetic.team_ids_table(self.teams)
+        update_games.TEAM_IDS = dict(zip(team_ids['Team'], team_ids['ID']))
+        return update_games
+
+    def models(self):
+        if 'models' not in self._modules:
+            self._modules['models'] = self._train_models()
+        return self._modules['models']
+
+    def _train_models(self):
+        """
+        Pickled and compiled files of a win probability, points and overtime
+        model like the production ones, trained on random features, and a
+        slate of inputs: {'files': {key: {'model', 'scaler', 'compiled'}}, 'slate'}.
+        """
+        from sklearn.ensemble import GradientBoostingClassifier, RandomForestRegressor
+        from sklearn.linear_model import LogisticRegression
+        from sklearn.preprocessing import StandardScaler
+
+        if ai_dir not in sys.path:
+            sys.path.append(ai_dir)
+        from utils.compiled_models import compile_model
+
+        rng = np.random.default_rng(self.args.seed)
+        columns = [f'feature_{i}' for i in range(7)]
+        X = pd.DataFrame(rng.normal(110, 10, size=(MODEL_TRAINING_ROWS, len(columns))), columns=columns)
+        score = X.to_numpy() @ rng.normal(size=len(columns)) / 10 + rng.normal(size=len(X))
+        scaler = StandardScaler().fit(X)
+        X_scaled = scaler.transform(X)
+        estimators = {
+            'win_prob': LogisticRegression(max_iter=1000).fit(X_scaled, score > np.median(score)),
+            'points': RandomForestRegressor(n_estimators=400, min_samples_leaf=5, random_state=0).fit(X_scaled, 110 + score),
+            'ot': GradientBoostingClassifier(n_estimators=500, max_depth=3).fit(X_scaled, score > np.quantile(score, 0.94)),
+        }
+
+        model_dir = os.path.join(self.work_dir, 'models')
+        os.makedirs(model_dir, exist_ok=True)
+        files = {}
+        for key, model in estimators.items():
+            files[key] = {name: os.path.join(model_dir, f'{key}.{name}') for name in ('model', 'scaler', 'compiled')}
+            joblib.dump(model, files[key]['model'])
+            joblib.dump(scaler, files[key]['scaler'])
+            compile_model(model, [scaler]).save(files[key]['compiled'])
+        return {'files': files, 'slate': X.sample(self.args.slate, random_state=0)}
+
+    def reset_updater_state(self, update_games):
+        yesterday = datetime.now(timezone.utc) - timedelta(days=1)
+        update_games.DB = synthetic.FakeFirestore({
+            'games_schedule': synthetic.schedule_documents(self.teams, self.matchups, yesterday),
+        })
+        update_games.BUCKET = synthetic.FakeBucket()
+
+
+def write_stub_artifacts(main, artifact_dir, teams):
+    def dump(name, obj):
+        path = os.path.join(artifact_dir, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        joblib.dump(obj, path)
+
+    for key, name in main.models.names.items():
+        if key in ('win_prob', 'ot'):
+            dump(name, synthetic.StubClassifier())
+        else:
+            dump(name, synthetic.StubRegressor(bias=110.0 if 'points' in key else 0.0, scale=8.0))
+    for name in main.scalers.names.values():
+        dump(name, synthetic.StubScaler())
+    dump('data/feature_medians.pkl', {name: 0.0 for name in main.WIN_PROB_FEATURES})
+
+    # Compiled stand-ins, linear over the features each model gets
+    from utils.compiled_models import LinearModel
+
+    features = {
+        'win_prob': main.WIN_PROB_FEATURES,
+        'home_points': main.POINTS_FEATURES,
+        'away_points': main.POINTS_FEATURES,
+        'margin': main.MARGIN_FEATURES,
+        'ot': main.OT_FEATURES,
+    }
+    for key, name in main.compiled_models.names.items():
+        n = len(features[key])
+        if key in ('win_prob', 'ot'):
+            model = LinearModel(np.full(n, 1e-3), 0.0, task='classification', n_features=n, link='logistic',
+                                classes=[0, 1], feature_names=features[key])
+        else:
+            model = LinearModel(np.full(n, 0.1 / n), 110.0 if 'points' in key else 0.0, task='regression',
+                                n_features=n, feature_names=features[key])
+        model.save(os.path.join(artifact_dir, name))
+
+    team_ids_path = os.path.join(artifact_dir, 'data', 'team_ids.csv')
+    synthetic.team_ids_table(teams).to_csv(team_ids_path, index=False)
+
+
+# =========================
+# DATA PREPARATION
+# =========================
+
+@benchmark('data_prep', 'repair_team_id')
+def bench_repair_team_id(ctx):
+    data_handler = ctx.data_handler()
+    return lambda: data_handler.repair_team_id(ctx.team_statistics)
+
+
+@benchmark('data_prep', 'prepare_dataset')
+def bench_prepare_dataset(ctx):
+    data_handler = ctx.data_handler()
+    # prepare_dataset writes games.csv to the working directory, which is the benchmark work dir
+    return lambda: data_handler.prepare_dataset(ctx.team_statistics.copy())
+
+
+@benchmark('data_prep', 'compute_head_to_head_avg_rowwise')
+def bench_head_to_head_rowwise(ctx):
+    data_handler = ctx.data_handler()
+    games = ctx.games_frame()
+    sample = games.tail(ctx.args.rowwise_rows)
+    return lambda: sample.apply(lambda row: data_handler.compute_head_to_head_avg(row, games), axis=1)
+
+
+# =========================
+# FEATURES
+# =========================
+
+@benchmark('features', 'compute_head_to_head_avgs')
+def bench_head_to_head(ctx):
+    features = ctx.features()
+    games = ctx.games_frame()
+    return lambda: features.compute_head_to_head_avgs(games)
+
+
+@benchmark('features', 'compute_features')
+def bench_compute_features(ctx):
+    features = ctx.features()
+    games = ctx.games_frame()
+    return lambda: features.compute_features(games)
+
+
+@benchmark('features', 'compute_live_features')
+def bench_live_features(ctx):
+    features = ctx.features()
+    history = features.games_from_team_rows(ctx.season_rows)
+    return lambda: features.compute_live_features(history, ctx.nba_matchups, as_of=datetime.now(timezone.utc))
+
+
+@benchmark('features', 'feature_store_snapshot')
+def bench_feature_store_snapshot(ctx):
+    from utils.feature_store import compute_snapshot
+
+    ctx.features()
+    return lambda: compute_snapshot(ctx.season_rows, datetime.now(timezone.utc))
+
+
+@benchmark('features', 'feature_store_game_features')
+def bench_feature_store_lookup(ctx):
+    from utils.feature_store import FeatureStore
+
+    ctx.features()
+    store = FeatureStore('benchmark', root_dir=os.path.join(ctx.work_dir, 'store_lookup'))
+    dates = pd.to_datetime(ctx.season_rows['GAME_DATE']).dt.normalize().drop_duplicates()
+    for date in dates.iloc[-ctx.args.snapshots:]:
+        store.append(ctx.season_rows, as_of=date)
+    games = ctx.features().games_from_team_rows(ctx.season_rows)
+    return lambda: store.game_features(games)
+
+
+@benchmark('features', 'elo_update_from_team_games')
+def bench_elo(ctx):
+    from utils.elo import EloRatings
+
+    ctx.features()
+    return lambda: EloRatings().update_from_team_games(ctx.team_rows)
+
+
+# =========================
+# PREDICTOR
+# =========================
+
+@benchmark('predictor', 'build_team_table')
+def bench_team_table(ctx):
+    main = ctx.predictor()
+    return lambda: main.build_team_table(ctx.season_rows)
+
+
+@benchmark('predictor', 'build_live_features')
+def bench_build_live_features(ctx):
+    main = ctx.predictor()
+    return lambda: main.build_live_features(ctx.season_rows, ctx.nba_matchups, ctx.elo, main.current_season())
+
+
+@benchmark('predictor', 'build_payloads')
+def bench_payloads(ctx):
+    main = ctx.predictor()
+    live = main.build_live_features(ctx.season_rows, ctx.nba_matchups, ctx.elo, main.current_season())
+    rows = [features for _, features in live.iterrows()]
+
+    def run():
+        for features in rows:
+            main.build_feature_payload(features)
+            main.apply_training_imputation(main.build_winning_percentage_payload(features))
+    return run
+
+
+@benchmark('predictor', 'predict_batch')
+def bench_predict_batch(ctx):
+    main = ctx.predictor()
+    live = main.build_live_features(ctx.season_rows, ctx.nba_matchups, ctx.elo, main.current_season())
+    base_rows = [main.build_feature_payload(features) for _, features in live.iterrows()]
+    winprob_rows = [
+        main.apply_training_imputation(main.build_winning_percentage_payload(features))
+        for _, features in live.iterrows()
+    ]
+    return lambda: main.predict_batch(base_rows, winprob_rows)
+
+
+@benchmark('predictor', 'predict_games_slate')
+def bench_predict_games(ctx):
+    main = ctx.predictor()
+
+    def run():
+        ctx.reset_predictor_state(main)
+        body, status = main.predict_games(None)
+        if status != 200:
+            raise RuntimeError(body)
+    return run
+
+
+# =========================
+# UPDATER
+# =========================
+
+@benchmark('updater', 'format_games_season')
+def bench_format_games(ctx):
+    update_games = ctx.updater()
+    return lambda: update_games.format_games(ctx.season_rows, update_games.TEAM_IDS)
+
+
+@benchmark('updater', 'update_games')
+def bench_update_games(ctx):
+    update_games = ctx.updater()
+
+    def run():
+        ctx.reset_updater_state(update_games)
+        body, status = update_games.update_games(None)
+        if status != 200:
+            raise RuntimeError(body)
+    return run
+
+
+# =========================
+# MODELS
+# =========================
+
+def _predict(key, model, X):
+    return model.predict_proba(X) if key in ('win_prob', 'ot') else model.predict(X)
+
+
+@benchmark('models', 'load_pickled')
+def bench_load_pickled(ctx):
+    files = ctx.models()['files']
+    return lambda: [(joblib.load(f['model']), joblib.load(f['scaler'])) for f in files.values()]
+
+
+@benchmark('models', 'load_compiled')
+def bench_load_compiled(ctx):
+    from utils.compiled_models import load_compiled
+
+    files = ctx.models()['files']
+    return lambda: [load_compiled(f['compiled']) for f in files.values()]
+
+
+@benchmark('models', 'predict_pickled')
+def bench_predict_pickled(ctx):
+    models = ctx.models()
+    loaded = {key: (joblib.load(f['model']), joblib.load(f['scaler'])) for key, f in models['files'].items()}
+
+    def run():
+        for key, (model, scaler) in loaded.items():
+            _predict(key, model, scaler.transform(models['slate']))
+    return run
+
+
+@benchmark('models', 'predict_compiled')
+def bench_predict_compiled(ctx):
+    from utils.compiled_models import load_compiled
+
+    models = ctx.models()
+    loaded = {key: load_compiled(f['compiled']) for key, f in models['files'].items()}
+
+    def run():
+        for key, model in loaded.items():
+            _predict(key, model, models['slate'])
+    return run
+
+
+# =========================
+# STARTUP
+# =========================
+
+def run_probe(ctx, entry, request=False, importtime=False):
+    """
+    Runs startup_probe.py for an entry point in a fresh interpreter and
+    returns its report. Raises ImportError if the entry point cannot be imported.
+    """
+    command = [sys.executable] + (['-X', 'importtime'] if importtime else []) + [probe_path, entry]
+    if request:
+        command += ['--request', '--'] + [
+            f'--teams={ctx.args.teams}', f'--seasons={ctx.args.seasons}',
+            f'--games-per-team={ctx.args.games_per_team}', f'--slate={ctx.args.slate}', f'--seed={ctx.args.seed}',
+        ]
+    completed = subprocess.run(command, capture_output=True, text=True, cwd=ctx.work_dir)
+    if completed.returncode != 0:
+        error = completed.stderr.strip().splitlines()[-1] if completed.stderr.strip() else f'exit code {completed.returncode}'
+        if 'ModuleNotFoundError' in completed.stderr or 'ImportError' in completed.stderr:
+            raise ImportError(error)
+        raise RuntimeError(f'{entry} startup probe failed: {error}')
+
+    report = json.loads(completed.stdout.strip().splitlines()[-1])
+    if importtime:
+        report['slowest_imports'] = slowest_imports(completed.stderr, startup_probe.ENTRY_POINTS[entry][1])
+    return report
+
+
+def slowest_imports(importtime_log, module, top=10):
+    """
+    Direct imports of module by cumulative time (ms), from the stderr of
+    python -X importtime where module is imported at the top level.
+    """
+    imports = []
+    for line in importtime_log.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        if not cumulative.strip().isdigit():
+            continue  # header
+        level = (len(name) - len(name.lstrip()) - 1) // 2
+        name = name.strip()
+        if level == 0 and name != module:
+            imports = []  # imported by the probe itself
+        elif level == 0:
+            ranked = sorted(imports, key=lambda item: -item[1])[:top]
+            return {
+                'total_ms': int(cumulative) / 1000,
+                'imports_ms': {name: us / 1000 for name, us in ranked},
+            }
+        elif level == 1:
+            imports.append((name, int(cumulative)))
+    return None
+
+
+def startup_import(ctx, entry):
+    # First run warms the file system cache and records where the import time goes
+    breakdown = run_probe(ctx, entry, importtime=True)['slowest_imports']
+
+    def run():
+        report = run_probe(ctx, entry)
+        return {
+            'seconds': report['import_s'],
+            'peak_memory_mb': report['import_peak_rss_mb'],
+            'details': {'slowest_imports': breakdown},
+        }
+    return self_timed(run)
+
+
+def startup_first_request(ctx, entry):
+    run_probe(ctx, entry, request=True)
+
+    def run():
+        report = run_probe(ctx, entry, request=True)
+        return {
+            'seconds': report['import_s'] + report['request_s'],
+            'peak_memory_mb': report['peak_rss_mb'],
+            'details': {'import_s': report['import_s'], 'request_s': report['request_s']},
+        }
+    return self_timed(run)
+
+
+@benchmark('startup', 'predictor_import')
+def bench_predictor_import(ctx):
+    return startup_import(ctx, 'predictor')
+
+
+@benchmark('startup', 'predictor_first_request')
+def bench_predictor_first_request(ctx):
+    return startup_first_request(ctx, 'predictor')
+
+
+@benchmark('startup', 'updater_import')
+def bench_updater_import(ctx):
+    return startup_import(ctx, 'updater')
+
+
+@benchmark('startup', 'updater_first_request')
+def bench_updater_first_request(ctx):
+    return startup_first_request(ctx, 'updater')
+
+
+def compare(results, baseline, tolerance):
+    regressions = []
+    for name, result in results.items():
+        before = baseline.get('results', {}).get(name)
+        if not before or 'wall_time_s' not in result or 'wall_time_s' not in before:
+            continue
+        checks = [
+            ('wall_time_s.median', before['wall_time_s']['median'], result['wall_time_s']['median']),
+            ('peak_memory_mb', before['peak_memory_mb'], result['peak_memory_mb']),
+        ]
+        for metric, old, new in checks:
+            if old > 0 and new > old * (1 + tolerance):
+                regressions.append(f'{name} {metric}: {old:.4f} -> {new:.4f} (+{(new / old - 1) * 100:.0f}%)')
+    return regressions
+
+
+def over_import_budget(results, budget):
+    return [
+        f"{name}: {result['wall_time_s']['median']:.3f} s > {budget:.3f} s"
+        for name, result in results.items()
+        if result.get('group') == 'startup' and name.endswith('_import')
+        and 'wall_time_s' in result and result['wall_time_s']['median'] > budget
+    ]
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--teams', type=int, default=30)
+    parser.add_argument('--seasons', type=int, default=3)
+    parser.add_argument('--games-per-team', type=int, default=82)
+    parser.add_argument('--slate', type=int, default=15, help='games in the predicted slate')
+    parser.add_argument('--rowwise-rows', type=int, default=300, help='rows for the row-wise head to head')
+    parser.add_argument('--snapshots', type=int, default=30, help='feature store snapshots for the lookup benchmark')
+    parser.add_argument('--openai-latency', type=float, default=0.0, help='seconds per stubbed completion')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--only', action='append', help='run only benchmarks or groups with this name')
+    parser.add_argument('--output', help='write the JSON results here instead of stdout')
+    parser.add_argument('--baseline', help='JSON results to compare against')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='allowed relative growth against the baseline')
+    parser.add_argument('--import-budget', type=float, help='seconds an entry point may take to import')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    work_dir = tempfile.mkdtemp(prefix='statistiq-bench-')
+    cwd = os.getcwd()
+    os.chdir(work_dir)
+    try:
+        ctx = Context(args, work_dir)
+        results = {}
+        skipped_groups = {}
+
+        for group, name, setup in BENCHMARKS:
+            if args.only and group not in args.only and name not in args.only:
+                continue
+            if group in skipped_groups:
+                results[name] = {'group': group, 'skipped': skipped_groups[group]}
+                continue
+
+            try:
+                fn = setup(ctx)
+            except ImportError as e:
+                skipped_groups[group] = f'{type(e).__name__}: {e}'
+                results[name] = {'group': group, 'skipped': skipped_groups[group]}
+                print(f'Skipping {group}: {skipped_groups[group]}', file=sys.stderr)
+                continue
+
+            results[name] = {'group': group, **measure(fn, args.repeat)}
+            print(
+                f"{name}: {results[name]['wall_time_s']['median'] * 1000:.1f} ms, "
+                f"{results[name]['peak_memory_mb']:.1f} MB peak",
+                file=sys.stderr,
+            )
+    finally:
+        os.chdir(cwd)
+
+    report = {
+        'created_at': datetime.now(timezone.utc).isoformat(),
+        'environment': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'pandas': pd.__version__,
+            'numpy': np.__version__,
+        },
+        'config': {key: value for key, value in vars(args).items() if key not in ('output', 'baseline', 'import_budget')},
+        'results': results,
+    }
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+    else:
+        print(output)
+
+    failures = []
+    if args.baseline:
+        with open(args.baseline) as f:
+            failures += [f'REGRESSION {regression}' for regression in compare(results, json.load(f), args.tolerance)]
+    if args.import_budget is not None:
+        failures += [f'OVER BUDGET {line}' for line in over_import_budget(results, args.import_budget)]
+    for failure in failures:
+        print(failure, file=sys.stderr)
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,94 @@
+"""
+Cold start probe for the Cloud Function entry points.
+
+run_benchmarks.py runs it in a fresh interpreter (with -X importtime for the
+import breakdown), so the entry module is the first thing the process imports:
+
+    python startup_probe.py predictor
+    python startup_probe.py updater --request -- --teams 30 --seasons 2
+
+It prints one JSON line with the import time of the entry module and, with
+--request, the time of the first request against the in-memory stand-ins of
+synthetic.py (options after -- size the synthetic data as in run_benchmarks.py),
+together with the peak RSS of the process. Everything else goes to stderr.
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import resource
+import sys
+import tempfile
+import time
+
+benchmarks_dir = os.path.dirname(os.path.abspath(__file__))
+scripts_dir = os.path.dirname(benchmarks_dir)
+
+# entry point -> (directory, module, handler)
+ENTRY_POINTS = {
+    'predictor': ('nba_predictor', 'main', 'predict_games'),
+    'updater': ('nba_updater', 'update_games', 'update_games'),
+}
+
+
+# Environment the entry modules read at import time, shared with run_benchmarks.Context
+def entry_environment(work_dir):
+    return {
+        'ARTIFACT_SOURCE_DIR': os.path.join(work_dir, 'artifacts'),
+        'ARTIFACT_CACHE_DIR': os.path.join(work_dir, 'artifact_cache'),
+        'FEATURE_STORE_DIR': os.path.join(work_dir, 'feature_store'),
+        'SEASON_LOG_DIR': os.path.join(work_dir, 'season_log'),
+    }
+
+
+def peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 2 ** 20 if sys.platform == 'darwin' else peak / 2 ** 10  # bytes on macOS, KB on Linux
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else list(argv)
+    # Options after -- are passed on to run_benchmarks.py
+    options = argv[argv.index('--') + 1:] if '--' in argv else []
+    argv = argv[:argv.index('--')] if '--' in argv else argv
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('entry', choices=sorted(ENTRY_POINTS))
+    parser.add_argument('--request', action='store_true', help='also time the first request')
+    args = parser.parse_args(argv)
+
+    directory, module_name, handler_name = ENTRY_POINTS[args.entry]
+    work_dir = tempfile.mkdtemp(prefix='statistiq-startup-')
+    os.environ.update(entry_environment(work_dir))
+    sys.path.append(os.path.join(scripts_dir, directory))
+    sys.path.append(os.path.join(scripts_dir, 'ai'))  # the utils the deploy packages into the function
+
+    report = {'entry': args.entry}
+    with contextlib.redirect_stdout(sys.stderr):
+        start = time.perf_counter()
+        module = __import__(module_name)  # importlib.import_module would not show up in -X importtime
+        report['import_s'] = time.perf_counter() - start
+        report['import_peak_rss_mb'] = peak_rss_mb()
+
+        if args.request:
+            sys.path.insert(0, benchmarks_dir)
+            import run_benchmarks
+
+            ctx = run_benchmarks.Context(run_benchmarks.parse_args(options), work_dir)
+            getattr(ctx, args.entry)()
+            getattr(ctx, f'reset_{args.entry}_state')(module)
+
+            start = time.perf_counter()
+            body, status = getattr(module, handler_name)(None)
+            report['request_s'] = time.perf_counter() - start
+            if status != 200:
+                raise RuntimeError(f'{args.entry} returned {status}: {body}')
+
+    report['peak_rss_mb'] = peak_rss_mb()
+    print(json.dumps(report))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
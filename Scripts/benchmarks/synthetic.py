@@ -0,0 +1,384 @@
+"""
+This module generates synthetic NBA data and stand-ins for the cloud services
+used by the benchmarks.
+
+Every generator is seeded and builds on the same simulated schedule, so the
+team statistics (training data) and the LeagueGameFinder team rows (season
+log) of one configuration describe the same games. The last simulated season
+ends yesterday, so the predictor sees it as the current one.
+"""
+
+import base64
+import hashlib
+import math
+import time
+import numpy as np
+import pandas as pd
+
+FIRST_NBA_TEAM_ID = 1610612737
+
+
+def make_teams(n_teams):
+    ids = np.arange(n_teams)
+    return pd.DataFrame({
+        'firebase_id': ids + 1,
+        'team_id': FIRST_NBA_TEAM_ID + ids,
+        'city': [f'City {i}' for i in ids],
+        'name': [f'Team{i}' for i in ids],
+        'abbreviation': [f'T{i:02d}' for i in ids],
+    })
+
+
+# One row per simulated game with the box score of both teams
+def simulate_games(n_teams=30, n_seasons=2, games_per_team=82, seed=0, end_date=None):
+    rng = np.random.default_rng(seed)
+    end_date = pd.Timestamp(end_date or pd.Timestamp.utcnow().tz_localize(None) - pd.Timedelta(days=1)).normalize()
+    games_per_day = max(1, n_teams // 3)
+    season_games = n_teams * games_per_team // 2
+    season_days = math.ceil(season_games / games_per_day)
+    strength = rng.normal(0, 4, n_teams)
+
+    games = []
+    game_number = 0
+    for season_index in range(n_seasons):
+        season_end = end_date - pd.DateOffset(years=n_seasons - 1 - season_index)
+        season_start = season_end - pd.Timedelta(days=season_days - 1)
+        season_year = season_start.year if season_start.month >= 9 else season_start.year - 1
+
+        played = 0
+        for day in range(season_days):
+            day_games = min(games_per_day, season_games - played)
+            order = rng.permutation(n_teams)[:2 * day_games]
+            for home, away in order.reshape(-1, 2):
+                game_number += 1
+                games.append((season_year, season_start + pd.Timedelta(days=day), game_number, home, away))
+            played += day_games
+
+    frame = pd.DataFrame(games, columns=['season', 'gameDate', 'game_number', 'home', 'away'])
+    n = len(frame)
+
+    for side, sign in (('home', 1), ('away', -1)):
+        team_strength = strength[frame[side].to_numpy()]
+        fga = rng.normal(88, 5, n).round()
+        fg3a = rng.normal(35, 5, n).round()
+        fta = rng.normal(22, 5, n).clip(5).round()
+        fg3m = rng.binomial(fg3a.astype(int), 0.36)
+        fgm = np.maximum(rng.binomial(fga.astype(int), 0.47 + team_strength / 200), fg3m)
+        ftm = rng.binomial(fta.astype(int), 0.78)
+        frame[f'{side}_fga'] = fga
+        frame[f'{side}_fgm'] = fgm
+        frame[f'{side}_fg3a'] = fg3a
+        frame[f'{side}_fg3m'] = fg3m
+        frame[f'{side}_fta'] = fta
+        frame[f'{side}_ftm'] = ftm
+        frame[f'{side}_pts'] = 2 * fgm + fg3m + ftm + (sign > 0) * rng.integers(0, 3, n)
+        frame[f'{side}_oreb'] = rng.poisson(10, n)
+        frame[f'{side}_dreb'] = rng.poisson(34, n)
+        frame[f'{side}_ast'] = rng.poisson(25, n)
+        frame[f'{side}_stl'] = rng.poisson(8, n)
+        frame[f'{side}_blk'] = rng.poisson(5, n)
+        frame[f'{side}_tov'] = rng.poisson(14, n)
+        frame[f'{side}_pf'] = rng.poisson(19, n)
+
+    # No ties, a drawn game goes to the home team
+    tied = frame['home_pts'] == frame['away_pts']
+    frame.loc[tied, 'home_pts'] += 1
+    frame['overtime'] = rng.random(n) < 0.06
+    return frame
+
+
+# Team statistics rows as in data/team_statistics.csv, two per game
+def team_statistics(games, teams):
+    rows = []
+    for side, other in (('home', 'away'), ('away', 'home')):
+        team = teams.iloc[games[side].to_numpy()].reset_index(drop=True)
+        opponent = teams.iloc[games[other].to_numpy()].reset_index(drop=True)
+        rows.append(pd.DataFrame({
+            'gameId': 20000000 + games['game_number'].to_numpy(),
+            'gameDate': (games['gameDate'] + pd.Timedelta(hours=19)).dt.strftime('%Y-%m-%d %H:%M:%S').to_numpy(),
+            'teamCity': team['city'],
+            'teamName': team['name'],
+            'teamId': team['team_id'],
+            'opponentTeamCity': opponent['city'],
+            'opponentTeamName': opponent['name'],
+            'opponentTeamId': opponent['team_id'],
+            'home': int(side == 'home'),
+            'win': (games[f'{side}_pts'] > games[f'{other}_pts']).astype(int).to_numpy(),
+            'teamScore': games[f'{side}_pts'].to_numpy(),
+            'opponentScore': games[f'{other}_pts'].to_numpy(),
+            'assists': games[f'{side}_ast'].to_numpy(),
+            'blocks': games[f'{side}_blk'].to_numpy(),
+            'steals': games[f'{side}_stl'].to_numpy(),
+            'fieldGoalsAttempted': games[f'{side}_fga'].to_numpy(),
+            'fieldGoalsMade': games[f'{side}_fgm'].to_numpy(),
+            'threePointersAttempted': games[f'{side}_fg3a'].to_numpy(),
+            'threePointersMade': games[f'{side}_fg3m'].to_numpy(),
+            'freeThrowsAttempted': games[f'{side}_fta'].to_numpy(),
+            'freeThrowsMade': games[f'{side}_ftm'].to_numpy(),
+            'reboundsDefensive': games[f'{side}_dreb'].to_numpy(),
+            'reboundsOffensive': games[f'{side}_oreb'].to_numpy(),
+            'foulsPersonal': games[f'{side}_pf'].to_numpy(),
+            'turnovers': games[f'{side}_tov'].to_numpy(),
+            'coachId': team['team_id'] + 1000,
+            'seasonWins': 0,
+            'seasonLosses': 0,
+        }))
+    return pd.concat(rows, ignore_index=True).sort_values(['gameDate', 'gameId'], kind='mergesort').reset_index(drop=True)
+
+
+# LeagueGameFinder team rows as stored in the season log, two per game
+def team_rows(games, teams):
+    rows = []
+    for side, other in (('home', 'away'), ('away', 'home')):
+        team = teams.iloc[games[side].to_numpy()].reset_index(drop=True)
+        opponent = teams.iloc[games[other].to_numpy()].reset_index(drop=True)
+        separator = ' vs. ' if side == 'home' else ' @ '
+        pts = games[f'{side}_pts'].to_numpy()
+        rows.append(pd.DataFrame({
+            'SEASON_ID': ('2' + games['season'].astype(str)).to_numpy(),
+            'TEAM_ID': team['team_id'],
+            'TEAM_ABBREVIATION': team['abbreviation'],
+            'TEAM_NAME': team['city'] + ' ' + team['name'],
+            'GAME_ID': ('002' + games['game_number'].astype(str).str.zfill(7)).to_numpy(),
+            'GAME_DATE': games['gameDate'].to_numpy(),
+            'MATCHUP': team['abbreviation'] + separator + opponent['abbreviation'],
+            'WL': np.where(pts > games[f'{other}_pts'].to_numpy(), 'W', 'L'),
+            'MIN': np.where(games['overtime'].to_numpy(), 265, 240),
+            'PTS': pts,
+            'FGM': games[f'{side}_fgm'].to_numpy(),
+            'FGA': games[f'{side}_fga'].to_numpy(),
+            'FG_PCT': (games[f'{side}_fgm'] / games[f'{side}_fga']).round(3).to_numpy(),
+            'FG3M': games[f'{side}_fg3m'].to_numpy(),
+            'FG3A': games[f'{side}_fg3a'].to_numpy(),
+            'FG3_PCT': (games[f'{side}_fg3m'] / games[f'{side}_fg3a']).round(3).to_numpy(),
+            'FTM': games[f'{side}_ftm'].to_numpy(),
+            'FTA': games[f'{side}_fta'].to_numpy(),
+            'FT_PCT': (games[f'{side}_ftm'] / games[f'{side}_fta']).round(3).to_numpy(),
+            'OREB': games[f'{side}_oreb'].to_numpy(),
+            'DREB': games[f'{side}_dreb'].to_numpy(),
+            'REB': (games[f'{side}_oreb'] + games[f'{side}_dreb']).to_numpy(),
+            'AST': games[f'{side}_ast'].to_numpy(),
+            'STL': games[f'{side}_stl'].to_numpy(),
+            'BLK': games[f'{side}_blk'].to_numpy(),
+            'TOV': games[f'{side}_tov'].to_numpy(),
+            'PF': games[f'{side}_pf'].to_numpy(),
+            'PLUS_MINUS': (pts - games[f'{other}_pts'].to_numpy()).astype(float),
+        }))
+    return pd.concat(rows, ignore_index=True).sort_values(['GAME_DATE', 'GAME_ID'], kind='mergesort').reset_index(drop=True)
+
+
+def team_ids_table(teams):
+    return pd.DataFrame({'Team': teams['city'] + ' ' + teams['name'], 'ID': teams['firebase_id']})
+
+
+# Upcoming (home index, away index) matchups, every team at most once per slate day
+def slate(n_teams, n_games, seed=0):
+    rng = np.random.default_rng(seed + 1)
+    matchups = []
+    while len(matchups) < n_games:
+        order = rng.permutation(n_teams)
+        matchups.extend(tuple(pair) for pair in order[:n_teams - n_teams % 2].reshape(-1, 2))
+    return matchups[:n_games]
+
+
+# =========================
+# MODEL STAND-INS (picklable, so they load through the artifact store)
+# =========================
+
+class StubScaler:
+    def transform(self, X):
+        X = np.asarray(X, dtype=float)
+        return (X - np.nanmean(X, axis=0)) / (np.nanstd(X, axis=0) + 1.0)
+
+
+class StubRegressor:
+    def __init__(self, bias, scale=1.0):
+        self.bias = bias
+        self.scale = scale
+
+    def predict(self, X):
+        X = np.nan_to_num(np.asarray(X, dtype=float))
+        return self.bias + self.scale * np.tanh(X.mean(axis=1))
+
+
+class StubClassifier:
+    def predict_proba(self, X):
+        X = np.nan_to_num(np.asarray(X, dtype=float))
+        p = 1 / (1 + np.exp(-np.tanh(X.mean(axis=1))))
+        return np.column_stack([1 - p, p])
+
+
+# =========================
+# SERVICE STAND-INS
+# =========================
+
+class FakeDocument:
+    def __init__(self, doc_id, data):
+        self.id = doc_id
+        self.reference = FakeDocumentReference(doc_id)
+        self._data = data
+
+    @property
+    def exists(self):
+        return self._data is not None
+
+    def to_dict(self):
+        return dict(self._data) if self._data is not None else None
+
+
+class FakeDocumentReference:
+    def __init__(self, doc_id):
+        self.id = doc_id
+
+
+class FakeQuery:
+    def __init__(self, docs, count=None):
+        self.docs = docs
+        self.count = count
+
+    def where(self, *args, **kwargs):
+        return self
+
+    def order_by(self, *args, **kwargs):
+        return self
+
+    def select(self, *args, **kwargs):
+        return self
+
+    def limit(self, count):
+        return FakeQuery(self.docs, count)
+
+    def start_after(self, doc):
+        return FakeQuery(self.docs[self.docs.index(doc) + 1:], self.count)
+
+    def stream(self):
+        return iter(self.docs[:self.count])
+
+
+class FakeCollection(FakeQuery):
+    def document(self, doc_id):
+        return FakeDocumentReference(doc_id)
+
+
+class FakeBatch:
+    def __init__(self, db):
+        self.db = db
+        self.size = 0
+
+    def set(self, doc_ref, data):
+        self.size += 1
+
+    def update(self, doc_ref, data):
+        self.size += 1
+
+    def delete(self, doc_ref):
+        self.size += 1
+
+    def commit(self):
+        self.db.commits += 1
+        self.db.writes += self.size
+
+
+class FakeFirestore:
+    """
+    Firestore client that streams fixed documents per collection and counts
+    committed batch writes. Queries ignore their filters and ordering but
+    honour limit and start_after, so paginated reads terminate.
+    """
+
+    def __init__(self, collections=None):
+        self.collections = collections or {}
+        self.commits = 0
+        self.writes = 0
+
+    def collection(self, name):
+        return FakeCollection(self.collections.get(name, []))
+
+    def batch(self):
+        return FakeBatch(self)
+
+    # Documents are only streamed from collections, looked up by reference they do not exist
+    def get_all(self, refs):
+        return [FakeDocument(ref.id, None) for ref in refs]
+
+
+class FakeBlob:
+    def __init__(self, bucket, name):
+        self.bucket = bucket
+        self.name = name
+
+    @property
+    def md5_hash(self):
+        return self.bucket.md5(self.name)
+
+    def exists(self):
+        return self.name in self.bucket.blobs
+
+    def download_as_text(self):
+        return self.bucket.blobs[self.name].decode('utf-8')
+
+    def download_to_filename(self, path):
+        with open(path, 'wb') as f:
+            f.write(self.bucket.blobs[self.name])
+
+    def upload_from_string(self, data, content_type=None):
+        self.bucket.blobs[self.name] = data.encode('utf-8') if isinstance(data, str) else data
+
+    def upload_from_filename(self, path):
+        with open(path, 'rb') as f:
+            self.bucket.blobs[self.name] = f.read()
+
+
+class FakeBucket:
+    """
+    Storage bucket keeping its blobs in memory.
+    """
+
+    def __init__(self):
+        self.blobs = {}  # name -> bytes
+
+    def md5(self, name):
+        return base64.b64encode(hashlib.md5(self.blobs[name]).digest()).decode('ascii')
+
+    def blob(self, name):
+        return FakeBlob(self, name)
+
+    def list_blobs(self, prefix=''):
+        return [FakeBlob(self, name) for name in sorted(self.blobs) if name.startswith(prefix)]
+
+
+def schedule_documents(teams, matchups, start_time):
+    docs = []
+    for i, (home, away) in enumerate(matchups):
+        game_id = str(30000000 + i)
+        docs.append(FakeDocument(game_id, {
+            'gameId': game_id,
+            'startTime': start_time,
+            'teams': {
+                'homeId': int(teams['firebase_id'].iloc[home]),
+                'awayId': int(teams['firebase_id'].iloc[away]),
+            },
+        }))
+    return docs
+
+
+class _Message:
+    def __init__(self, content):
+        self.message = type('Message', (), {'content': content})()
+
+
+class FakeOpenAI:
+    """
+    Chat completions client returning a fixed preview after an optional delay.
+    """
+
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.calls = 0
+        self.chat = type('Chat', (), {'completions': self})()
+
+    def create(self, **kwargs):
+        self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+        return type('Completion', (), {'choices': [_Message(' A synthetic match preview. ')]})()
@@ -0,0 +1,138 @@
+"""
+This module loads model artifacts (compiled or pickled models, scalers and
+data files) from the GCS bucket through a local on-disk cache.
+
+Every artifact is cached under ARTIFACT_CACHE_DIR keyed by its blob generation,
+so warm instances and repeated cold starts skip the download. Downloads run in
+parallel and models are loaded lazily on first use. Setting
+ARTIFACT_SOURCE_DIR replaces the bucket with a local directory.
+"""
+
+import os
+import tempfile
+import threading
+from collections.abc import Mapping
+from concurrent.futures import ThreadPoolExecutor
+
+CACHE_DIR = os.environ.get(
+    "ARTIFACT_CACHE_DIR",
+    os.path.join(tempfile.gettempdir(), "statistiq-artifacts"),
+)
+SOURCE_DIR = os.environ.get("ARTIFACT_SOURCE_DIR")
+MAX_WORKERS = 8
+
+
+class ArtifactStore:
+    def __init__(self, bucket_name, cache_dir=CACHE_DIR, source_dir=SOURCE_DIR):
+        self.bucket_name = bucket_name
+        self.cache_dir = cache_dir
+        self.source_dir = source_dir
+        self._bucket = None
+        self._paths = {}  # artifact name -> cached file, resolved once per process
+        self._lock = threading.Lock()
+
+    def bucket(self):
+        if self._bucket is None:
+            from google.cloud import storage
+            self._bucket = storage.Client().bucket(self.bucket_name)
+        return self._bucket
+
+    # Version of the artifact, the blob generation or mtime/size for a local source
+    def _version(self, name):
+        if self.source_dir:
+            stat = os.stat(os.path.join(self.source_dir, name))
+            return f"{stat.st_mtime_ns}-{stat.st_size}", None
+
+        blob = self.bucket().get_blob(name)
+        if blob is None:
+            raise FileNotFoundError(f"gs://{self.bucket_name}/{name}")
+        return str(blob.generation), blob
+
+    def _download(self, name, blob, target):
+        if self.source_dir:
+            with open(os.path.join(self.source_dir, name), "rb") as src, open(target, "wb") as dst:
+                while chunk := src.read(1 << 20):
+                    dst.write(chunk)
+        else:
+            blob.download_to_filename(target)
+
+    def fetch(self, name):
+        """
+        Returns the path of the cached artifact, downloading it first
+        if the cached copy is missing or older than the source.
+        """
+        if name in self._paths:
+            return self._paths[name]
+
+        version, blob = self._version(name)
+        artifact_dir = os.path.join(self.cache_dir, name)
+        path = os.path.join(artifact_dir, version)
+
+        if not os.path.exists(path):
+            os.makedirs(artifact_dir, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=artifact_dir, suffix=".part")
+            os.close(fd)
+            try:
+                self._download(name, blob, tmp_path)
+                os.replace(tmp_path, path)
+            finally:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+            print(f"Downloaded artifact {name} ({version}).")
+
+            # Drop older versions of the same artifact
+            for old in os.listdir(artifact_dir):
+                if old != version and not old.endswith(".part"):
+                    os.remove(os.path.join(artifact_dir, old))
+
+        with self._lock:
+            self._paths[name] = path
+        return path
+
+    # Version of the cached artifact (blob generation), fetching it if needed
+    def version(self, name):
+        return os.path.basename(self.fetch(name))
+
+    def fetch_all(self, names):
+        names = [name for name in names if name not in self._paths]
+        if not names:
+            return
+        with ThreadPoolExecutor(max_workers=min(MAX_WORKERS, len(names))) as pool:
+            list(pool.map(self.fetch, names))
+
+    def load(self, name):
+        if name.endswith(".npz"):
+            from utils.compiled_models import load_compiled  # NumPy only
+            return load_compiled(self.fetch(name))
+        import joblib  # with the model libraries it unpickles, only on first load
+        return joblib.load(self.fetch(name))
+
+
+class LazyArtifacts(Mapping):
+    """
+    Read-only mapping of key -> artifact that loads each artifact on
+    first access. prefetch() downloads all of them in parallel up front.
+    """
+
+    def __init__(self, store, names):
+        self.store = store
+        self.names = dict(names)
+        self._loaded = {}
+        self._lock = threading.Lock()
+
+    def __getitem__(self, key):
+        if key not in self._loaded:
+            name = self.names[key]
+            with self._lock:
+                if key not in self._loaded:
+                    self._loaded[key] = self.store.load(name)
+        return self._loaded[key]
+
+    def __iter__(self):
+        return iter(self.names)
+
+    def __len__(self):
+        return len(self.names)
+
+    def prefetch(self):
+        self.store.fetch_all(self.names.values())
@@ -0,0 +1,100 @@
+"""
+This module coalesces concurrent prediction requests into micro-batches.
+
+Request threads submit their items and block until the results are ready.
+A single worker thread waits up to max_wait seconds after the first queued
+request for more requests to arrive (or until max_batch_size items are
+queued), runs the batch function once over all of them and hands every
+request back its own slice of the results.
+
+The batch runs in the context of its first request, so the stages it times
+are recorded in that request's invocation. If it fails, every request of the
+batch is run again on its own so a bad request only fails its own caller.
+"""
+
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+from utils.instrumentation import in_context
+
+MAX_BATCH_SIZE = 64
+MAX_WAIT_SECONDS = 0.01
+
+
+class MicroBatcher:
+    def __init__(self, batch_fn, max_batch_size=MAX_BATCH_SIZE, max_wait=MAX_WAIT_SECONDS):
+        self.batch_fn = batch_fn  # list of items -> list of results, same order
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self._queue = queue.Queue()
+        self._worker = None
+        self._lock = threading.Lock()
+
+    def _ensure_worker(self):
+        if self._worker is None or not self._worker.is_alive():
+            with self._lock:
+                if self._worker is None or not self._worker.is_alive():
+                    self._worker = threading.Thread(target=self._run, daemon=True)
+                    self._worker.start()
+
+    def submit(self, items):
+        """
+        Queues the items of one request and blocks until their results are ready.
+        Exceptions raised by the batch function for these items are raised here.
+        """
+        items = list(items)
+        if not items:
+            return []
+        future = Future()
+        self._ensure_worker()
+        self._queue.put((items, future, in_context(self.batch_fn)))
+        return future.result()
+
+    # Collect requests until the batch is full or the window after the first one has passed
+    def _next_batch(self):
+        batch = [self._queue.get()]
+        size = len(batch[0][0])
+        deadline = time.monotonic() + self.max_wait
+
+        while size < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                request = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            batch.append(request)
+            size += len(request[0])
+        return batch
+
+    # Run one request on its own, in its own context
+    @staticmethod
+    def _run_request(request_items, future, batch_fn):
+        try:
+            future.set_result(batch_fn(request_items))
+        except Exception as e:
+            future.set_exception(e)
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            if len(batch) == 1:
+                self._run_request(*batch[0])
+                continue
+
+            items = [item for request_items, _, _ in batch for item in request_items]
+            try:
+                results = batch[0][2](items)
+            except Exception:
+                # Find the failing request by running every request alone
+                for request in batch:
+                    self._run_request(*request)
+                continue
+
+            start = 0
+            for request_items, future, _ in batch:
+                future.set_result(results[start:start + len(request_items)])
+                start += len(request_items)
@@ -1,50 +1,124 @@
 import functions_framework
+import os
 import pandas as pd
-import joblib
-import tempfile
-from google.cloud import storage
-from firebase_admin import firestore, initialize_app
-import firebase_admin
+import time
+import hashlib
+import json
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 from datetime import datetime, timedelta
-from nba_api.stats.endpoints import leaguegamefinder
-from nba_api.stats.static import teams as nba_teams_static
-from google.cloud import secretmanager
-from openai import OpenAI
 
-if not firebase_admin._apps:
-    firebase_admin.initialize_app()
+# utils is ai/utils, copied next to this file by package_functions.py (PYTHONPATH=../ai locally)
+from utils.compiled_models import compiled_artifact_name
+from utils.elo import load_season_snapshot
+from utils.features import compute_live_features, games_from_team_rows
+from utils.feature_store import load_feature_store
+from utils.firestore_batch import commit_in_batches, update_op
+from utils.instrumentation import instrumented, in_context, stage
+from utils.season_log import compact_team_rows, load_season_log
+from utils.seasons import DEFAULT_PHASES, blend_prior_season, current_season, phase_mask, previous_season, season_phases
+from artifacts import ArtifactStore, LazyArtifacts
+from batching import MicroBatcher
 
-db = firestore.client()
 BUCKET_NAME = "statistiq-models"
 
+# "pickle" serves the sklearn / catboost estimators and their scalers, "compiled" the NumPy
+# models written by ai/compile_models.py (scalers folded in), set it once they are uploaded
+MODEL_FORMAT = os.environ.get("MODEL_FORMAT", "pickle")
+if MODEL_FORMAT not in ("compiled", "pickle"):
+    raise ValueError(f"Unknown MODEL_FORMAT {MODEL_FORMAT}, expected 'compiled' or 'pickle'")
+
+# Firebase, OpenAI, Secret Manager and nba_api are imported on first use,
+# so a cold start only pays for the clients a request needs
+DB = None  # cache
+OPENAI_KEY = None  # cache
+OPENAI_CLIENT = None  # cache
+
+def get_db():
+    global DB
+    if DB is None:
+        import firebase_admin
+        from firebase_admin import firestore
+        if not firebase_admin._apps:
+            firebase_admin.initialize_app()
+        DB = firestore.client()
+    return DB
+
 def get_openai_key():
-    client = secretmanager.SecretManagerServiceClient()
-    name = "projects/statistiq-5158d/secrets/openai_api_key/versions/latest"
-    response = client.access_secret_version(name=name)
-    return response.payload.data.decode("UTF-8")
+    global OPENAI_KEY
+    if OPENAI_KEY is None:
+        from google.cloud import secretmanager
+        client = secretmanager.SecretManagerServiceClient()
+        name = "projects/statistiq-5158d/secrets/openai_api_key/versions/latest"
+        response = client.access_secret_version(name=name)
+        OPENAI_KEY = response.payload.data.decode("UTF-8")
+    return OPENAI_KEY
+
+def get_openai_client():
+    """
+    One client per process. OPENAI_BASE_URL points it at a local stub
+    server instead of the OpenAI API.
+    """
+    global OPENAI_CLIENT
+    if OPENAI_CLIENT is None:
+        from openai import OpenAI
+        OPENAI_CLIENT = OpenAI(
+            api_key=get_openai_key(),
+            base_url=os.environ.get("OPENAI_BASE_URL"),
+            max_retries=0,  # retried with backoff in generate_summaries
+        )
+    return OPENAI_CLIENT
+
+ARTIFACTS = ArtifactStore(BUCKET_NAME)
 
 def load_from_gcs(filename):
-    client = storage.Client()
-    bucket = client.bucket(BUCKET_NAME)
-    blob = bucket.blob(filename)
-    tmp = tempfile.NamedTemporaryFile(delete=False)
-    blob.download_to_filename(tmp.name)
-    return joblib.load(tmp.name)
-
-models = {
-    "win_prob": load_from_gcs("models/win_probability_model.pkl"),
-    "home_points": load_from_gcs("models/home_points_model.pkl"),
-    "away_points": load_from_gcs("models/away_points_model.pkl"),
-    "margin": load_from_gcs("models/expected_margin_model.pkl"),
-    "ot": load_from_gcs("models/overtime_model_gb.pkl"),
-}
-
-scalers = {
-    "win_prob": load_from_gcs("scalers/win_probability_scaler.pkl"),
-    "points": load_from_gcs("scalers/points_scaler.pkl"),
-    "ot": load_from_gcs("scalers/overtime_scaler.pkl"),
-    "margin": load_from_gcs("scalers/expected_margin_scaler.pkl")
-}
+    return ARTIFACTS.load(filename)
+
+# Loaded on first use, downloaded in parallel by prefetch_artifacts()
+models = LazyArtifacts(ARTIFACTS, {
+    "win_prob": "models/win_probability_model.pkl",
+    "home_points": "models/home_points_model.pkl",
+    "away_points": "models/away_points_model.pkl",
+    "margin": "models/expected_margin_model.pkl",
+    "ot": "models/overtime_model_gb.pkl",
+})
+
+scalers = LazyArtifacts(ARTIFACTS, {
+    "win_prob": "scalers/win_probability_scaler.pkl",
+    "points": "scalers/points_scaler.pkl",
+    "ot": "scalers/overtime_scaler.pkl",
+    "margin": "scalers/expected_margin_scaler.pkl"
+})
+
+# Scaler applied before each pickled model, the compiled models include it
+MODEL_SCALERS = {"home_points": "points", "away_points": "points", "margin": "margin", "ot": "ot"}
+
+compiled_models = LazyArtifacts(ARTIFACTS, {key: compiled_artifact_name(name) for key, name in models.names.items()})
+
+def model_artifacts():
+    if MODEL_FORMAT == "compiled":
+        return list(compiled_models.names.values())
+    return list(models.names.values()) + list(scalers.names.values())
+
+def get_model_versions():
+    names = model_artifacts() + ["data/feature_medians.pkl"]
+    return {name: ARTIFACTS.version(name) for name in names}
+
+def input_fingerprint(base_features, winprob_features, model_versions):
+    """
+    Identifies the inputs of a prediction: every model feature and the
+    version of every model, scaler and imputation file.
+    """
+    payload = json.dumps(
+        {"base": base_features, "winprob": winprob_features, "models": model_versions},
+        sort_keys=True,
+        default=float,
+    )
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+def prefetch_artifacts():
+    ARTIFACTS.fetch_all(model_artifacts() + ["data/feature_medians.pkl", "data/team_ids.csv"])
 
 TEAM_MAPPING = None #cache
 
@@ -53,17 +127,11 @@ def load_team_mapping():
     Loads Firebase team IDs from GCS file data/team_ids.csv
     and maps them to NBA official TEAM_ID using TEAM_NAME.
     """
-    client = storage.Client()
-    bucket = client.bucket(BUCKET_NAME)
-    blob = bucket.blob("data/team_ids.csv")
-
-    tmp = tempfile.NamedTemporaryFile(delete=False)
-    blob.download_to_filename(tmp.name)
-
-    df = pd.read_csv(tmp.name)  # columns: Team, ID
+    df = pd.read_csv(ARTIFACTS.fetch("data/team_ids.csv"))  # columns: Team, ID
     df["Team"] = df["Team"].str.strip()
 
     # NBA teams metadata
+    from nba_api.stats.static import teams as nba_teams_static
     nba_list = nba_teams_static.get_teams()
     nba_by_name = {t["full_name"]: t["id"] for t in nba_list}
 
@@ -91,103 +159,150 @@ def get_team_mapping():
         TEAM_MAPPING = load_team_mapping()
     return TEAM_MAPPING
 
-SEASON_STR = "2025-26"
-SEASON_DF = None  # cache
+SEASON_CACHE_SIZE = int(os.environ.get("SEASON_CACHE_SIZE", 3))  # season frames kept in memory
+
+# Every column read from the season frame (features, team table, Elo)
+SEASON_COLUMNS = [
+    "SEASON_ID", "TEAM_ID", "TEAM_ABBREVIATION", "GAME_ID", "GAME_DATE", "MATCHUP", "WL",
+    "PTS", "FGM", "FGA", "FG3M", "FTA", "TOV",
+]
 
-def load_season_df(season: str = SEASON_STR):
-    print("Downloading NBA game logs for season:", season)
-    df = leaguegamefinder.LeagueGameFinder(
-        season_nullable=season,
-        season_type_nullable="Regular Season",
-    ).get_data_frames()[0]
+def load_season_df(season: str, phases=DEFAULT_PHASES):
+    """
+    Games of the season phases played so far, only SEASON_COLUMNS in
+    compact dtypes, sorted by GAME_DATE once for every consumer.
+    """
+    print("Loading NBA game logs for season:", season, list(phases))
+    # shared with update_games, only games newer than the stored ones are downloaded
+    df = load_season_log(season, bucket=ARTIFACTS.bucket(), columns=SEASON_COLUMNS)
 
-    df["GAME_DATE"] = pd.to_datetime(df["GAME_DATE"])
-    return df[df["GAME_DATE"] < datetime.utcnow()]  # only past games
+    keep = phase_mask(df, phases) & (df["GAME_DATE"] < datetime.utcnow())  # only past games
+    df = compact_team_rows(df.loc[keep, SEASON_COLUMNS])
+    return df.sort_values(["GAME_DATE", "GAME_ID", "TEAM_ID"], kind="mergesort", ignore_index=True)
 
 
-def get_season_df():
-    global SEASON_DF
-    if SEASON_DF is None:
-        SEASON_DF = load_season_df(SEASON_STR)
-    return SEASON_DF
+# LRU over (season, phases), a warm instance keeps the current and the previous season
+@lru_cache(maxsize=SEASON_CACHE_SIZE)
+def get_season_df(season: str, phases=DEFAULT_PHASES):
+    return load_season_df(season, phases)
 
-def get_team_record(df, team_id):
-    if "SEASON_TYPE" in df.columns:
-        df_regular = df[df["SEASON_TYPE"] == "Regular Season"]
-    else:
-        df_regular = df
-    
-    team_games = df_regular[df_regular["TEAM_ID"] == team_id]
 
-    if team_games.empty:
-        return {"wins": 0, "losses": 0, "games": 0}
+@lru_cache(maxsize=SEASON_CACHE_SIZE)
+def get_history_df(season: str, phases=DEFAULT_PHASES):
+    """
+    Team rows the features are computed from: the season, with the
+    previous season blended in while teams have played only a few games.
+    """
+    season_df = get_season_df(season, phases)
+    history = blend_prior_season(season_df, lambda: get_season_df(previous_season(season), phases))
+    # concatenated categories fall back to object, compact them again
+    return history if history is season_df else compact_team_rows(history)
 
-    wins = (team_games["WL"] == "W").sum()
-    losses = (team_games["WL"] == "L").sum()
-    total = wins + losses
 
-    return {
-        "wins": int(wins),
-        "losses": int(losses),
-        "games": int(total)
-    }
+@lru_cache(maxsize=SEASON_CACHE_SIZE)
+def load_elo_snapshot(season: str):
+    return load_season_snapshot(ARTIFACTS.bucket(), season)
+
+
+def get_elo_ratings(season_df, season: str):
+    """
+    Loads the Elo snapshot written by update_games and applies any
+    games from season_df that are newer than the last processed one.
+    """
+    elo = load_elo_snapshot(season)
+    processed = elo.update_from_team_games(season_df)
+    if processed:
+        print(f"Applied {processed} new games to Elo ratings.")
+    return elo
 
+FORM_GAMES = 10  # latest results kept per team for the form text
 
-def compute_team_features(df, team_id, opponent_id=None):
-    team_games = df[df["TEAM_ID"] == team_id]
-    if team_games.empty:
-        print(f"No games for team {team_id}, using defaults.")
-        return {
-            "avg_points": 150.0,
-            "season_win_pct": 0.5,
-            "last5_win_pct": 0.5,
-            "h2h_avg_points": 110.0,
+def build_team_table(games):
+    """
+    Groups the season game logs by team once and materializes the
+    per-team record, form and last game used for the summaries,
+    keyed by NBA TEAM_ID. games must be sorted by GAME_DATE (see load_season_df),
+    the record counts regular season games only.
+    """
+    # 0 for the latest game of each team, 1 for the one before, ...
+    games_back = games.groupby("TEAM_ID", sort=False).cumcount(ascending=False)
+
+    regular = games[phase_mask(games, ["Regular Season"])]
+    wins = (regular["WL"] == "W").groupby(regular["TEAM_ID"]).sum()
+    losses = (regular["WL"] == "L").groupby(regular["TEAM_ID"]).sum()
+
+    recent = games[games_back < FORM_GAMES]
+    recent = recent["WL"].astype(str).groupby(recent["TEAM_ID"], sort=False).agg(list)
+    last_games = games[games_back == 0].set_index("TEAM_ID")
+
+    table = {}
+    for team_id, last in last_games.iterrows():
+        table[int(team_id)] = {
+            "abbreviation": last["TEAM_ABBREVIATION"],
+            "record": {
+                "wins": int(wins.get(team_id, 0)),
+                "losses": int(losses.get(team_id, 0)),
+                "games": int(wins.get(team_id, 0) + losses.get(team_id, 0)),
+            },
+            "recent_results": recent[team_id],
+            "last_game": {
+                "matchup": last["MATCHUP"],
+                "pts": int(last["PTS"]),
+                "wl": last["WL"],
+            },
         }
 
-    avg_points = team_games["PTS"].mean()
-    season_win_pct = (team_games["WL"] == "W").mean()
+    print(f"Built team table: {len(table)} teams.")
+    return table
 
-    last5 = team_games.sort_values("GAME_DATE").tail(5)
-    last5_win_pct = (last5["WL"] == "W").mean()
+def get_team_record(team_table, team_id):
+    team = team_table.get(team_id)
+    if team is None:
+        return {"wins": 0, "losses": 0, "games": 0}
 
-    # Simple H2H: use ABBREVIATION
-    if opponent_id is not None:
-        opp_games = df[df["TEAM_ID"] == opponent_id]
-        opp_abbrevs = opp_games["TEAM_ABBREVIATION"].unique()
-        h2h = (
-            team_games[team_games["MATCHUP"].str.contains(opp_abbrevs[0])]
-            if len(opp_abbrevs)
-            else pd.DataFrame()
-        )
-        h2h_avg_points = h2h["PTS"].mean() if not h2h.empty else avg_points
-    else:
-        h2h_avg_points = avg_points
+    return dict(team["record"])
 
-    return {
-        "avg_points": float(avg_points),
-        "season_win_pct": float(season_win_pct),
-        "last5_win_pct": float(last5_win_pct),
-        "h2h_avg_points": float(h2h_avg_points),
-    }
 
+@lru_cache(maxsize=SEASON_CACHE_SIZE)
+def get_feature_store(season: str):
+    return load_feature_store(season, bucket=ARTIFACTS.bucket())
 
-def build_feature_payload(df, home_id, away_id):
-    home = compute_team_features(df, home_id, away_id)
-    away = compute_team_features(df, away_id, home_id)
 
-    return {
-        "home_avg_points": home["avg_points"],
-        "away_avg_points": away["avg_points"],
-        "home_head_to_head_avg_points": home["h2h_avg_points"],
-        "away_head_to_head_avg_points": away["h2h_avg_points"],
-        "home_last_5_win_percentage": home["last5_win_pct"],
-        "away_last_5_win_percentage": away["last5_win_pct"],
-        "home_season_win_percentage": home["season_win_pct"],
-        "away_season_win_percentage": away["season_win_pct"],
-        "home_advantage": 1,
-        "points_avg_diff": home["avg_points"] - away["avg_points"],
-        "winrate_diff": home["season_win_pct"] - away["season_win_pct"],
-    }
+def build_live_features(history_df, matchups, elo, season: str):
+    """
+    Features of the upcoming (home_id, away_id) matchups, one row per matchup.
+    Read from today's feature store snapshot written by update_games, else
+    computed by the shared pipeline the models were trained with.
+    """
+    now = datetime.utcnow()
+    store = get_feature_store(season)
+    if store.latest_date() == now.strftime("%Y-%m-%d"):
+        games = pd.DataFrame(matchups, columns=["home_teamId", "away_teamId"]).assign(gameDate=now)
+        return store.game_features(games)
+
+    history = games_from_team_rows(history_df)
+    return compute_live_features(history, matchups, as_of=now, elo=elo)
+
+
+def _value(features, name, default):
+    value = features[name]
+    return default if pd.isna(value) else float(value)
+
+
+def build_feature_payload(features):
+    # Teams without games yet fall back to neutral values
+    payload = {}
+    for side in ("home", "away"):
+        avg_points = _value(features, f"{side}_avg_points", 150.0)
+        payload[f"{side}_avg_points"] = avg_points
+        payload[f"{side}_head_to_head_avg_points"] = _value(features, f"{side}_head_to_head_avg_points", avg_points)
+        payload[f"{side}_last_5_win_percentage"] = _value(features, f"{side}_last_5_win_percentage", 0.5)
+        payload[f"{side}_season_win_percentage"] = _value(features, f"{side}_season_win_percentage", 0.5)
+
+    payload["home_advantage"] = 1
+    payload["points_avg_diff"] = payload["home_avg_points"] - payload["away_avg_points"]
+    payload["winrate_diff"] = payload["home_season_win_percentage"] - payload["away_season_win_percentage"]
+    return payload
 
 FEATURE_MEDIANS = None
 
@@ -207,193 +322,18 @@ def apply_training_imputation(base_features: dict) -> dict:
             base_features[k] = float(v)
     return base_features
 
-def build_winning_percentage_payload(df, home_id, away_id):
-    df = df.sort_values("GAME_DATE").copy()
-
-    # Home / Away slices
-    home_df = df[df["TEAM_ID"] == home_id].copy()
-    away_df = df[df["TEAM_ID"] == away_id].copy()
-
-    # =========================
-    # AVG POINTS (expanding, shift)
-    # =========================
-    home_avg_points = home_df["PTS"].shift(1).expanding().mean().iloc[-1]
-    away_avg_points = away_df["PTS"].shift(1).expanding().mean().iloc[-1]
-
-    # =========================
-    # LAST 5 WIN %
-    # =========================
-    home_last_5_win_percentage = (
-        (home_df["WL"] == "W").astype(int).shift(1).rolling(5, min_periods=1).mean().iloc[-1]
-    )
-    away_last_5_win_percentage = (
-        (away_df["WL"] == "W").astype(int).shift(1).rolling(5, min_periods=1).mean().iloc[-1]
-    )
-
-    # =========================
-    # POSSESSIONS
-    # =========================
-    home_poss = home_df["FGA"] + 0.44 * home_df["FTA"] + home_df["TOV"]
-    away_poss = away_df["FGA"] + 0.44 * away_df["FTA"] + away_df["TOV"]
-
-    # =========================
-    # OFF EFF L10
-    # =========================
-    home_off_eff = home_df["PTS"] / home_poss.replace(0, pd.NA)
-    away_off_eff = away_df["PTS"] / away_poss.replace(0, pd.NA)
-
-    home_off_eff_L10 = home_off_eff.shift(1).rolling(10, min_periods=1).mean().iloc[-1]
-    away_off_eff_L10 = away_off_eff.shift(1).rolling(10, min_periods=1).mean().iloc[-1]
-
-    # =========================
-    # DEF EFF (points allowed, L5)
-    # =========================
-    home_def_efficiency = (
-        away_df["PTS"].shift(1).rolling(5, min_periods=1).mean().iloc[-1]
-    )
-
-    # =========================
-    # TRUE SHOOTING L5
-    # =========================
-    home_TS = home_df["PTS"] / (2 * (home_df["FGA"] + 0.44 * home_df["FTA"])).replace(0, pd.NA)
-    away_TS = away_df["PTS"] / (2 * (away_df["FGA"] + 0.44 * away_df["FTA"])).replace(0, pd.NA)
-
-    home_TS_L5 = home_TS.shift(1).rolling(5, min_periods=1).mean().iloc[-1]
-    away_TS_L5 = away_TS.shift(1).rolling(5, min_periods=1).mean().iloc[-1]
-
-    # =========================
-    # eFG% L10
-    # =========================
-    home_eFG = (home_df["FGM"] + 0.5 * home_df["FG3M"]) / home_df["FGA"].replace(0, pd.NA)
-    away_eFG = (away_df["FGM"] + 0.5 * away_df["FG3M"]) / away_df["FGA"].replace(0, pd.NA)
-
-    home_eFG_L10 = home_eFG.shift(1).rolling(10, min_periods=1).mean().iloc[-1]
-    away_eFG_L10 = away_eFG.shift(1).rolling(10, min_periods=1).mean().iloc[-1]
-
-    # =========================
-    # TOV RATE L5
-    # =========================
-    home_tov_rate_L5 = (home_df["TOV"] / home_poss).shift(1).rolling(5, min_periods=1).mean().iloc[-1]
-    away_tov_rate_L5 = (away_df["TOV"] / away_poss).shift(1).rolling(5, min_periods=1).mean().iloc[-1]
-
-    # =========================
-    # HEAD TO HEAD AVG POINTS
-    # =========================
-    away_abbrev = away_df["TEAM_ABBREVIATION"].iloc[-1]
-    h2h = home_df[home_df["MATCHUP"].str.contains(away_abbrev, na=False)]
-
-    home_head_to_head_avg_points = (
-        h2h["PTS"].shift(1).expanding().mean().iloc[-1]
-        if not h2h.empty
-        else home_avg_points
-    )
-    
-    home_abbrev = home_df["TEAM_ABBREVIATION"].iloc[-1]
-    h2h_away = away_df[away_df["MATCHUP"].str.contains(home_abbrev, na=False)]
-
-    away_head_to_head_avg_points = (
-        h2h_away["PTS"].shift(1).expanding().mean().iloc[-1]
-        if not h2h_away.empty
-        else away_avg_points
-    )
-    
-    home_season_win_percentage = (
-    (home_df["WL"] == "W").astype(int).shift(1).expanding().mean().iloc[-1]
-    )
-    away_season_win_percentage = (
-        (away_df["WL"] == "W").astype(int).shift(1).expanding().mean().iloc[-1]
-    )
-
-
-    # =========================
-    # ELO (recomputed inline, same logic)
-    # =========================
-
-    game_df = df.copy()
-    game_df = game_df.sort_values("GAME_DATE")
-
-    home_games = game_df[game_df["MATCHUP"].str.contains("vs.")].copy()
-    away_games = game_df[game_df["MATCHUP"].str.contains("@")].copy()
-
-    home_games["game_id"] = home_games["GAME_ID"]
-    away_games["game_id"] = away_games["GAME_ID"]
-
-    games = home_games.merge(
-        away_games,
-        on="game_id",
-        suffixes=("_home", "_away")
-    )
-
-    games = games.rename(columns={
-        "TEAM_ID_home": "home_teamId",
-        "TEAM_ID_away": "away_teamId",
-        "WL_home": "home_WL",
-        "GAME_DATE_home": "gameDate"
-    })
-
-    games["home_win"] = (games["home_WL"] == "W").astype(int)
-    games = games.sort_values("gameDate").reset_index(drop=True)
-
-    base_elo = 1500
-    k = 20
-    elo = {}
-
-    games["home_elo"] = 0.0
-    games["away_elo"] = 0.0
-
-    for i, row in games.iterrows():
-        h = row["home_teamId"]
-        a = row["away_teamId"]
-
-        elo.setdefault(h, base_elo)
-        elo.setdefault(a, base_elo)
-
-        # PRE-GAME ELO (important)
-        games.at[i, "home_elo"] = elo[h]
-        games.at[i, "away_elo"] = elo[a]
-
-        expected_home = 1 / (1 + 10 ** ((elo[a] - elo[h]) / 400))
-        actual_home = row["home_win"]
-
-        elo[h] += k * (actual_home - expected_home)
-        elo[a] -= k * (actual_home - expected_home)
-    
-    home_elo = elo.get(home_id, base_elo)
-    away_elo = elo.get(away_id, base_elo)
-
-    elo_diff = home_elo - away_elo
-
-    # =========================
-    # RETURN BASE FEATURES
-    # =========================
-    return {
-        "elo_diff": elo_diff,
-        "home_off_eff_L10": home_off_eff_L10,
-        "away_off_eff_L10": away_off_eff_L10,
-        "home_def_efficiency": home_def_efficiency,
-        "home_TS_L5": home_TS_L5,
-        "home_last_5_win_percentage": home_last_5_win_percentage,
-        "away_TS_L5": away_TS_L5,
-        "home_tov_rate_L5": home_tov_rate_L5,
-        "home_eFG_L10": home_eFG_L10,
-        "home_avg_points": home_avg_points,
-        "away_eFG_L10": away_eFG_L10,
-        "away_tov_rate_L5": away_tov_rate_L5,
-        "home_head_to_head_avg_points": home_head_to_head_avg_points,
-    }
+def build_winning_percentage_payload(features):
+    # Missing values are filled by apply_training_imputation
+    return {name: float(features[name]) for name in WIN_PROB_FEATURES}
     
-def get_recent_form_text(df, team_id, n=5):
-    games = (
-        df[df["TEAM_ID"] == team_id]
-        .sort_values("GAME_DATE")
-        .tail(n)
-    )
-
-    if games.empty:
+def get_recent_form_text(team_table, team_id, n=5):
+    team = team_table.get(team_id)
+    if team is None:
         return None
 
-    wins = (games["WL"] == "W").sum()
-    losses = (games["WL"] == "L").sum()
+    results = team["recent_results"][-n:]
+    wins = results.count("W")
+    losses = results.count("L")
 
     if wins == n:
         return f"are riding a {n}-game winning streak"
@@ -407,20 +347,16 @@ def get_recent_form_text(df, team_id, n=5):
 
     return f"have gone {wins}-{losses} over their last {n} games"
 
-def get_last_game_summary(df, team_id):
-    games = (
-        df[df["TEAM_ID"] == team_id]
-        .sort_values("GAME_DATE")
-    )
-
-    if games.empty:
+def get_last_game_summary(team_table, team_id):
+    team = team_table.get(team_id)
+    if team is None:
         return None
 
-    last = games.iloc[-1]
+    last = team["last_game"]
 
-    opponent = last["MATCHUP"].replace("vs.", "").replace("@", "").strip()
-    pts = int(last["PTS"])
-    wl = last["WL"]
+    opponent = last["matchup"].replace("vs.", "").replace("@", "").strip()
+    pts = last["pts"]
+    wl = last["wl"]
 
     if wl == "W":
         return f"coming off a {pts}-point win against {opponent}"
@@ -457,7 +393,7 @@ def classify_match_context(win_home_pct, margin, ot_pct):
     return favorite, game_type, ot_note
 
 def generate_prediction_summary(
-    api_key,
+    client,
     home_name,
     away_name,
     win_home,
@@ -473,8 +409,6 @@ def generate_prediction_summary(
     home_last_game=None,
     away_last_game=None,
 ):
-    client = OpenAI(api_key=api_key)
-
     favorite, game_type, ot_note = classify_match_context(
         win_home, margin, ot_prob
     )
@@ -515,21 +449,255 @@ def generate_prediction_summary(
 
     return result.choices[0].message.content.strip()
 
+SUMMARY_CONCURRENCY = int(os.environ.get("SUMMARY_CONCURRENCY", "4"))
+SUMMARY_MAX_ATTEMPTS = int(os.environ.get("SUMMARY_MAX_ATTEMPTS", "3"))
+SUMMARY_BACKOFF_SECONDS = 1.0
+SUMMARY_CACHE_SIZE = int(os.environ.get("SUMMARY_CACHE_SIZE", "256"))  # summaries kept in memory
+SUMMARY_CACHE = OrderedDict()  # cache, context key -> summary, least recently used first
+
+def cached_summary(key):
+    summary = SUMMARY_CACHE.get(key)
+    if summary is not None:
+        SUMMARY_CACHE.move_to_end(key)
+    return summary
+
+def cache_summary(key, summary):
+    SUMMARY_CACHE[key] = summary
+    SUMMARY_CACHE.move_to_end(key)
+    while len(SUMMARY_CACHE) > SUMMARY_CACHE_SIZE:
+        SUMMARY_CACHE.popitem(last=False)
+
+def summary_context_key(job):
+    """
+    Identifies the prompt context of a summary: the classified outlook
+    plus the team names, form strings and last game strings.
+    """
+    favorite, game_type, ot_note = classify_match_context(
+        job["win_home"], job["margin"], job["ot_prob"]
+    )
+    parts = [
+        job["home_name"], job["away_name"],
+        favorite, game_type, ot_note,
+        job.get("home_form"), job.get("away_form"),
+        job.get("home_last_game"), job.get("away_last_game"),
+    ]
+    return hashlib.sha1("|".join(str(p) for p in parts).encode("utf-8")).hexdigest()
+
+def generate_summary_with_retry(client, job):
+    for attempt in range(SUMMARY_MAX_ATTEMPTS):
+        try:
+            with stage("llm_call", attempt=attempt + 1):
+                return generate_prediction_summary(
+                    client,
+                    job["home_name"],
+                    job["away_name"],
+                    job["win_home"],
+                    job["win_away"],
+                    job["margin"],
+                    job["home_min"],
+                    job["home_max"],
+                    job["away_min"],
+                    job["away_max"],
+                    job["ot_prob"],
+                    home_form=job.get("home_form"),
+                    away_form=job.get("away_form"),
+                    home_last_game=job.get("home_last_game"),
+                    away_last_game=job.get("away_last_game"),
+                )
+        except Exception as e:
+            print(f"Summary attempt {attempt + 1} failed: {type(e).__name__}: {e}")
+            if attempt + 1 < SUMMARY_MAX_ATTEMPTS:
+                time.sleep(SUMMARY_BACKOFF_SECONDS * 2 ** attempt)
+    return None
+
+def generate_summaries(jobs):
+    """
+    Generates one summary per job, in order. Jobs whose context key matches
+    the cache or the stored summary ("previous") are not sent again, the
+    rest run concurrently on at most SUMMARY_CONCURRENCY threads.
+    Returns (summary, context_key) pairs; summary is None if every attempt failed.
+    """
+    keys = [summary_context_key(job) for job in jobs]
+    results = [None] * len(jobs)
+    pending = {}
+
+    for i, (job, key) in enumerate(zip(jobs, keys)):
+        previous = job.get("previous") or {}
+        cached = cached_summary(key)
+        if cached is not None:
+            results[i] = cached
+        elif previous.get("contextKey") == key and previous.get("prediction"):
+            results[i] = previous["prediction"]
+            cache_summary(key, results[i])
+        else:
+            pending.setdefault(key, []).append(i)
+
+    print(f"Summaries: {len(jobs) - sum(len(v) for v in pending.values())} cached, {len(pending)} to generate.")
+
+    if pending:
+        client = get_openai_client()
+        with ThreadPoolExecutor(max_workers=SUMMARY_CONCURRENCY) as pool:
+            futures = {
+                key: pool.submit(in_context(generate_summary_with_retry), client, jobs[indexes[0]])
+                for key, indexes in pending.items()
+            }
+            for key, future in futures.items():
+                summary = future.result()
+                if summary is not None:
+                    cache_summary(key, summary)
+                for i in pending[key]:
+                    results[i] = summary
+
+    return list(zip(results, keys))
+
+WIN_PROB_FEATURES = [
+    'elo_diff',
+    'home_off_eff_L10',
+    'away_off_eff_L10',
+    'home_def_efficiency',
+    'home_TS_L5',
+    'home_last_5_win_percentage',
+    'away_TS_L5',
+    'home_tov_rate_L5',
+    'home_eFG_L10',
+    'home_avg_points',
+    'away_eFG_L10',
+    'away_tov_rate_L5',
+    'home_head_to_head_avg_points'
+]
+
+POINTS_FEATURES = [
+    "home_avg_points",
+    "away_avg_points",
+    "home_head_to_head_avg_points",
+    "away_head_to_head_avg_points",
+    "home_last_5_win_percentage",
+    "away_last_5_win_percentage",
+    "home_advantage",
+]
+
+MARGIN_FEATURES = [
+    "home_avg_points",
+    "away_avg_points",
+    "points_avg_diff",
+    "winrate_diff",
+    "home_head_to_head_avg_points",
+    "away_head_to_head_avg_points",
+    "home_last_5_win_percentage",
+    "away_last_5_win_percentage",
+    "home_season_win_percentage",
+    "away_season_win_percentage",
+    "home_advantage",
+]
+
+OT_FEATURES = [
+    "home_avg_points",
+    "away_avg_points",
+    "home_head_to_head_avg_points",
+    "away_head_to_head_avg_points",
+    "home_last_5_win_percentage",
+    "away_last_5_win_percentage",
+    "home_advantage",
+]
+
+def run_model(key, X, proba=False):
+    """
+    Predictions of a model for the feature frame X (positive class
+    probability with proba), from the compiled model or the pickled
+    estimator behind its scaler.
+    """
+    if MODEL_FORMAT == "compiled":
+        model = compiled_models[key]
+    else:
+        model = models[key]
+        if key in MODEL_SCALERS:
+            X = scalers[MODEL_SCALERS[key]].transform(X)
+    return model.predict_proba(X)[:, 1] if proba else model.predict(X)
+
+def predict_batch(base_rows, winprob_rows):
+    """
+    Runs every scaler and model once over the whole slate.
+    base_rows / winprob_rows hold one feature dict per game, in the same order.
+    """
+    base_df = pd.DataFrame(base_rows)
+    features_winprob = pd.DataFrame(winprob_rows)[WIN_PROB_FEATURES]
+    features_points = base_df[POINTS_FEATURES]
+    features_margin = base_df[MARGIN_FEATURES]
+    features_ot = base_df[OT_FEATURES]
+
+    # the first use of a model in the process includes loading it
+    with stage("inference.win_prob", games=len(base_df)):
+        win_prob = run_model("win_prob", features_winprob, proba=True)
+    with stage("inference.home_points", games=len(base_df)):
+        home_pts = run_model("home_points", features_points)
+    with stage("inference.away_points", games=len(base_df)):
+        away_pts = run_model("away_points", features_points)
+    with stage("inference.margin", games=len(base_df)):
+        margin = run_model("margin", features_margin)
+    with stage("inference.ot", games=len(base_df)):
+        ot_prob = run_model("ot", features_ot, proba=True)
+
+    return {
+        "win_prob": win_prob,
+        "home_pts": home_pts,
+        "away_pts": away_pts,
+        "margin": margin,
+        "ot_prob": ot_prob,
+    }
+
+def format_predictions(win_prob, home_pts, away_pts, margin, ot_prob, home_firebase_id, away_firebase_id):
+    fav_team_id = home_firebase_id if margin >= 0 else away_firebase_id
+
+    return {
+        "winProbability": {"home": float(win_prob), "away": float(1 - win_prob)},
+        "pointsRange": {
+            "home": {"min": float(home_pts - 10), "max": float(home_pts + 10)},
+            "away": {"min": float(away_pts - 10), "max": float(away_pts + 10)},
+        },
+        "expectedMargin": {
+            "teamId": fav_team_id,
+            "value": float(abs(margin))
+        },
+        "overtimeProbability": float(ot_prob),
+    }
+
 @functions_framework.http
+@instrumented("predict_games")
 def predict_games(request):
+    from firebase_admin import firestore
+
+    db = get_db()
     today = datetime.utcnow()
     two_days_ahead = today + timedelta(days=2)
 
-    season_df = get_season_df()
+    with stage("artifact_prefetch"):
+        prefetch_artifacts()
 
-    team_mapping = get_team_mapping()
+    season, phases = current_season(), season_phases()
+    with stage("season_fetch", season=season):
+        season_df = get_season_df(season, phases)
+        history_df = get_history_df(season, phases)
 
-    games = (
-        db.collection("games_schedule")
-        .where("startTime", ">=", today)
-        .where("startTime", "<=", two_days_ahead)
-        .stream()
-    )
+    with stage("team_mapping"):
+        team_mapping = get_team_mapping()
+
+    with stage("team_table"):
+        team_table = build_team_table(season_df)
+    with stage("elo"):
+        elo = get_elo_ratings(season_df, season)
+
+    with stage("schedule_query"):
+        games = list(
+            db.collection("games_schedule")
+            .where("startTime", ">=", today)
+            .where("startTime", "<=", two_days_ahead)
+            .stream()
+        )
+
+    # =========================
+    # COLLECT ELIGIBLE GAMES
+    # =========================
+    slate = []
 
     for doc in games:
         game = doc.to_dict()
@@ -558,161 +726,211 @@ def predict_games(request):
         home_id = team_mapping[home_firebase_id]["nba_id"]
         away_id = team_mapping[away_firebase_id]["nba_id"]
 
-        home_form = get_recent_form_text(season_df, home_id, n=5)
-        away_form = get_recent_form_text(season_df, away_id, n=5)
-
-        home_last_game = get_last_game_summary(season_df, home_id)
-        away_last_game = get_last_game_summary(season_df, away_id)
-        
-        home_record = get_team_record(season_df, home_id)
-        away_record = get_team_record(season_df, away_id)
-
-        # features from NBA API
-        base_features = build_feature_payload(season_df, home_id, away_id)
-        
-        build_winning_percentage_features = build_winning_percentage_payload(season_df, home_id, away_id)
-        build_winning_percentage_features = apply_training_imputation(build_winning_percentage_features)
-        
-        # build model inputs
-        features_winprob = pd.DataFrame([{
-            k: build_winning_percentage_features[k] for k in [
-                'elo_diff',
-                'home_off_eff_L10',
-                'away_off_eff_L10', 
-                'home_def_efficiency',
-                'home_TS_L5',
-                'home_last_5_win_percentage',
-                'away_TS_L5',
-                'home_tov_rate_L5',
-                'home_eFG_L10',
-                'home_avg_points',
-                'away_eFG_L10',
-                'away_tov_rate_L5',
-                'home_head_to_head_avg_points'
-            ]
-        }])
-
-        features_points = pd.DataFrame([{
-            k: base_features[k] for k in [
-                "home_avg_points",
-                "away_avg_points",
-                "home_head_to_head_avg_points",
-                "away_head_to_head_avg_points",
-                "home_last_5_win_percentage",
-                "away_last_5_win_percentage",
-                "home_advantage",
-            ]
-        }])
-
-        features_margin = pd.DataFrame([{
-            k: base_features[k] for k in [
-                "home_avg_points",
-                "away_avg_points",
-                "points_avg_diff",
-                "winrate_diff",
-                "home_head_to_head_avg_points",
-                "away_head_to_head_avg_points",
-                "home_last_5_win_percentage",
-                "away_last_5_win_percentage",
-                "home_season_win_percentage",
-                "away_season_win_percentage",
-                "home_advantage",
-            ]
-        }])
-
-        features_ot = pd.DataFrame([{
-            k: base_features[k] for k in [
-                "home_avg_points",
-                "away_avg_points",
-                "home_head_to_head_avg_points",
-                "away_head_to_head_avg_points",
-                "home_last_5_win_percentage",
-                "away_last_5_win_percentage",
-                "home_advantage",
-            ]
-        }])
-
-        # predictions
-        win_prob = models["win_prob"].predict_proba(features_winprob)[0, 1]
-
-        home_pts = models["home_points"].predict(
-            scalers["points"].transform(features_points)
-        )[0]
-
-        away_pts = models["away_points"].predict(
-            scalers["points"].transform(features_points)
-        )[0]
-
-        margin = models["margin"].predict(
-            scalers["margin"].transform(features_margin)
-        )[0]
-
-        ot_prob = models["ot"].predict_proba(
-            scalers["ot"].transform(features_ot)
-        )[0, 1]
-        
-        fav_team_id = home_firebase_id if margin >= 0 else away_firebase_id
-        
-        api_key = get_openai_key()
-
-        # Required names
-        home_name = team_mapping[home_firebase_id]["name"]
-        away_name = team_mapping[away_firebase_id]["name"]
-
-        # Convert predictions to percentages
-        win_home_pct = win_prob * 100
-        win_away_pct = (1 - win_prob) * 100
-        ot_pct = ot_prob * 100
-
-        prediction_summary = generate_prediction_summary(
-            api_key,
-            home_name,
-            away_name,
-            win_home_pct,
-            win_away_pct,
-            margin,
-            home_pts - 10,
-            home_pts + 10,
-            away_pts - 10,
-            away_pts + 10,
-            ot_pct,
-            home_form=home_form,
-            away_form=away_form,
-            home_last_game=home_last_game,
-            away_last_game=away_last_game,
+        slate.append({
+            "game_id": game_id,
+            "home_firebase_id": home_firebase_id,
+            "away_firebase_id": away_firebase_id,
+            "home_id": home_id,
+            "away_id": away_id,
+            "previous_summary": game.get("summary"),
+            # only a stored prediction with its summary can be kept
+            "previous_fingerprint": (
+                game.get("inputFingerprint") if game.get("predictions") and game.get("summary") else None
+            ),
+        })
+
+    if not slate:
+        return ("Predictions updated successfully!", 200)
+
+    # =========================
+    # LIVE FEATURES (one pass for the whole slate)
+    # =========================
+    with stage("features", games=len(slate)):
+        live_features = build_live_features(
+            history_df,
+            [(entry["home_id"], entry["away_id"]) for entry in slate],
+            elo,
+            season,
         )
+        for entry, (_, features) in zip(slate, live_features.iterrows()):
+            entry["base_features"] = build_feature_payload(features)
+            entry["winprob_features"] = apply_training_imputation(build_winning_percentage_payload(features))
+
+    # =========================
+    # SKIP GAMES WITH UNCHANGED INPUTS
+    # =========================
+    model_versions = get_model_versions()
+    for entry in slate:
+        entry["fingerprint"] = input_fingerprint(entry["base_features"], entry["winprob_features"], model_versions)
 
+    unchanged = [entry["game_id"] for entry in slate if entry["fingerprint"] == entry["previous_fingerprint"]]
+    if unchanged:
+        print(f"Skipping {len(unchanged)} games with unchanged inputs: {unchanged}")
+        slate = [entry for entry in slate if entry["fingerprint"] != entry["previous_fingerprint"]]
 
-        # form_summary = generate_form_summary(
-        #     api_key,
-        #     home_name, away_name,
-        #     home_record, away_record
-        # )
+    if not slate:
+        return ("Predictions updated successfully!", 200)
+
+    # =========================
+    # BATCH INFERENCE
+    # =========================
+    predictions = predict_batch(
+        [entry["base_features"] for entry in slate],
+        [entry["winprob_features"] for entry in slate],
+    )
+
+    # =========================
+    # FAN OUT TO DOCUMENTS
+    # =========================
+    for i, entry in enumerate(slate):
+        home_firebase_id = entry["home_firebase_id"]
+        away_firebase_id = entry["away_firebase_id"]
+        home_id = entry["home_id"]
+        away_id = entry["away_id"]
+
+        entry["win_prob"] = predictions["win_prob"][i]
+        entry["home_pts"] = predictions["home_pts"][i]
+        entry["away_pts"] = predictions["away_pts"][i]
+        entry["margin"] = predictions["margin"][i]
+        entry["ot_prob"] = predictions["ot_prob"][i]
+
+        entry["home_record"] = get_team_record(team_table, home_id)
+        entry["away_record"] = get_team_record(team_table, away_id)
+
+        # Convert predictions to percentages for the summary prompt
+        entry["summary_job"] = {
+            "home_name": team_mapping[home_firebase_id]["name"],
+            "away_name": team_mapping[away_firebase_id]["name"],
+            "win_home": entry["win_prob"] * 100,
+            "win_away": (1 - entry["win_prob"]) * 100,
+            "margin": entry["margin"],
+            "home_min": entry["home_pts"] - 10,
+            "home_max": entry["home_pts"] + 10,
+            "away_min": entry["away_pts"] - 10,
+            "away_max": entry["away_pts"] + 10,
+            "ot_prob": entry["ot_prob"] * 100,
+            "home_form": get_recent_form_text(team_table, home_id, n=5),
+            "away_form": get_recent_form_text(team_table, away_id, n=5),
+            "home_last_game": get_last_game_summary(team_table, home_id),
+            "away_last_game": get_last_game_summary(team_table, away_id),
+            "previous": entry["previous_summary"],
+        }
+
+    with stage("llm", games=len(slate)):
+        summaries = generate_summaries([entry["summary_job"] for entry in slate])
+
+    update_ops = []
+    for entry, (prediction_summary, context_key) in zip(slate, summaries):
+        game_id = entry["game_id"]
+        win_prob = entry["win_prob"]
+        home_pts = entry["home_pts"]
+        away_pts = entry["away_pts"]
+        margin = entry["margin"]
+        ot_prob = entry["ot_prob"]
 
         # save back to Firestore
-        
-        db.collection("games_schedule").document(game_id).update({
-            "predictions": {
-                "winProbability": {"home": float(win_prob), "away": float(1 - win_prob)},
-                "pointsRange": {
-                    "home": {"min": float(home_pts - 10), "max": float(home_pts + 10)},
-                    "away": {"min": float(away_pts - 10), "max": float(away_pts + 10)},
-                },
-                "expectedMargin": {
-                    "teamId": fav_team_id,
-                    "value": float(abs(margin))
-                },
-                "overtimeProbability": float(ot_prob),
-            },
-            "summary": {
-                "prediction": prediction_summary
-                # "currentForm": form_summary
-            },
-            "home_record": home_record,
-            "away_record": away_record,
+        update = {
+            "predictions": format_predictions(
+                win_prob, home_pts, away_pts, margin, ot_prob,
+                entry["home_firebase_id"], entry["away_firebase_id"],
+            ),
+            "home_record": entry["home_record"],
+            "away_record": entry["away_record"],
             "updatedAt": firestore.SERVER_TIMESTAMP
-        })
+        }
+
+        # keep the stored summary if the LLM call failed, without the new fingerprint
+        # so the next run does not skip the game and retries the summary
+        if prediction_summary is not None:
+            update["summary"] = {
+                "prediction": prediction_summary,
+                "contextKey": context_key,
+            }
+            update["inputFingerprint"] = entry["fingerprint"]
 
-        print(f"Updated predictions for game {game_id}")
+        update_ops.append(update_op(db.collection("games_schedule").document(game_id), update))
+
+    with stage("firestore_write", writes=len(update_ops)):
+        result = commit_in_batches(db, update_ops, label="prediction updates")
+    if result["failed"]:
+        return (f"Prediction updates failed for chunks: {result['failed']}", 500)
 
     return ("Predictions updated successfully!", 200)
+
+
+def predict_matchups_batch(matchups):
+    """
+    Predictions for a list of (home_firebase_id, away_firebase_id) pairs,
+    with one feature pass and one model pass for the whole list.
+    """
+    team_mapping = get_team_mapping()
+    season, phases = current_season(), season_phases()
+    elo = get_elo_ratings(get_season_df(season, phases), season)
+
+    live_features = build_live_features(
+        get_history_df(season, phases),
+        [(team_mapping[home]["nba_id"], team_mapping[away]["nba_id"]) for home, away in matchups],
+        elo,
+        season,
+    )
+    base_rows, winprob_rows = [], []
+    for _, features in live_features.iterrows():
+        base_rows.append(build_feature_payload(features))
+        winprob_rows.append(apply_training_imputation(build_winning_percentage_payload(features)))
+
+    predictions = predict_batch(base_rows, winprob_rows)
+
+    return [
+        format_predictions(
+            predictions["win_prob"][i],
+            predictions["home_pts"][i],
+            predictions["away_pts"][i],
+            predictions["margin"][i],
+            predictions["ot_prob"][i],
+            home,
+            away,
+        )
+        for i, (home, away) in enumerate(matchups)
+    ]
+
+# Concurrent requests of a warm instance share one batch within the window
+PREDICTION_BATCHER = MicroBatcher(
+    predict_matchups_batch,
+    max_batch_size=int(os.environ.get("PREDICTION_BATCH_SIZE", "64")),
+    max_wait=float(os.environ.get("PREDICTION_BATCH_WAIT_MS", "10")) / 1000,
+)
+
+@functions_framework.http
+@instrumented("predict_matchups")
+def predict_matchups(request):
+    """
+    On-demand predictions without touching Firestore.
+    Body: {"games": [{"homeId": 1, "awayId": 2}, ...]} with Firebase team ids.
+    Returns {"predictions": [...]} in request order, in the same format
+    as the stored game predictions.
+
+    Run locally with: PYTHONPATH=../ai functions-framework --target predict_matchups
+    """
+    payload = request.get_json(silent=True) or {}
+    games = payload.get("games")
+    if not isinstance(games, list) or not games:
+        return ({"error": "Expected a non-empty 'games' list."}, 400)
+
+    try:
+        matchups = [(int(game["homeId"]), int(game["awayId"])) for game in games]
+    except (KeyError, TypeError, ValueError):
+        return ({"error": "Every game needs integer 'homeId' and 'awayId'."}, 400)
+
+    team_mapping = get_team_mapping()
+    unknown = sorted({team for matchup in matchups for team in matchup if team not in team_mapping})
+    if unknown:
+        return ({"error": f"Unknown team ids: {unknown}"}, 400)
+
+    # no-op once the artifacts are cached by this instance
+    with stage("artifact_prefetch"):
+        prefetch_artifacts()
+
+    with stage("batched_prediction", games=len(matchups)):
+        predictions = PREDICTION_BATCHER.submit(matchups)
+
+    return ({"predictions": predictions}, 200)
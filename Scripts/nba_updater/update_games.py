@@ -2,148 +2,241 @@
 This Cloud Function retrieves the most recent NBA games (from the NBA Stats API)
 and updates a Firestore database with the results.
 
-It also removes outdated games from the "games_schedule" collection to keep the data fresh.
+It also removes outdated games from the "games_schedule" collection to keep the data fresh,
+and keeps the "team_form" and "head_to_head" summaries the match detail reads in step
+with the new results.
 """
 
 import functions_framework
+import io
 import pandas as pd
-import time
-import requests
-import os
-from datetime import datetime, timedelta
-import firebase_admin
-from firebase_admin import credentials, firestore
-from nba_api.stats.endpoints import leaguegamefinder
-
-cred = credentials.Certificate("firebase_key.json")
-firebase_admin.initialize_app(cred)
-db = firestore.client()
-
-base_dir = os.path.dirname(__file__)
-team_ids_path = os.path.join(base_dir, "../ai/utils/team_ids.csv")
-team_ids_df = pd.read_csv(team_ids_path)
-TEAM_IDS = dict(zip(team_ids_df["Team"], team_ids_df["ID"]))
+from datetime import datetime, timedelta, timezone
+
+# utils is ai/utils, copied next to this file by package_functions.py (PYTHONPATH=../ai locally)
+from utils.elo import load_season_snapshot, snapshot_name
+from utils.feature_store import FeatureStore
+from utils.firestore_batch import commit_in_batches, delete_op, set_op, stream_pages
+from utils.game_summaries import (
+    FORM_COLLECTION, FORM_GAMES, H2H_COLLECTION, H2H_GAMES,
+    form_document, form_entries, h2h_document, h2h_entries, merge_games,
+)
+from utils.instrumentation import instrumented, stage
+from utils.season_log import load_season_log
+from utils.seasons import blend_prior_season, current_season, phase_mask, phase_of, previous_season, season_phases
+
+BUCKET_NAME = "statistiq-models"
+
+TEAM_IDS_BLOB = "data/team_ids.csv"  # columns: Team, ID, shared with the predictor
+
+# Firebase, the storage client and the team ids are loaded on first use,
+# so importing the module stays cheap
+DB = None  # cache
+BUCKET = None  # cache
+TEAM_IDS = None  # cache
+
+def get_db():
+    global DB
+    if DB is None:
+        import firebase_admin
+        from firebase_admin import credentials, firestore
+        if not firebase_admin._apps:
+            firebase_admin.initialize_app(credentials.Certificate("firebase_key.json"))
+        DB = firestore.client()
+    return DB
+
+def get_bucket():
+    global BUCKET
+    if BUCKET is None:
+        from google.cloud import storage
+        BUCKET = storage.Client().bucket(BUCKET_NAME)
+    return BUCKET
+
+def get_team_ids():
+    global TEAM_IDS
+    if TEAM_IDS is None:
+        team_ids_df = pd.read_csv(io.BytesIO(get_bucket().blob(TEAM_IDS_BLOB).download_as_bytes()))
+        TEAM_IDS = dict(zip(team_ids_df["Team"], team_ids_df["ID"]))
+    return TEAM_IDS
+
+# games_played fields stored per side as {field}_home and {field}_away: (field, season log column, type)
+GAME_SIDE_FIELDS = [
+    ('pts', 'PTS', 'int64'),
+    ('fgm', 'FGM', 'int64'),
+    ('fga', 'FGA', 'int64'),
+    ('fg_pct', 'FG_PCT', 'float64'),
+    ('fg3m', 'FG3M', 'int64'),
+    ('fg3a', 'FG3A', 'int64'),
+    ('fg3_pct', 'FG3_PCT', 'float64'),
+    ('ftm', 'FTM', 'int64'),
+    ('fta', 'FTA', 'int64'),
+    ('ft_pct', 'FT_PCT', 'float64'),
+    ('oreb', 'OREB', 'int64'),
+    ('dreb', 'DREB', 'int64'),
+    ('reb', 'REB', 'int64'),
+    ('ast', 'AST', 'int64'),
+    ('stl', 'STL', 'int64'),
+    ('blk', 'BLK', 'int64'),
+    ('tov', 'TOV', 'int64'),
+    ('pf', 'PF', 'int64'),
+    ('plus_minus', 'PLUS_MINUS', 'float64'),
+]
+GAME_ROW_COLUMNS = ['GAME_ID', 'GAME_DATE', 'SEASON_ID', 'MIN', 'TEAM_ID', 'TEAM_NAME', 'WL']
+
+def format_games(team_rows, team_ids):
+    """
+    One games_played record per game in the season log team rows (any date
+    range): home and away rows joined on GAME_ID with _home/_away suffixes.
+    Games without exactly one home and one away row, or with a missing
+    integer stat, are left out.
+    """
+    columns = GAME_ROW_COLUMNS + [column for _, column, _ in GAME_SIDE_FIELDS]
+    sides = {}
+    for side, marker in (('home', 'vs.'), ('away', '@')):
+        rows = team_rows.loc[team_rows['MATCHUP'].str.contains(marker, regex=False, na=False), columns]
+        sides[side] = rows.drop_duplicates('GAME_ID', keep=False)
+    games = sides['home'].merge(sides['away'], on='GAME_ID', suffixes=('_home', '_away'))
+
+    # A NaN would fail the int64 casts below for the whole range, skip only its game
+    required = ['GAME_ID', 'SEASON_ID_home'] + [
+        f'{column}_{side}' for _, column, dtype in GAME_SIDE_FIELDS if dtype == 'int64' for side in ('home', 'away')
+    ]
+    incomplete = games[required].isna().any(axis=1)
+    if incomplete.any():
+        print(f"Skipping games with missing stats: {games.loc[incomplete, 'GAME_ID'].tolist()}")
+        games = games[~incomplete]
+
+    formatted = pd.DataFrame({
+        'game_id': games['GAME_ID'].astype('int64'),
+        'game_date': games['GAME_DATE_home'].dt.strftime('%Y-%m-%d %H:%M:%S'),
+        'season_id': games['SEASON_ID_home'].astype('int64'),
+        'season_type': games['SEASON_ID_home'].map(phase_of),
+        'min': games['MIN_home'].fillna(0).astype('int64').replace(0, 240),
+    })
+    # Firebase team ids by name, the NBA id for unknown names
+    for side in ('home', 'away'):
+        firebase_ids = games[f'TEAM_NAME_{side}'].map(team_ids)
+        formatted[f'team_id_{side}'] = firebase_ids.fillna(games[f'TEAM_ID_{side}']).astype('int64')
+    for field, column, dtype in GAME_SIDE_FIELDS:
+        for side in ('home', 'away'):
+            formatted[f'{field}_{side}'] = games[f'{column}_{side}'].astype(dtype)
+    for side in ('home', 'away'):
+        wl = games[f'WL_{side}'].astype(object)
+        formatted[f'wl_{side}'] = wl.where(wl.notna() & (wl != ''), '-')
+    return formatted
+
+# Games stored in the summary documents with the given ids, one round-trip per collection
+def load_summary_games(db, collection, doc_ids):
+    refs = [db.collection(collection).document(str(doc_id)) for doc_id in doc_ids]
+    if not refs:
+        return {}
+    return {snap.id: snap.to_dict().get('games', []) for snap in db.get_all(refs) if snap.exists}
+
+def summary_ops(db, games):
+    """
+    Writes that merge the games_played records into the form documents of
+    their teams and the head-to-head documents of their matchups.
+    """
+    ops = []
+    for collection, entries, limit, document in (
+        (FORM_COLLECTION, form_entries(games), FORM_GAMES, form_document),
+        (H2H_COLLECTION, h2h_entries(games), H2H_GAMES, h2h_document),
+    ):
+        stored = load_summary_games(db, collection, entries)
+        for doc_id, new in entries.items():
+            merged = merge_games(stored.get(str(doc_id), []), new, limit)
+            ops.append(set_op(db.collection(collection).document(str(doc_id)), document(doc_id, merged)))
+    return ops
+
+# Games of the previous season, from the same shared log as the predictor
+def load_prior_season(season, phases, bucket):
+    prior_df = load_season_log(previous_season(season), bucket=bucket)
+    return prior_df[phase_mask(prior_df, phases)] if not prior_df.empty else prior_df
 
 @functions_framework.http
+@instrumented("update_games")
 def update_games(request):
-    season_start_date = '2025-10-21'
-    season_phase = 'Regular Season'
+    season, phases = current_season(), season_phases()
     games_per_day = 15
 
-    # Get games for 2025-26 season
-    games = leaguegamefinder.LeagueGameFinder(season_nullable='2025-26')
+    db = get_db()
+    bucket = get_bucket()
+    team_ids = get_team_ids()
 
-    df = games.get_data_frames()[0]
-    df['GAME_DATE'] = pd.to_datetime(df['GAME_DATE'])
+    # Get games for the season, only games newer than the stored log are downloaded
+    with stage("season_fetch"):
+        season_df = load_season_log(season, bucket=bucket)
 
     today = datetime.now()
-    # Some games start in the morning
-    today_morning = today.replace(hour=4, minute=0, second=0, microsecond=0)
+    # Some games start in the morning (UTC), startTime is a timezone-aware Firestore timestamp
+    stale_cutoff = datetime.now(timezone.utc).replace(hour=4, minute=0, second=0, microsecond=0)
     yesterday = (today - timedelta(days=1)).replace(hour=6, minute=0, second=0, microsecond=0)
 
-    df = df[df['GAME_DATE'].dt.date == yesterday.date()]
-
-    formatted_games = []
-
-    for game_id in df['GAME_ID'].unique():
-        game_data = df[df['GAME_ID'] == game_id]
-        
-        if len(game_data) != 2:
-            continue
-
-        home_team = game_data[game_data['MATCHUP'].str.contains('vs.')].iloc[0]
-        away_team = game_data[game_data['MATCHUP'].str.contains('@')].iloc[0]
-        
-        team_id_home = TEAM_IDS.get(home_team['TEAM_NAME'], str(home_team['TEAM_ID']))
-        team_id_away = TEAM_IDS.get(away_team['TEAM_NAME'], str(away_team['TEAM_ID']))
-        
-        # Create formatted game dictionary
-        game_dict = {
-            'game_id': int(game_id),
-            'game_date': str(home_team['GAME_DATE']),
-            'season_id': int(home_team['SEASON_ID']),
-            'season_type': season_phase,
-            'min': int(home_team['MIN']) if home_team['MIN'] else 240,
-            
-            'team_id_home': int(team_id_home),
-            'team_id_away': int(team_id_away),
-            
-            'pts_home': int(home_team['PTS']),
-            'pts_away': int(away_team['PTS']),
-            
-            'fgm_home': int(home_team['FGM']),
-            'fgm_away': int(away_team['FGM']),
-            'fga_home': int(home_team['FGA']),
-            'fga_away': int(away_team['FGA']),
-            'fg_pct_home': float(home_team['FG_PCT']),
-            'fg_pct_away': float(away_team['FG_PCT']),
-            
-            'fg3m_home': int(home_team['FG3M']),
-            'fg3m_away': int(away_team['FG3M']),
-            'fg3a_home': int(home_team['FG3A']),
-            'fg3a_away': int(away_team['FG3A']),
-            'fg3_pct_home': float(home_team['FG3_PCT']),
-            'fg3_pct_away': float(away_team['FG3_PCT']),
-
-            'ftm_home': int(home_team['FTM']),
-            'ftm_away': int(away_team['FTM']),
-            'fta_home': int(home_team['FTA']),
-            'fta_away': int(away_team['FTA']),
-            'ft_pct_home': float(home_team['FT_PCT']),
-            'ft_pct_away': float(away_team['FT_PCT']),
-            
-            'oreb_home': int(home_team['OREB']),
-            'oreb_away': int(away_team['OREB']),
-            'dreb_home': int(home_team['DREB']),
-            'dreb_away': int(away_team['DREB']),
-            'reb_home': int(home_team['REB']),
-            'reb_away': int(away_team['REB']),
-            
-            'ast_home': int(home_team['AST']),
-            'ast_away': int(away_team['AST']),
-            'stl_home': int(home_team['STL']),
-            'stl_away': int(away_team['STL']),
-            'blk_home': int(home_team['BLK']),
-            'blk_away': int(away_team['BLK']),
-            'tov_home': int(home_team['TOV']),
-            'tov_away': int(away_team['TOV']),
-            'pf_home': int(home_team['PF']),
-            'pf_away': int(away_team['PF']),
-            
-            'plus_minus_home': float(home_team['PLUS_MINUS']),
-            'plus_minus_away': float(away_team['PLUS_MINUS']),
-            
-            'wl_home': home_team['WL'] if home_team['WL'] else '-',
-            'wl_away': away_team['WL'] if away_team['WL'] else '-',
-        }
-        
-        formatted_games.append(game_dict)
-
-    formatted_df = pd.DataFrame(formatted_games)
+    # ?from=YYYY-MM-DD&to=YYYY-MM-DD backfills games_played for a date range, yesterday by default
+    args = request.args if request is not None else {}
+    date_from = pd.Timestamp(args.get('from') or yesterday.date())
+    date_to = pd.Timestamp(args.get('to') or date_from)
+    # Before the first game of a season the log is empty, the cleanup below still runs
+    if season_df.empty:
+        print(f"No games in the {season} season log yet.")
+        df = season_df
+    else:
+        df = season_df[season_df['GAME_DATE'].dt.normalize().between(date_from, date_to)]
+
+    with stage("format_games"):
+        formatted_df = format_games(df, team_ids)
 
     print("\n" + "="*60)
     print("FORMATTED GAMES (Home/Away Structure):")
     print("="*60)
     print(formatted_df)
 
-    # Assign the yesterday played games into games_played
-    for idx, row in formatted_df.iterrows():
-        game_id = str(row['game_id'])
-        print(game_id)
-        game_ref = db.collection('games_played').document(game_id)
-        game_data = row.to_dict()
-        game_ref.set(game_data)
+    # Assign the played games into games_played
+    played_games = formatted_df.to_dict('records')
+    played_ops = [
+        set_op(db.collection('games_played').document(str(game['game_id'])), game)
+        for game in played_games
+    ]
+    with stage("firestore_write", writes=len(played_ops)):
+        played_result = commit_in_batches(db, played_ops, label='games_played writes')
+
+    # Merge the results into the team form and head-to-head summaries
+    with stage("game_summaries", games=len(played_games)):
+        summary_result = commit_in_batches(db, summary_ops(db, played_games), label='summary writes')
+
+    # Apply the new results to the stored Elo ratings, a new season starts from the previous one
+    with stage("elo_update"):
+        elo = load_season_snapshot(bucket, season)
+        phase_df = season_df[phase_mask(season_df, phases)]
+        processed = elo.update_from_team_games(phase_df)
+        elo.save_to_blob(bucket.blob(snapshot_name(season)))
+    print(f"Applied {processed} games to Elo ratings (last game {elo.last_game_id}).")
+
+    # Snapshot the features every team carries into today's games, early in the season
+    # from the previous season's games too (as the predictor computes them)
+    with stage("feature_store"):
+        history_df = blend_prior_season(phase_df, lambda: load_prior_season(season, phases, bucket))
+        FeatureStore(season, bucket=bucket).append(history_df, elo=elo)
+
+    # Remove every scheduled game that started before this morning, however many runs were missed
+    with stage("schedule_query"):
+        stale_query = (
+            db.collection("games_schedule")
+            .where("startTime", "<", stale_cutoff)
+            .order_by("startTime")
+            .select(["gameId", "startTime"])
+        )
+        stale_docs = list(stream_pages(stale_query))
+
+    for doc in stale_docs:
+        schedule_data = doc.to_dict()
+        print(f"Deleting old game: {schedule_data.get('gameId')} ({schedule_data.get('startTime')})")
+    stale_ops = [delete_op(doc.reference) for doc in stale_docs]
 
-    schedule_docs = db.collection("games_schedule").order_by("startTime").limit(15).stream()
+    with stage("firestore_delete", deletes=len(stale_ops)):
+        stale_result = commit_in_batches(db, stale_ops, label='games_schedule deletes')
 
-    for doc in schedule_docs:
-        schedule_data = doc.to_dict()
+    failed = played_result['failed'] + summary_result['failed'] + stale_result['failed']
+    if failed:
+        return f"Updated games with failed batches: {failed}", 500
 
-        # Check if the game was no later than yesterday, else skip the game
-        start_time = pd.to_datetime(schedule_data.get('startTime'))
-        if ((str(start_time)).split("+"))[0] <= str(today_morning):
-            print(f"Deleting old game: {schedule_data.get('gameId')} ({start_time})")
-            db.collection("games_schedule").document(doc.id).delete()
-            continue
-    
     return f"Successfully updated games.", 200
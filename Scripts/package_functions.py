@@ -0,0 +1,90 @@
+"""
+Builds the deployable source folder of each Cloud Function.
+
+The functions import the shared modules of ai/utils as utils.*, which are
+outside their own folders. This copies a function folder to
+build/<function>/ together with the ai/utils modules it imports (followed
+through their own utils imports), so the build folder is the deploy root:
+
+    python package_functions.py
+    gcloud functions deploy predict_games --source build/nba_predictor ...
+    gcloud functions deploy update_games --source build/nba_updater ...
+
+Run locally from the function folder with ai/ on the path instead, e.g.
+PYTHONPATH=../ai functions-framework --target predict_matchups
+"""
+
+import argparse
+import os
+import re
+import shutil
+import sys
+
+scripts_dir = os.path.dirname(os.path.abspath(__file__))
+utils_dir = os.path.join(scripts_dir, 'ai', 'utils')
+
+FUNCTIONS = ['nba_predictor', 'nba_updater']
+IGNORE = shutil.ignore_patterns('__pycache__', '*.pyc', '.pytest_cache')
+UTILS_IMPORT = re.compile(r'^\s*(?:from|import)\s+utils\.(\w+)', re.MULTILINE)
+
+
+def _utils_imports(path):
+    with open(path, encoding='utf-8') as f:
+        return set(UTILS_IMPORT.findall(f.read()))
+
+
+# Names of the ai/utils modules the .py files of a folder need, directly or through other utils modules
+def required_utils(function_dir):
+    pending = set()
+    for name in os.listdir(function_dir):
+        if name.endswith('.py'):
+            pending |= _utils_imports(os.path.join(function_dir, name))
+
+    required = set()
+    while pending:
+        module = pending.pop()
+        if module in required:
+            continue
+        path = os.path.join(utils_dir, f'{module}.py')
+        if not os.path.exists(path):
+            raise FileNotFoundError(f'{function_dir} imports utils.{module}, which is not in {utils_dir}')
+        required.add(module)
+        pending |= _utils_imports(path)
+    return sorted(required)
+
+
+def package(function, output_dir):
+    source = os.path.join(scripts_dir, function)
+    target = os.path.join(output_dir, function)
+    if os.path.exists(target):
+        shutil.rmtree(target)
+    shutil.copytree(source, target, ignore=IGNORE)
+    if os.path.exists(os.path.join(target, 'utils')):
+        raise FileExistsError(f'{function} has its own utils/, it would shadow ai/utils')
+
+    modules = required_utils(source)
+    os.makedirs(os.path.join(target, 'utils'))
+    for module in modules:
+        shutil.copy2(os.path.join(utils_dir, f'{module}.py'), os.path.join(target, 'utils', f'{module}.py'))
+    print(f'{target}: {function} with utils {", ".join(modules)}')
+    return target
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('functions', nargs='*', metavar='FUNCTION',
+                        help=f'functions to package, of {", ".join(FUNCTIONS)} (default: all)')
+    parser.add_argument('--output-dir', default=os.path.join(scripts_dir, 'build'))
+    args = parser.parse_args(argv)
+
+    unknown = sorted(set(args.functions) - set(FUNCTIONS))
+    if unknown:
+        parser.error(f'unknown functions: {", ".join(unknown)}')
+
+    for function in args.functions or FUNCTIONS:
+        package(function, args.output_dir)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())